@@ -0,0 +1,221 @@
+# /// script
+# requires-python = ">=3.12"
+# dependencies = [
+#     "smolagents",
+#     "litellm",
+#     "google-adk",
+#     "google-genai",
+#     "langgraph",
+#     "langchain-openai",
+#     "llama-index",
+#     "llama-index-llms-openai",
+# ]
+# ///
+"""
+Compare the framework overhead of the two-tool agents in the 2025-11-09 post
+(smolagents, Google ADK, LangGraph and LlamaIndex) without a real model.
+
+Every two_tool_agent*.py script is run unchanged against the stub in
+stub_llm.py, which plays the model: it asks for sum_numbers, then divide_sum,
+then answers, as OpenAI tool calls, ReAct text (LlamaIndex) or Gemini
+function calls (ADK). By default the stub answers instantly, so what's left
+is the frameworks' own time. For each framework this measures:
+
+- import time, the median over --import-runs fresh processes
+- one task (building the agent and answering the question, i.e. running the
+  script once): the first run in a process, then p50/p99 over --runs runs
+- LLM round trips and tokens per task, counted by the stub
+- throughput and latency with --concurrency tasks running at once
+- memory after the imports and at the peak
+
+Each framework runs in its own process so their imports and memory don't
+mix. Frameworks that aren't installed are listed as such.
+
+    uv run benchmarks/bench_agents.py [--runs 50] [--concurrency 8] [--ttft 0] [--frameworks adk,langgraph]
+
+Results go to .cache/benchmarks/agents-<commit>.json by default.
+"""
+import os
+import sys
+import json
+import time
+import runpy
+import argparse
+import datetime
+import platform
+import importlib
+import statistics
+import subprocess
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from build_cache import CACHE_DIR
+from tracing import peak_rss_mb, percentile
+from stub_llm import start_stub_process
+from bench_archive import git_commit
+
+AGENT_POST = os.path.join(ROOT, "posts", "2025-11-09-the-ai-agent-version-of-hello-world-in-different-frameworks")
+# Framework: (script, modules the script imports). The notebook-only LlamaIndex
+# version uses top-level await, its script twin is the same agent
+FRAMEWORKS = {
+    "smolagents": ("two_tool_agent.py", ["smolagents"]),
+    "adk": ("two_tool_agent_adk.py", ["google.adk.agents", "google.adk.runners", "google.adk.sessions",
+                                      "google.genai.types"]),
+    "langgraph": ("two_tool_agent_langgraph.py", ["langchain_core.tools", "langchain_openai", "langgraph.prebuilt"]),
+    "llamaindex": ("two_tool_agent_llamaindex_script.py", ["llama_index.core.agent.workflow",
+                                                           "llama_index.core.tools", "llama_index.llms.openai"]),
+}
+
+def stub_env(base_url):
+    """Point the OpenAI, LiteLLM and Gemini clients at the stub."""
+    return {"OPENAI_API_KEY": "stub-key", "OPENAI_BASE_URL": f"{base_url}/v1", "OPENAI_API_BASE": f"{base_url}/v1",
+            "GOOGLE_API_KEY": "stub-key", "GOOGLE_GEMINI_BASE_URL": base_url, "GOOGLE_GENAI_USE_VERTEXAI": "false",
+            "LITELLM_LOCAL_MODEL_COST_MAP": "True"}
+
+def stub_stats(base_url):
+    with urllib.request.urlopen(f"{base_url}/stats") as response:
+        stats = json.load(response)
+    return sum(stats["requests"].values()), stats["prompt_tokens"], stats["completion_tokens"]
+
+def import_seconds(modules, runs):
+    """Median time to import modules in a fresh interpreter."""
+    code = ("import time, importlib; start = time.perf_counter()\n"
+            f"for module in {modules!r}: importlib.import_module(module)\n"
+            "print(time.perf_counter() - start)")
+    times = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+        if result.returncode != 0:
+            return None
+        times.append(float(result.stdout.strip().splitlines()[-1]))
+    return statistics.median(times)
+
+def run_task(script_path):
+    """Run the agent script once. Returns (seconds, error)."""
+    start = time.perf_counter()
+    try:
+        runpy.run_path(script_path, run_name="__main__")
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return time.perf_counter() - start, error
+
+def worker(framework, runs, concurrency, base_url):
+    """Runs in a subprocess per framework, prints the results as one JSON line."""
+    script, modules = FRAMEWORKS[framework]
+    script_path = os.path.join(AGENT_POST, script)
+    out = sys.stdout
+    # The agents print their steps, that's not what is being timed
+    sys.stdout = open(os.devnull, "w")
+    try:
+        for module in modules:
+            importlib.import_module(module)
+    except ImportError as e:
+        print(json.dumps({"framework": framework, "error": f"not installed ({e.name})"}), file=out)
+        return
+    result = {"framework": framework, "rss_after_import_mb": peak_rss_mb()}
+
+    result["first_seconds"], error = run_task(script_path)
+    if error:
+        print(json.dumps({**result, "error": error}), file=out)
+        return
+
+    trips, prompt_tokens, completion_tokens = stub_stats(base_url)
+    sequential = [run_task(script_path) for _ in range(runs)]
+    after = stub_stats(base_url)
+    latencies = [seconds for seconds, _ in sequential]
+    result.update({
+        "runs": runs, "errors": sum(1 for _, error in sequential if error),
+        "p50_seconds": statistics.median(latencies), "p99_seconds": percentile(latencies, 0.99),
+        "round_trips": (after[0] - trips) / runs,
+        "prompt_tokens": (after[1] - prompt_tokens) / runs,
+        "completion_tokens": (after[2] - completion_tokens) / runs})
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        concurrent = list(pool.map(lambda _: run_task(script_path), range(runs)))
+    elapsed = time.perf_counter() - start
+    latencies = [seconds for seconds, _ in concurrent]
+    result["concurrent"] = {
+        "concurrency": concurrency, "errors": sum(1 for _, error in concurrent if error),
+        "per_second": runs / elapsed, "p50_seconds": statistics.median(latencies),
+        "p99_seconds": percentile(latencies, 0.99)}
+    result["peak_rss_mb"] = peak_rss_mb()
+    print(json.dumps(result), file=out)
+
+def run_worker(framework, args, base_url):
+    env = dict(os.environ, **stub_env(base_url), PYTHONPATH=ROOT)
+    result = subprocess.run([sys.executable, __file__, "--worker", framework, "--runs", str(args.runs),
+                             "--concurrency", str(args.concurrency), "--stub-url", base_url],
+                            env=env, capture_output=True, text=True, cwd=AGENT_POST)
+    lines = result.stdout.strip().splitlines()
+    if result.returncode != 0 or not lines:
+        return {"framework": framework, "error": (result.stderr.strip().splitlines() or ["crashed"])[-1]}
+    return json.loads(lines[-1])
+
+def print_table(results):
+    print(f"{'framework':<12} {'import':>7} {'first':>7} {'p50':>8} {'p99':>8} {'trips':>5} {'ms/trip':>7} "
+          f"{'tokens':>7} {'conc/s':>7} {'conc p50':>8} {'conc p99':>8} {'RSS imp':>7} {'RSS peak':>8}")
+    for result in results:
+        name = result["framework"]
+        imported = f"{result['import_seconds']:>6.2f}s" if result.get("import_seconds") is not None else f"{'-':>7}"
+        if "error" in result:
+            print(f"{name:<12} {imported} {result['error']}")
+            continue
+        concurrent = result["concurrent"]
+        per_trip = result["p50_seconds"] / result["round_trips"] * 1000 if result["round_trips"] else 0
+        print(f"{name:<12} {imported} {result['first_seconds']:>6.2f}s "
+              f"{result['p50_seconds'] * 1000:>6.1f}ms {result['p99_seconds'] * 1000:>6.1f}ms "
+              f"{result['round_trips']:>5.1f} {per_trip:>7.1f} "
+              f"{result['prompt_tokens'] + result['completion_tokens']:>7.0f} {concurrent['per_second']:>7.1f} "
+              f"{concurrent['p50_seconds'] * 1000:>6.1f}ms {concurrent['p99_seconds'] * 1000:>6.1f}ms "
+              f"{result['rss_after_import_mb']:>5.0f}MB {result['peak_rss_mb']:>6.0f}MB")
+        if result["errors"] or concurrent["errors"]:
+            print(f"{'':<12} {result['errors']} sequential and {concurrent['errors']} concurrent runs failed")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frameworks", default=",".join(FRAMEWORKS), help="Comma-separated frameworks to run")
+    parser.add_argument("--runs", type=int, default=50, help="Tasks to time, sequentially and then concurrently")
+    parser.add_argument("--concurrency", type=int, default=8, help="Tasks running at once in the concurrent runs")
+    parser.add_argument("--import-runs", type=int, default=5, help="Fresh processes to time the imports in")
+    parser.add_argument("--ttft", type=float, default=0.0, help="Stub seconds per reply, 0 leaves only framework time")
+    parser.add_argument("--tokens-per-second", type=float, default=1e6, help="Stub generation speed")
+    parser.add_argument("--output", help="Where to write the JSON, defaults to .cache/benchmarks/agents-<commit>.json")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--stub-url", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        return worker(args.worker, args.runs, args.concurrency, args.stub_url)
+
+    commit, dirty = git_commit()
+    stub, base_url = start_stub_process(ttft=args.ttft, tokens_per_second=args.tokens_per_second)
+    results = []
+    try:
+        for framework in args.frameworks.split(","):
+            result = run_worker(framework, args, base_url)
+            result["import_seconds"] = import_seconds(FRAMEWORKS[framework][1], args.import_runs)
+            results.append(result)
+            print(f"{framework}: {'done' if 'error' not in result else result['error']}", flush=True)
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    print()
+    print_table(results)
+    output = args.output or os.path.join(ROOT, CACHE_DIR, "benchmarks", f"agents-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"benchmark": "agents", "commit": commit, "dirty": dirty,
+                   "created": datetime.datetime.now().isoformat(timespec="seconds"),
+                   "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+                   "stub": {"ttft": args.ttft, "tokens_per_second": args.tokens_per_second},
+                   "runs": args.runs, "concurrency": args.concurrency, "frameworks": results}, f, indent=1)
+    print(f"Results written to {output}")
+
+if __name__ == "__main__":
+    main()
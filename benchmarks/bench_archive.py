@@ -0,0 +1,253 @@
+"""
+Time the blog maintenance hot paths on synthetic archives of 1k, 10k and 50k
+posts and write the results as JSON, so a regression shows up by comparing
+the files of two commits.
+
+For each archive size (see synthetic_archive.py) this times:
+
+- the pre-render pass, change_future_posts_to_draft.update_draft_status,
+  cold (no manifest), warm (nothing changed) and after editing 1% of posts
+- the card check, generate_social_media_cards.find_stale_cards, with no
+  manifest and with every card up to date
+- reading every post's front matter, and the post index cold and warm
+- `qblog2 new` with a few --url pages, end to end in a fresh process
+
+and once, the summarisation pipeline (qblog2.summarize through the router)
+against the stub LLM server in stub_llm.py, for Ollama and OpenAI, streamed
+and not. The stub runs in its own process so it doesn't skew the timings.
+
+    uv run benchmarks/bench_archive.py [--sizes 1000,10000,50000] [--output results.json] [--compare old.json]
+
+Results go to .cache/benchmarks/archive-<commit>.json by default.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import platform
+import tempfile
+import argparse
+import datetime
+import statistics
+import contextlib
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+from build_cache import CACHE_DIR
+from front_matter import read_front_matter
+from post_index import PostIndex, find_notebooks
+from change_future_posts_to_draft import update_draft_status
+from generate_social_media_cards import find_stale_cards, card_style_hash
+from synthetic_archive import write_archive
+from stub_llm import start_stub_process, article
+
+QBLOG2 = os.path.join(ROOT, "qblog2.py")
+STUB_MODEL = "stub-model"
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+def quietly(fn, *args, **kwargs):
+    """Run fn with its per-post prints going nowhere."""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        return fn(*args, **kwargs)
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+
+def edit_posts(notebooks, fraction, rng):
+    """Append a sentence to the last cell of some notebooks, like editing a few posts."""
+    edited = rng.sample(notebooks, max(1, int(len(notebooks) * fraction)))
+    for notebook_path in edited:
+        with open(notebook_path, "r", encoding="utf-8") as f:
+            nb = json.load(f)
+        cell = nb["cells"][-1]
+        cell["source"] = "".join(cell["source"]) + "\nEdited."
+        with open(notebook_path, "w", encoding="utf-8") as f:
+            json.dump(nb, f, indent=1, ensure_ascii=False)
+    return len(edited)
+
+def bench_prerender(notebooks, rng):
+    cold, stats = timed(quietly, update_draft_status, full=True)
+    warm, _ = timed(quietly, update_draft_status)
+    edited = edit_posts(notebooks, 0.01, rng)
+    incremental, _ = timed(quietly, update_draft_status)
+    return {"cold_seconds": cold, "warm_seconds": warm, "incremental_seconds": incremental,
+            "edited_posts": edited, "rewritten": stats["rewritten"]}
+
+def bench_card_check(workdir):
+    style = card_style_hash(workdir)
+    cold, stale = timed(quietly, find_stale_cards, "posts", {}, style)
+    # As if every stale card had just been generated
+    manifest = {folder: current for folder, _, _, current in stale}
+    warm, still_stale = timed(quietly, find_stale_cards, "posts", manifest, style)
+    return {"cold_seconds": cold, "warm_seconds": warm, "stale_cold": len(stale), "stale_warm": len(still_stale)}
+
+def bench_front_matter(notebooks):
+    total, _ = timed(lambda: [read_front_matter(path) for path in notebooks])
+    index = PostIndex(os.path.join(CACHE_DIR, "posts.sqlite3"))
+    cold, _ = timed(index.update, "posts")
+    warm, _ = timed(index.update, "posts")
+    index.close()
+    return {"read_all_seconds": total, "per_post_us": total / len(notebooks) * 1e6,
+            "post_index_cold_seconds": cold, "post_index_warm_seconds": warm}
+
+def bench_new(workdir, env, base_url, pages):
+    urls_file = os.path.join(workdir, "urls.txt")
+    with open(urls_file, "w") as f:
+        f.write("\n".join(f"{base_url}/pages/{i}.html" for i in range(pages)) + "\n")
+    times = []
+    for i in range(2):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, QBLOG2, "new", f"Benchmark post {i}", "--urls-file", urls_file,
+                                 "--model", STUB_MODEL, "--no-cache"],
+                                cwd=workdir, env=env, capture_output=True, text=True)
+        times.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            raise RuntimeError(f"qblog2 new failed:\n{result.stderr}")
+    # Leave the archive as it was
+    for folder, _ in find_notebooks("posts"):
+        if "benchmark-post" in folder:
+            shutil.rmtree(os.path.join("posts", folder))
+    return {"pages": pages, "first_seconds": times[0], "second_seconds": times[1]}
+
+def bench_summaries(count, workers):
+    """
+    Summarise count pages through qblog2.summarize with the caches off, Ollama
+    then OpenAI. The router's per-backend limits apply, so Ollama calls queue
+    beyond two at a time.
+    """
+    import qblog2
+    import llm_cache
+
+    llm_cache.configure_cache(enabled=False)
+    contents = [article(i, paragraphs=20) for i in range(count)]
+    results = {}
+    for backend, model in (("ollama", STUB_MODEL), ("openai", "openai")):
+        for streamed in (False, True):
+            on_token = (lambda token: None) if streamed else None
+            def one(content):
+                start = time.perf_counter()
+                qblog2.summarize(content, [model], on_token=on_token)
+                return time.perf_counter() - start
+            # Not counting the first call, which imports and connects the client
+            qblog2.summarize(contents[0], [model], on_token=on_token)
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                latencies = sorted(pool.map(one, contents))
+            elapsed = time.perf_counter() - start
+            results[f"{backend}{'_streamed' if streamed else ''}"] = {
+                "summaries": count, "seconds": elapsed, "per_second": count / elapsed,
+                "p50_seconds": statistics.median(latencies),
+                "p99_seconds": latencies[int(0.99 * (len(latencies) - 1))]}
+    return results
+
+def flatten(results, prefix=""):
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif key.endswith("_seconds") or key.endswith("_us"):
+            flat[prefix + key] = value
+    return flat
+
+def compare(old_path, results):
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    before, after = flatten(old), flatten(results)
+    print(f"\nCompared with {old.get('commit', old_path)}:")
+    print(f"{'metric':<55} {'before':>10} {'after':>10} {'change':>8}")
+    for key in sorted(set(before) & set(after)):
+        if before[key]:
+            change = after[key] / before[key] - 1
+            flag = "  <-- slower" if change > 0.2 else ""
+            print(f"{key:<55} {before[key]:>10.4f} {after[key]:>10.4f} {change:>+7.0%}{flag}")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="1000,10000,50000", help="Comma-separated archive sizes")
+    parser.add_argument("--pages", type=int, default=5, help="Pages for `qblog2 new` to fetch and summarise")
+    parser.add_argument("--summaries", type=int, default=40, help="Summaries to time per backend")
+    parser.add_argument("--workers", type=int, default=4, help="Summaries in flight at once")
+    parser.add_argument("--ttft", type=float, default=0.05, help="Stub seconds to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=500, help="Stub generation speed")
+    parser.add_argument("--output", help="Where to write the JSON, defaults to .cache/benchmarks/archive-<commit>.json")
+    parser.add_argument("--compare", help="Earlier results to compare with")
+    args = parser.parse_args()
+
+    commit, dirty = git_commit()
+    stub, base_url = start_stub_process(ttft=args.ttft, tokens_per_second=args.tokens_per_second)
+    home = tempfile.mkdtemp()
+    with open(os.path.join(home, ".geir"), "w") as f:
+        f.write("stub-key")
+    stub_env = {"HOME": home, "OLLAMA_HOST": base_url, "OPENAI_BASE_URL": f"{base_url}/v1", "QBLOG_NO_DAEMON": "1"}
+    os.environ.update(stub_env)
+    env = dict(os.environ, PYTHONPATH=ROOT)
+
+    results = {"benchmark": "archive", "commit": commit, "dirty": dirty,
+               "created": datetime.datetime.now().isoformat(timespec="seconds"),
+               "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+               "stub": {"ttft": args.ttft, "tokens_per_second": args.tokens_per_second}, "sizes": {}}
+    rng = random.Random(0)
+    cwd = os.getcwd()
+    try:
+        for size in [int(size) for size in args.sizes.split(",")]:
+            workdir = tempfile.mkdtemp()
+            try:
+                generate, archive = timed(write_archive, workdir, size)
+                os.chdir(workdir)
+                notebooks = [path for _, path in find_notebooks("posts")]
+                result = {"posts": size, "archive_mb": archive["bytes"] / 1024 / 1024,
+                          "generate_seconds": generate,
+                          "front_matter": bench_front_matter(notebooks),
+                          "prerender": bench_prerender(notebooks, rng),
+                          "card_check": bench_card_check(workdir),
+                          "qblog2_new": bench_new(workdir, env, base_url, args.pages)}
+                results["sizes"][str(size)] = result
+                print(f"{size:>6} posts ({result['archive_mb']:.0f} MB): "
+                      f"pre-render {result['prerender']['cold_seconds']:.2f}s cold / "
+                      f"{result['prerender']['warm_seconds']:.2f}s warm / "
+                      f"{result['prerender']['incremental_seconds']:.2f}s after 1% edits, "
+                      f"card check {result['card_check']['cold_seconds']:.2f}s / "
+                      f"{result['card_check']['warm_seconds']:.2f}s, "
+                      f"front matter {result['front_matter']['per_post_us']:.0f}us/post, "
+                      f"post index {result['front_matter']['post_index_cold_seconds']:.2f}s / "
+                      f"{result['front_matter']['post_index_warm_seconds']:.2f}s, "
+                      f"qblog2 new {result['qblog2_new']['first_seconds']:.2f}s / "
+                      f"{result['qblog2_new']['second_seconds']:.2f}s", flush=True)
+            finally:
+                os.chdir(cwd)
+                shutil.rmtree(workdir, ignore_errors=True)
+
+        results["summarisation"] = bench_summaries(args.summaries, args.workers)
+        for name, entry in results["summarisation"].items():
+            print(f"summarise ({name}): {entry['per_second']:.1f}/s with {args.workers} workers, "
+                  f"p50 {entry['p50_seconds'] * 1000:.0f}ms, p99 {entry['p99_seconds'] * 1000:.0f}ms")
+    finally:
+        stub.terminate()
+        stub.wait()
+        shutil.rmtree(home, ignore_errors=True)
+
+    output = args.output or os.path.join(ROOT, CACHE_DIR, "benchmarks", f"archive-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=1)
+    print(f"Results written to {output}")
+    if args.compare:
+        compare(args.compare, results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Throughput and latency of batch_agent_runner.py (in the 2025-11-09 agents
+post) at several concurrency levels, against the stub model in stub_llm.py.
+
+Writes --questions random "What is the average of ...?" questions, runs
+them through the ADK and LlamaIndex agents at each --concurrency, and checks
+every answer against the real average. The stub takes --ttft seconds per
+reply, like a model that's quick but not instant, so concurrency has
+latency to hide.
+
+    uv run benchmarks/bench_batch_agents.py [--questions 2000] [--concurrency 1,16,64,256] [--frameworks adk,llamaindex]
+
+Results go to .cache/benchmarks/batch-agents-<commit>.json by default.
+"""
+import os
+import sys
+import json
+import random
+import argparse
+import datetime
+import platform
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from build_cache import CACHE_DIR
+from stub_llm import start_stub_process, last_number
+from bench_agents import ROOT, AGENT_POST, stub_env
+from bench_archive import git_commit
+
+RUNNER = os.path.join(AGENT_POST, "batch_agent_runner.py")
+
+def write_questions(path, count, seed=0):
+    """Write count questions to path and return their averages by id."""
+    rng = random.Random(seed)
+    expected = {}
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(count):
+            numbers = [rng.randint(1, 1000) for _ in range(rng.randint(2, 12))]
+            expected[f"q{i}"] = sum(numbers) / len(numbers)
+            f.write(json.dumps({"id": f"q{i}", "question": f"What is the average of {', '.join(map(str, numbers))}?"})
+                    + "\n")
+    return expected
+
+def run(framework, concurrency, questions_path, output_path, base_url):
+    result = subprocess.run([sys.executable, RUNNER, questions_path, "--framework", framework,
+                             "--concurrency", str(concurrency), "--output", output_path],
+                            env=dict(os.environ, **stub_env(base_url)), cwd=AGENT_POST,
+                            capture_output=True, text=True)
+    lines = result.stderr.strip().splitlines()
+    if result.returncode != 0 or not lines:
+        return {"error": (lines or ["crashed"])[-1]}
+    try:
+        return json.loads(lines[-1])
+    except ValueError:
+        return {"error": lines[-1]}
+
+def count_correct(output_path, expected):
+    correct = 0
+    with open(output_path, "r", encoding="utf-8") as f:
+        for line in f:
+            result = json.loads(line)
+            if result["answer"] and abs(last_number(result["answer"]) - expected[result["id"]]) < 1e-6:
+                correct += 1
+    return correct
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=2000)
+    parser.add_argument("--concurrency", default="1,16,64,256", help="Comma-separated concurrency levels")
+    parser.add_argument("--frameworks", default="adk,llamaindex")
+    parser.add_argument("--ttft", type=float, default=0.05, help="Stub seconds per reply")
+    parser.add_argument("--output", help="Where to write the JSON, defaults to .cache/benchmarks/batch-agents-<commit>.json")
+    args = parser.parse_args()
+
+    commit, dirty = git_commit()
+    workdir = tempfile.mkdtemp()
+    questions_path = os.path.join(workdir, "questions.jsonl")
+    expected = write_questions(questions_path, args.questions)
+    stub, base_url = start_stub_process(ttft=args.ttft, tokens_per_second=1e6)
+    results = []
+    try:
+        print(f"{'framework':<12} {'conc':>5} {'per sec':>8} {'p50':>8} {'p99':>8} {'errors':>6} {'correct':>8}")
+        for framework in args.frameworks.split(","):
+            for concurrency in [int(level) for level in args.concurrency.split(",")]:
+                output_path = os.path.join(workdir, f"{framework}-{concurrency}.jsonl")
+                summary = run(framework, concurrency, questions_path, output_path, base_url)
+                entry = {"framework": framework, "concurrency": concurrency, **summary}
+                results.append(entry)
+                if "error" in summary:
+                    print(f"{framework:<12} {concurrency:>5} {summary['error']}", flush=True)
+                    break
+                entry["correct"] = count_correct(output_path, expected)
+                print(f"{framework:<12} {concurrency:>5} {summary['per_second']:>8.1f} "
+                      f"{summary['p50_seconds'] * 1000:>6.0f}ms {summary['p99_seconds'] * 1000:>6.0f}ms "
+                      f"{summary['errors']:>6} {entry['correct']:>8}", flush=True)
+    finally:
+        stub.terminate()
+        stub.wait()
+
+    output = args.output or os.path.join(ROOT, CACHE_DIR, "benchmarks", f"batch-agents-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"benchmark": "batch-agents", "commit": commit, "dirty": dirty,
+                   "created": datetime.datetime.now().isoformat(timespec="seconds"),
+                   "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+                   "questions": args.questions, "stub": {"ttft": args.ttft}, "results": results}, f, indent=1)
+    print(f"Results written to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Compare qblog2 command latency with and without the `qblog2 serve` daemon.
+
+Each command is run as a fresh `python qblog2.py ...` process, first with
+QBLOG_NO_DAEMON=1 (cold: imports and clients set up on every run) and then
+against a daemon started for the benchmark (warm). Everything runs in a
+temporary directory so no posts or caches are left behind.
+
+    uv run benchmarks/bench_daemon.py [--repeat 5] [--url http://localhost:8000/page.html]
+"""
+import os
+import sys
+import time
+import shutil
+import signal
+import tempfile
+import argparse
+import statistics
+import subprocess
+
+QBLOG2 = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "qblog2.py"))
+
+def run(args, cwd, env):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, QBLOG2] + args, cwd=cwd, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"qblog2 {' '.join(args)} failed:\n{result.stderr}")
+    return elapsed
+
+def time_commands(commands, repeat, cwd, env):
+    return {" ".join(args): [run(args, cwd, env) for _ in range(repeat)] for args in commands}
+
+def wait_for_socket(path, daemon, timeout=60):
+    deadline = time.time() + timeout
+    while not os.path.exists(path):
+        if daemon.poll() is not None or time.time() > deadline:
+            raise RuntimeError("The qblog2 daemon didn't start")
+        time.sleep(0.05)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--url", help="Also time `new --no-summary` on this page")
+    args = parser.parse_args()
+
+    commands = [["--help"], ["cache"], ["models"], ["new", "Daemon benchmark"]]
+    if args.url:
+        commands.append(["new", "Daemon benchmark", "--url", args.url, "--no-summary"])
+
+    workdir = tempfile.mkdtemp()
+    socket_path = os.path.join(workdir, "qblog2.sock")
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(QBLOG2), QBLOG_SOCKET=socket_path)
+    try:
+        cold = time_commands(commands, args.repeat, workdir, dict(env, QBLOG_NO_DAEMON="1"))
+
+        start = time.perf_counter()
+        daemon = subprocess.Popen([sys.executable, QBLOG2, "serve"], cwd=workdir, env=env,
+                                  stdout=subprocess.DEVNULL)
+        try:
+            wait_for_socket(socket_path, daemon)
+            print(f"Daemon ready in {time.perf_counter() - start:.2f}s")
+            warm = time_commands(commands, args.repeat, workdir, env)
+        finally:
+            # Same as Ctrl-C, so the daemon removes its socket
+            daemon.send_signal(signal.SIGINT)
+            daemon.wait()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'command':<50} {'cold':>9} {'warm':>9} {'speedup':>8}")
+    for command in cold:
+        cold_ms = statistics.median(cold[command]) * 1000
+        warm_ms = statistics.median(warm[command]) * 1000
+        print(f"{command[:50]:<50} {cold_ms:>7.0f}ms {warm_ms:>7.0f}ms {cold_ms / warm_ms:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Compare html_extract against the BeautifulSoup extraction qblog.py and
+qblog2.py used before, in MB/s and peak memory. The html_extract rows time
+what fetch_content runs: pages decoded from 64KB byte chunks and fed to
+StreamingExtractor, on lxml and on the html.parser fallback.
+
+Uses a synthetic corpus of blog-like pages by default, or every .html file
+under --corpus. Each extractor runs in a fresh process so the peak RSS
+numbers don't bleed into each other.
+
+    uv run benchmarks/bench_extract.py [--corpus _site] [--repeat 3]
+"""
+import os
+import sys
+import glob
+import time
+import random
+import resource
+import argparse
+import multiprocessing
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from bs4 import BeautifulSoup
+import html_extract
+import web_fetch
+
+def qblog_before(html):
+    # qblog.fetch_website_content before html_extract
+    soup = BeautifulSoup(html, "html.parser")
+    main_content = soup.find("article")
+    if not main_content:
+        main_content = soup.find("main")
+    if not main_content:
+        main_content = soup.find("div", {"class": "content"})
+    if main_content:
+        return main_content.get_text(separator="\n").strip()
+    paragraphs = soup.find_all("p")
+    return "\n\n".join(p.get_text() for p in paragraphs).strip()
+
+def qblog2_before(html):
+    # qblog2.new before html_extract
+    soup = BeautifulSoup(html, 'html.parser')
+    for tag in soup(['header', 'footer', 'nav', 'aside']):
+        tag.decompose()
+    return soup.get_text()
+
+def streaming(html):
+    # web_fetch.fetch_content on a downloaded page, without a token budget
+    chunks = (html[i:i + web_fetch.CHUNK_SIZE] for i in range(0, len(html), web_fetch.CHUNK_SIZE))
+    return web_fetch._extract_chunks(chunks, "utf-8", None, web_fetch.DEFAULT_MAX_BYTES)[0]
+
+def streaming_html_parser(html):
+    html_extract.etree = None
+    return streaming(html)
+
+EXTRACTORS = {
+    "qblog (bs4, before)": qblog_before,
+    "qblog2 (bs4, before)": qblog2_before,
+    "html_extract (html.parser)": streaming_html_parser,
+    "html_extract (lxml)": streaming,
+}
+
+def synthetic_page(rng, paragraphs):
+    words = "the model context token embedding agent vector search page summary blog python".split()
+    def sentence():
+        return " ".join(rng.choice(words) for _ in range(rng.randint(8, 20))).capitalize() + "."
+    nav = "".join(f'<li><a href="/p/{i}">Link {i}</a></li>' for i in range(60))
+    body = "".join(f"<p>{sentence()} <em>{sentence()}</em> {sentence()}</p>" for _ in range(paragraphs))
+    script = "<script>" + "var x = 1;" * 2000 + "</script>"
+    return (f"<html><head><title>Page</title>{script}<style>p{{color:red}}</style></head><body>"
+            f"<header><nav><ul>{nav}</ul></nav></header><main><article><h1>Title</h1>{body}</article></main>"
+            f"<aside>{sentence()}</aside><footer>{sentence()}</footer></body></html>")
+
+def load_corpus(corpus_dir):
+    if corpus_dir:
+        pages = []
+        for path in glob.glob(os.path.join(corpus_dir, "**", "*.html"), recursive=True):
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                pages.append(f.read())
+        return pages
+    rng = random.Random(0)
+    return [synthetic_page(rng, n) for n in [50, 200, 1000, 5000, 20000]]
+
+def run_extractor(name, corpus_dir, repeat, results):
+    pages = load_corpus(corpus_dir)
+    extract = EXTRACTORS[name]
+    if extract in (streaming, streaming_html_parser):
+        # fetch_content reads bytes off the network
+        pages = [html.encode("utf-8") for html in pages]
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for html in pages:
+            extract(html)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before
+    megabytes = sum(len(html if isinstance(html, bytes) else html.encode("utf-8")) for html in pages) * repeat / 1024 / 1024
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    peak_mb = peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+    results.put((name, megabytes, elapsed, peak_mb))
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--corpus", help="Directory of .html files, defaults to a synthetic corpus")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    if html_extract.etree is None:
+        EXTRACTORS.pop("html_extract (lxml)")
+        print("lxml is not installed, skipping the lxml engine")
+
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    print(f"{'extractor':<30} {'MB':>8} {'seconds':>8} {'MB/s':>8} {'peak RSS':>10}")
+    for name in EXTRACTORS:
+        process = ctx.Process(target=run_extractor, args=(name, args.corpus, args.repeat, results))
+        process.start()
+        name, megabytes, elapsed, peak_mb = results.get()
+        process.join()
+        print(f"{name:<30} {megabytes:>8.1f} {elapsed:>8.2f} {megabytes / elapsed:>8.1f} {peak_mb:>8.1f}MB")
+
+if __name__ == "__main__":
+    main()
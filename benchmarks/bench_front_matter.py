@@ -0,0 +1,62 @@
+"""
+Compare reading a post's front matter with nbformat against the streaming
+reader in front_matter.py.
+
+Runs over the real posts plus a synthetic notebook with large base64 image
+outputs, like the Titanic and embeddings posts but bigger.
+
+    uv run benchmarks/bench_front_matter.py
+"""
+import os
+import sys
+import glob
+import time
+import base64
+import tempfile
+import nbformat
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from front_matter import read_front_matter
+
+def nbformat_front_matter(notebook_path):
+    # What the scripts did before front_matter.py
+    with open(notebook_path, "r", encoding="utf-8") as f:
+        nb = nbformat.read(f, as_version=4)
+    return nb.cells[0].source if nb.cells else None
+
+def make_large_notebook(path, n_images=40, image_bytes=256 * 1024):
+    nb = nbformat.v4.new_notebook()
+    nb.cells.append(nbformat.v4.new_raw_cell('---\ntitle: "Big post"\ndate: "2025-01-01"\ndraft: "false"\n---\n'))
+    png = base64.b64encode(os.urandom(image_bytes)).decode("ascii")
+    for i in range(n_images):
+        cell = nbformat.v4.new_code_cell(f"plot({i})")
+        cell.outputs = [nbformat.v4.new_output("display_data", data={"image/png": png})]
+        nb.cells.append(cell)
+    with open(path, "w", encoding="utf-8") as f:
+        nbformat.write(nb, f)
+
+def time_per_call(fn, path, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(path)
+    return (time.perf_counter() - start) / repeat
+
+def main():
+    root = os.path.join(os.path.dirname(__file__), "..")
+    with tempfile.TemporaryDirectory() as tmp:
+        large = os.path.join(tmp, "index.ipynb")
+        make_large_notebook(large)
+        paths = sorted(glob.glob(os.path.join(root, "posts", "*", "index.ipynb")), key=os.path.getsize)[-3:]
+        paths.append(large)
+
+        print(f"{'notebook':<60} {'size':>9} {'nbformat':>10} {'streaming':>10} {'speedup':>8}")
+        for path in paths:
+            repeat = 5 if os.path.getsize(path) > 1 << 20 else 50
+            before = time_per_call(nbformat_front_matter, path, repeat)
+            after = time_per_call(read_front_matter, path, repeat)
+            name = os.path.basename(os.path.dirname(path)) if path != large else "synthetic (40 x 256KB images)"
+            print(f"{name[:60]:<60} {os.path.getsize(path) / 1024:>7.0f}KB "
+                  f"{before * 1000:>8.2f}ms {after * 1000:>8.3f}ms {before / after:>7.0f}x")
+
+if __name__ == "__main__":
+    main()
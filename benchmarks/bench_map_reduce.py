@@ -0,0 +1,69 @@
+"""
+Compare map-reduce summaries with one single-shot prompt on long pages, in
+tokens sent and wall-clock time.
+
+Pages are the stub LLM's synthetic articles, extracted like fetch_content
+does. By default the model is simulated in-process: each call waits for the
+prompt to be read at --prefill tokens/s and the summary to be written at
+--decode tokens/s, which is roughly how a local model behaves (unlike the
+stub server, whose replies take the same time whatever the prompt). Pass
+--model to call that Ollama model at OLLAMA_HOST instead.
+
+    uv run benchmarks/bench_map_reduce.py [--paragraphs 200 1000 4000] [--max-tokens 6000] [--model llama3.1]
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from html_extract import extract_content
+from map_reduce import map_reduce_summarize, format_report, count_tokens, DEFAULT_WORKERS
+from stub_llm import article
+
+def simulated_model(ttft, prefill, decode, completion_tokens):
+    def summarize(text, template):
+        time.sleep(ttft + count_tokens(text) / prefill + completion_tokens / decode)
+        return " ".join(text.split()[:completion_tokens])
+    return summarize
+
+def ollama_model(model):
+    import qblog2
+    import llm_cache
+
+    # Every call should reach the model
+    llm_cache.configure_cache(enabled=False)
+    return lambda text, template: qblog2.summarize_with_ollama(text, model, template=template)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--paragraphs", type=int, nargs="+", default=[200, 1000, 4000], help="Page sizes to try")
+    parser.add_argument("--max-tokens", type=int, default=6000, help="Token budget per prompt, like qblog.py")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--model", help="Ollama model to call instead of the simulated one")
+    parser.add_argument("--ttft", type=float, default=0.2, help="Simulated seconds before the first token")
+    parser.add_argument("--prefill", type=float, default=1000, help="Simulated prompt tokens per second")
+    parser.add_argument("--decode", type=float, default=40, help="Simulated summary tokens per second")
+    parser.add_argument("--completion-tokens", type=int, default=120, help="Simulated summary length")
+    args = parser.parse_args()
+
+    if args.model:
+        summarize = ollama_model(args.model)
+    else:
+        summarize = simulated_model(args.ttft, args.prefill, args.decode, args.completion_tokens)
+
+    print(f"{'paragraphs':>10} {'tokens':>8} {'chunks':>6} {'sent':>8} {'map-reduce':>11} {'single shot':>12}")
+    for paragraphs in args.paragraphs:
+        _, text = extract_content(article(paragraphs, paragraphs))
+        _, report = map_reduce_summarize(text, summarize, args.max_tokens, workers=args.workers)
+
+        start = time.perf_counter()
+        summarize(text, None)
+        report["single_shot_seconds"] = time.perf_counter() - start
+
+        print(f"{paragraphs:>10} {report['raw_tokens']:>8} {report['chunks']:>6} {report['tokens_sent']:>8} "
+              f"{report['seconds']:>10.1f}s {report['single_shot_seconds']:>11.1f}s")
+        print(f"{'':>10} {format_report(report)}")
+
+if __name__ == "__main__":
+    main()
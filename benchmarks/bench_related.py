@@ -0,0 +1,49 @@
+"""
+Time the related-posts computation on a synthetic archive: a full run over
+every post, then an incremental run after a few posts changed.
+
+    uv run benchmarks/bench_related.py [--posts 5000] [--dims 768] [--changed 10]
+"""
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from embeddings import normalize
+from related_posts import compute_related
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--dims", type=int, default=768)
+    parser.add_argument("--changed", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    matrix = normalize(rng.standard_normal((args.posts, args.dims)))
+    folders = [f"post-{i:06d}" for i in range(args.posts)]
+    hashes = [f"hash-{i}" for i in range(args.posts)]
+    candidate = np.ones(args.posts, dtype=bool)
+
+    start = time.perf_counter()
+    related, recomputed, _ = compute_related(folders, hashes, matrix, candidate, {})
+    print(f"Full: {recomputed} posts in {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    manifest = {folder: {"hash": h, "candidate": True, "related": related[folder]}
+                for folder, h in zip(folders, hashes)}
+    for i in rng.choice(args.posts, args.changed, replace=False):
+        matrix[i] = normalize(rng.standard_normal((1, args.dims)))[0]
+        hashes[i] = f"changed-{i}"
+    start = time.perf_counter()
+    incremental, recomputed, reused = compute_related(folders, hashes, matrix, candidate, manifest)
+    elapsed = time.perf_counter() - start
+    full, _, _ = compute_related(folders, hashes, matrix, candidate, {})
+    same = all([n for n, _ in incremental[f]] == [n for n, _ in full[f]] for f in folders)
+    print(f"Incremental after {args.changed} changed: recomputed {recomputed}, reused {reused} "
+          f"in {elapsed * 1000:.0f}ms (matches full run: {same})")
+
+if __name__ == "__main__":
+    main()
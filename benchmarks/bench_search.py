@@ -0,0 +1,89 @@
+"""
+Benchmark the post search index: full build throughput, an incremental
+update after editing one post, and query latency against the memory-mapped
+index.
+
+Runs on a synthetic archive of --posts notebooks in a temporary directory,
+embedded with the deterministic stub embedder unless --embedder says
+otherwise (e.g. ollama:nomic-embed-text).
+
+    uv run benchmarks/bench_search.py [--posts 1000] [--queries 200] [--embedder stub]
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import tempfile
+import argparse
+import statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from embeddings import get_embedder
+from post_index import PostIndex
+from post_search import SearchIndex
+
+WORDS = ("the model context token embedding agent vector search page summary blog python ollama "
+         "openai faiss chunk query notebook render draft card llama deepseek football data").split()
+
+def sentence(rng, n=12):
+    return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+def write_post(posts_dir, i, rng):
+    folder = os.path.join(posts_dir, f"2025-01-01-post-{i}")
+    os.makedirs(folder, exist_ok=True)
+    cells = [{"cell_type": "raw", "metadata": {}, "source": f'---\ntitle: "Post {i}"\ndate: "2025-01-01"\n---\n'}]
+    for _ in range(rng.randint(4, 12)):
+        cells.append({"cell_type": "markdown", "metadata": {},
+                      "source": "\n\n".join(" ".join(sentence(rng) for _ in range(4)) for _ in range(3))})
+        cells.append({"cell_type": "code", "metadata": {}, "outputs": [], "execution_count": None,
+                      "source": f"import {rng.choice(WORDS)}\nresult = {rng.choice(WORDS)}.run('{sentence(rng, 4)}')"})
+    with open(os.path.join(folder, "index.ipynb"), "w", encoding="utf-8") as f:
+        json.dump({"cells": cells, "metadata": {}, "nbformat": 4, "nbformat_minor": 5}, f)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--embedder", default="stub")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    workdir = tempfile.mkdtemp()
+    posts_dir = os.path.join(workdir, "posts")
+    try:
+        for i in range(args.posts):
+            write_post(posts_dir, i, rng)
+        embedder = get_embedder(args.embedder)
+        post_index = PostIndex(os.path.join(workdir, "posts.sqlite3"))
+        index = SearchIndex(os.path.join(workdir, "search"))
+
+        stats = index.update(embedder, posts_dir, post_index)
+        print(f"Full build: {stats['posts']} posts, {stats['chunks']} chunks in {stats['seconds']:.2f}s "
+              f"({stats['chunks'] / stats['seconds']:.0f} chunks/s, "
+              f"{stats['chunks'] / stats['embed_seconds']:.0f} chunks/s embedding)")
+
+        write_post(posts_dir, 0, rng)
+        stats = index.update(embedder, posts_dir, post_index)
+        print(f"Incremental update: {stats['changed']} changed post, {stats['chunks']} chunks in "
+              f"{stats['seconds'] * 1000:.0f}ms")
+
+        stats = index.update(embedder, posts_dir, post_index)
+        print(f"No-op update: {stats['seconds'] * 1000:.0f}ms")
+
+        size_mb = os.path.getsize(index.index_path) / 1024 / 1024
+        latencies = []
+        for _ in range(args.queries):
+            query = sentence(rng, 5)
+            start = time.perf_counter()
+            index.search(query, embedder, k=5)
+            latencies.append((time.perf_counter() - start) * 1000)
+        latencies.sort()
+        print(f"Query latency over {args.queries} queries ({size_mb:.1f} MB index, memory-mapped): "
+              f"p50 {statistics.median(latencies):.2f}ms, p99 {latencies[int(0.99 * (len(latencies) - 1))]:.2f}ms")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Time the browser-free card rasterizer against shot-scraper.
+
+The raster engine is timed on every post, serially and across all cores.
+shot-scraper is only timed if the site has been rendered to _site/ and
+shot-scraper is installed, on a handful of posts since it is slow.
+
+    uv run benchmarks/bench_social_cards.py [--shots 3]
+"""
+import os
+import sys
+import glob
+import time
+import shutil
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from front_matter import read_front_matter
+from card_raster import draw_cards
+from generate_social_media_cards import run_shot_scraper
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shots", type=int, default=3, help="Posts to time shot-scraper on")
+    args = parser.parse_args()
+
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+    logo_path = os.path.join(root, "blog-logo.svg")
+    folders = sorted(os.path.dirname(p) for p in glob.glob(os.path.join(root, "posts", "*", "index.ipynb")))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        jobs = [(read_front_matter(os.path.join(folder, "index.ipynb")),
+                 os.path.join(tmp, f"{i}.png"), logo_path) for i, folder in enumerate(folders)]
+
+        for workers in sorted({1, os.cpu_count() or 1}):
+            start = time.perf_counter()
+            draw_cards(jobs, workers)
+            elapsed = time.perf_counter() - start
+            print(f"raster, {workers:>2} workers: {len(jobs)} cards in {elapsed:.2f}s "
+                  f"({elapsed / len(jobs) * 1000:.1f}ms/card)")
+
+        site_pages = [os.path.join("_site", "posts", os.path.basename(folder), "index.html") for folder in folders]
+        site_pages = [page for page in site_pages if os.path.exists(os.path.join(root, page))][:args.shots]
+        if not site_pages or not shutil.which("uv"):
+            print("shot-scraper: skipped, run `quarto render` first and make sure uv is installed")
+            return
+        os.chdir(root)
+        start = time.perf_counter()
+        for i, page in enumerate(site_pages):
+            run_shot_scraper(page, tmp, f"shot-{i}.png")
+        elapsed = time.perf_counter() - start
+        print(f"shot-scraper: {len(site_pages)} cards in {elapsed:.2f}s ({elapsed / len(site_pages) * 1000:.1f}ms/card)")
+
+if __name__ == "__main__":
+    main()
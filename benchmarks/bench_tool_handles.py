@@ -0,0 +1,173 @@
+"""
+How the two-tool agent's sum_numbers and divide_sum scale from 10 to 10^8
+numbers, given inline as JSON (what the model sends today) or as a
+tool_data handle (see tool_data.py in the 2025-11-09 agents post).
+
+For each size this times:
+
+- inline: parsing the tool call's JSON arguments and summing the list in
+  Python, plus the size of those arguments in bytes and rough tokens
+- handle: sum_numbers and divide_sum on a registered in-memory array
+- memmap: the same on a .npy file opened with register_file (just written,
+  so from the page cache)
+- agent: a whole task through the stub model, three round trips with an
+  OpenAI tool loop, inline and with a handle, and the prompt tokens the
+  stub counted for each
+
+Inline stops at --inline-max numbers, past that the JSON alone is
+gigabytes and far beyond any model's context.
+
+    uv run benchmarks/bench_tool_handles.py [--sizes 10,1000,100000,1000000,10000000,100000000] [--inline-max 1000000]
+
+Results go to .cache/benchmarks/tool-handles-<commit>.json by default.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import datetime
+import platform
+import tempfile
+import urllib.request
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from build_cache import CACHE_DIR
+from tracing import peak_rss_mb
+from stub_llm import start_stub_process
+from bench_agents import ROOT, AGENT_POST
+from bench_archive import git_commit
+
+sys.path.insert(0, AGENT_POST)
+import tool_data
+
+# Same as web_fetch.CHARS_PER_TOKEN
+CHARS_PER_TOKEN = 4
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+def inline_average(arguments):
+    """What the original tools do with a tool call's arguments."""
+    numbers = json.loads(arguments)["numbers"]
+    return sum(numbers) / len(numbers)
+
+def handle_average(handle):
+    return tool_data.divide_sum(tool_data.sum_numbers(handle), handle)
+
+def prompt_tokens(base_url):
+    with urllib.request.urlopen(f"{base_url}/stats") as response:
+        return json.load(response)["prompt_tokens"]
+
+def agent_task(client, question, functions):
+    """Answer question through the stub, calling functions for its tool calls. Returns the answer."""
+    tools = [{"type": "function", "function": {"name": name, "parameters": {"type": "object"}}} for name in functions]
+    messages = [{"role": "user", "content": question}]
+    while True:
+        message = client.chat.completions.create(model="stub", messages=messages, tools=tools).choices[0].message
+        if not message.tool_calls:
+            return message.content
+        call = message.tool_calls[0]
+        result = functions[call.function.name](**json.loads(call.function.arguments))
+        messages += [message.model_dump(exclude_none=True),
+                     {"role": "tool", "tool_call_id": call.id, "content": str(result)}]
+
+def timed_agent(client, base_url, question, functions):
+    before = prompt_tokens(base_url)
+    seconds, answer = timed(agent_task, client, question, functions)
+    return {"seconds": seconds, "prompt_tokens": prompt_tokens(base_url) - before, "answer": answer}
+
+def bench_size(size, inline_max, workdir, client, base_url):
+    values = np.random.default_rng(size).uniform(0, 100, size)
+    expected = float(values.mean())
+    result = {"size": size, "expected": expected}
+
+    handle = tool_data.register(values)
+    result["handle_seconds"], average = timed(handle_average, handle)
+    result["handle_error"] = abs(average - expected)
+
+    path = os.path.join(workdir, f"values-{size}.npy")
+    np.save(path, values)
+    mapped = tool_data.register_file(path)
+    result["memmap_seconds"], average = timed(handle_average, mapped)
+    result["memmap_error"] = abs(average - expected)
+    result["handle_argument_bytes"] = len(json.dumps({"handle": handle}))
+
+    result["agent_handle"] = timed_agent(client, base_url, f"What is the average of the numbers in {handle}?",
+                                         {"sum_numbers": tool_data.sum_numbers, "divide_sum": tool_data.divide_sum})
+
+    if size <= inline_max:
+        numbers = values.tolist()
+        arguments = json.dumps({"numbers": numbers})
+        result["inline_argument_bytes"] = len(arguments)
+        result["inline_tokens"] = len(arguments) // CHARS_PER_TOKEN
+        result["inline_seconds"], average = timed(inline_average, arguments)
+        result["inline_error"] = abs(average - expected)
+        question = f"What is the average of {', '.join(map(repr, numbers))}?"
+        result["agent_inline"] = timed_agent(client, base_url, question, {
+            "sum_numbers": lambda numbers: sum(numbers), "divide_sum": lambda total, length: total / length})
+        del numbers, arguments, question
+
+    tool_data.release(handle)
+    tool_data.release(mapped)
+    os.remove(path)
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+def print_row(result):
+    def ms(seconds):
+        return f"{seconds * 1000:.2f}ms"
+    if "inline_seconds" in result:
+        inline = [f"{result['inline_argument_bytes'] / 1024:.0f}KB", f"{result['inline_tokens']:,}",
+                  ms(result["inline_seconds"]), ms(result["agent_inline"]["seconds"]),
+                  f"{result['agent_inline']['prompt_tokens']:,}"]
+    else:
+        inline = ["-"] * 5
+    print(f"{result['size']:>11,} {inline[0]:>12} {inline[1]:>11} {inline[2]:>11} "
+          f"{ms(result['handle_seconds']):>11} {ms(result['memmap_seconds']):>11} {inline[3]:>11} "
+          f"{ms(result['agent_handle']['seconds']):>11} {inline[4]:>10} "
+          f"{result['agent_handle']['prompt_tokens']:>9,} {result['peak_rss_mb']:>7.0f}MB", flush=True)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="10,1000,100000,1000000,10000000,100000000",
+                        help="Comma-separated counts of numbers")
+    parser.add_argument("--inline-max", type=int, default=1_000_000, help="Largest size to also run inline")
+    parser.add_argument("--output", help="Where to write the JSON, defaults to .cache/benchmarks/tool-handles-<commit>.json")
+    args = parser.parse_args()
+
+    from openai import OpenAI
+
+    commit, dirty = git_commit()
+    stub, base_url = start_stub_process(ttft=0, tokens_per_second=1e6)
+    client = OpenAI(base_url=f"{base_url}/v1", api_key="stub-key", timeout=600)
+    workdir = tempfile.mkdtemp()
+    results = []
+    print(f"{'numbers':>11} {'inline args':>12} {'~tokens':>11} {'inline':>11} {'handle':>11} {'memmap':>11} "
+          f"{'agent inl.':>11} {'agent hdl.':>11} {'prompt inl.':>10} {'prompt h.':>9} {'RSS':>9}")
+    try:
+        for size in [int(size) for size in args.sizes.split(",")]:
+            result = bench_size(size, args.inline_max, workdir, client, base_url)
+            results.append(result)
+            print_row(result)
+    finally:
+        stub.terminate()
+        stub.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or os.path.join(ROOT, CACHE_DIR, "benchmarks", f"tool-handles-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({"benchmark": "tool-handles", "commit": commit, "dirty": dirty,
+                   "created": datetime.datetime.now().isoformat(timespec="seconds"),
+                   "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+                   "inline_max": args.inline_max, "results": results}, f, indent=1)
+    print(f"Results written to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,383 @@
+"""
+A local stand-in for Ollama and OpenAI, for benchmarks that shouldn't depend
+on a real model or the network.
+
+It answers Ollama's /api/generate, /api/chat and /api/embed, OpenAI's
+/v1/chat/completions and /v1/embeddings and Gemini's generateContent and
+streamGenerateContent, streamed or not, after a fixed time to first token
+and at a fixed number of tokens per second. It also serves synthetic article
+pages at /pages/<n>.html for the page fetcher. GET /stats has the request
+and token counts so far.
+
+Chat requests that offer tools (or carry a ReAct prompt, as LlamaIndex's
+ReActAgent does) get a scripted agent instead of random words, see
+agent_step(): call sum_numbers with the numbers in the question, then
+divide_sum with the total, then answer. A question naming a tool_data handle
+(arr_1f3a9c0e) gets the handle versions of the tools instead.
+
+    stub, url = start_stub_server(ttft=0.05, tokens_per_second=200)
+    os.environ["OLLAMA_HOST"] = url
+    os.environ["OPENAI_BASE_URL"] = url + "/v1"
+
+start_stub_process() runs it in its own process instead, so the stub's
+threads don't compete for the GIL with the code being timed. Or standalone:
+
+    uv run benchmarks/stub_llm.py --port 11435
+"""
+import re
+import sys
+import json
+import time
+import socket
+import subprocess
+import urllib.request
+import random
+import hashlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+WORDS = ("the model context token embedding agent vector search page summary blog python ollama "
+         "openai chunk query notebook draft card llama football data").split()
+EMBEDDING_DIMENSIONS = 64
+HANDLE = re.compile(r"\barr_[0-9a-f]{8}\b")
+NUMBER = re.compile(r"-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?")
+
+def reply_words(prompt, n):
+    rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+    return [rng.choice(WORDS) + " " for _ in range(n)]
+
+def embedding(text, dimensions=EMBEDDING_DIMENSIONS):
+    rng = random.Random(hashlib.sha256(text.encode("utf-8")).digest())
+    return [rng.uniform(-1, 1) for _ in range(dimensions)]
+
+def last_number(text):
+    numbers = NUMBER.findall(text)
+    return float(numbers[-1]) if numbers else 0.0
+
+def agent_step(question, results, final_tool=None):
+    """
+    The scripted agent for the two-tool posts: given the question and the
+    tool results so far, return the next (tool_name, arguments), or
+    (None, answer) when it's done. With final_tool (smolagents' final_answer)
+    the answer is given by calling that tool instead.
+    """
+    handle = HANDLE.search(question)
+    if handle:
+        if not results:
+            return "sum_numbers", {"handle": handle.group()}
+        if len(results) == 1:
+            return "divide_sum", {"total": last_number(results[0]), "handle": handle.group()}
+    else:
+        numbers = [float(number) for number in NUMBER.findall(question)]
+        if not results:
+            return "sum_numbers", {"numbers": numbers}
+        if len(results) == 1:
+            return "divide_sum", {"total": last_number(results[0]), "length": len(numbers)}
+    answer = f"The average is {last_number(results[-1])}."
+    if final_tool:
+        return final_tool, {"answer": answer}
+    return None, answer
+
+def _text(content):
+    # OpenAI message content is a string or a list of parts
+    if isinstance(content, list):
+        return "".join(part.get("text") or "" for part in content if isinstance(part, dict))
+    return content or ""
+
+def openai_agent_state(messages):
+    """The question and the tool results in an OpenAI message list, native tool calls or ReAct text."""
+    question, results = None, []
+    for message in messages:
+        text = _text(message.get("content"))
+        if message.get("role") == "tool":
+            results.append(text)
+        elif message.get("role") != "system" and "Observation:" in text:
+            results.append(text.rsplit("Observation:", 1)[1])
+        elif message.get("role") == "user" and question is None:
+            question = text
+    return question or "", results
+
+def gemini_agent_state(contents):
+    question, results = None, []
+    for content in contents:
+        for part in content.get("parts", []):
+            if "functionResponse" in part:
+                results.append(json.dumps(part["functionResponse"].get("response")))
+            elif part.get("text") and content.get("role") == "user" and question is None:
+                question = part["text"]
+    return question or "", results
+
+def is_react(messages):
+    return any("Action Input" in _text(message.get("content")) for message in messages
+               if message.get("role") == "system")
+
+def react_text(tool, arguments):
+    """A reply in the Thought/Action/Answer format of LlamaIndex's ReActAgent."""
+    if tool is None:
+        return f"Thought: I can answer without using any more tools.\nAnswer: {arguments}"
+    return f"Thought: I need to use a tool.\nAction: {tool}\nAction Input: {json.dumps(arguments)}"
+
+def article(number, paragraphs=30):
+    rng = random.Random(number)
+    def sentence():
+        return " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 20))).capitalize() + "."
+    nav = "".join(f'<li><a href="/pages/{i}.html">Page {i}</a></li>' for i in range(40))
+    body = "".join(f"<p>{sentence()} {sentence()} {sentence()}</p>" for _ in range(paragraphs))
+    return (f"<html><head><title>Page {number}</title></head><body><header><nav><ul>{nav}</ul></nav></header>"
+            f"<main><article><h1>Page {number}</h1>{body}</article></main><footer>Footer</footer></body></html>")
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, body, content_type="application/json", status=200):
+        body = body.encode("utf-8") if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_stream(self, content_type):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _chunk(self, text):
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_stream(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _tokens(self, prompt):
+        """Yield the reply's tokens, paced like a model: ttft first, then tokens_per_second."""
+        settings = self.server.settings
+        time.sleep(settings["ttft"])
+        for i, token in enumerate(reply_words(prompt, settings["completion_tokens"])):
+            if i:
+                time.sleep(1 / settings["tokens_per_second"])
+            yield token
+
+    def do_GET(self):
+        if self.path.startswith("/pages/") and self.path.endswith(".html"):
+            try:
+                number = int(self.path[len("/pages/"):-len(".html")])
+            except ValueError:
+                return self._send("Not found", "text/plain", 404)
+            return self._send(article(number, self.server.settings["paragraphs"]), "text/html; charset=utf-8")
+        if self.path == "/stats":
+            with self.server.lock:
+                return self._send(json.dumps(self.server.stats))
+        # The Ollama client checks the server is there with GET /
+        self._send("Ollama is running", "text/plain")
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+        path = self.path.split("?")[0]
+        with self.server.lock:
+            requests = self.server.stats["requests"]
+            requests[path] = requests.get(path, 0) + 1
+        model = body.get("model", "stub")
+        if self.path == "/api/embed":
+            texts = [body["input"]] if isinstance(body["input"], str) else body["input"]
+            return self._send(json.dumps({"model": model, "embeddings": [embedding(text) for text in texts]}))
+        if self.path == "/v1/embeddings":
+            texts = [body["input"]] if isinstance(body["input"], str) else body["input"]
+            dims = body.get("dimensions") or EMBEDDING_DIMENSIONS
+            return self._send(json.dumps({
+                "object": "list", "model": model, "usage": {"prompt_tokens": len(texts), "total_tokens": len(texts)},
+                "data": [{"object": "embedding", "index": i, "embedding": embedding(text, dims)}
+                         for i, text in enumerate(texts)]}))
+        if self.path == "/api/generate":
+            return self._ollama(body, body.get("prompt", ""), "response")
+        if self.path == "/api/chat":
+            return self._ollama(body, json.dumps(body.get("messages", [])), "message")
+        if self.path == "/v1/chat/completions":
+            if body.get("tools") or is_react(body.get("messages", [])):
+                return self._openai_agent(body)
+            return self._openai(body)
+        if path.startswith("/v1beta/models/") and path.endswith(("generateContent", "streamGenerateContent")):
+            return self._gemini(body, path)
+        self._send(json.dumps({"error": f"unknown path {self.path}"}), status=404)
+
+    def _count(self, prompt_tokens, completion_tokens):
+        with self.server.lock:
+            self.server.stats["prompt_tokens"] += prompt_tokens
+            self.server.stats["completion_tokens"] += completion_tokens
+
+    def _think(self, completion_tokens):
+        """Wait as long as the model would take to write a whole reply."""
+        settings = self.server.settings
+        time.sleep(settings["ttft"] + max(completion_tokens - 1, 0) / settings["tokens_per_second"])
+
+    def _ollama(self, body, prompt, field):
+        model = body.get("model", "stub")
+        prompt_tokens = len(prompt.split())
+        wrap = (lambda text: {"role": "assistant", "content": text}) if field == "message" else (lambda text: text)
+        done = {"model": model, field: wrap(""), "done": True, "done_reason": "stop",
+                "prompt_eval_count": prompt_tokens, "eval_count": self.server.settings["completion_tokens"]}
+        self._count(prompt_tokens, done["eval_count"])
+        if not body.get("stream", True):
+            done[field] = wrap("".join(self._tokens(prompt)))
+            return self._send(json.dumps(done))
+        self._start_stream("application/x-ndjson")
+        for token in self._tokens(prompt):
+            self._chunk(json.dumps({"model": model, field: wrap(token), "done": False}) + "\n")
+        self._chunk(json.dumps(done) + "\n")
+        self._end_stream()
+
+    def _openai(self, body):
+        model = body.get("model", "stub")
+        prompt = json.dumps(body.get("messages", []))
+        usage = {"prompt_tokens": len(prompt.split()), "completion_tokens": self.server.settings["completion_tokens"]}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        self._count(usage["prompt_tokens"], usage["completion_tokens"])
+        if not body.get("stream"):
+            return self._send(json.dumps({
+                "id": "stub", "object": "chat.completion", "created": int(time.time()), "model": model, "usage": usage,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "".join(self._tokens(prompt))}}]}))
+        self._start_stream("text/event-stream")
+        def event(delta, finish=None, **extra):
+            chunk = {"id": "stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": finish}] if delta is not None else [],
+                     **extra}
+            self._chunk(f"data: {json.dumps(chunk)}\n\n")
+        for token in self._tokens(prompt):
+            event({"content": token})
+        event({}, "stop")
+        if (body.get("stream_options") or {}).get("include_usage"):
+            event(None, usage=usage)
+        self._chunk("data: [DONE]\n\n")
+        self._end_stream()
+
+    def _openai_agent(self, body):
+        model = body.get("model", "stub")
+        messages = body.get("messages", [])
+        tool_names = [tool.get("function", {}).get("name") for tool in body.get("tools") or []]
+        question, results = openai_agent_state(messages)
+        tool, arguments = agent_step(question, results, "final_answer" if "final_answer" in tool_names else None)
+        if body.get("tools"):
+            message = {"role": "assistant", "content": None if tool else arguments}
+            if tool:
+                message["tool_calls"] = [{"id": f"call_{len(results)}", "type": "function",
+                                          "function": {"name": tool, "arguments": json.dumps(arguments)}}]
+        else:
+            message = {"role": "assistant", "content": react_text(tool, arguments)}
+        reply = message["content"] or message["tool_calls"][0]["function"]["arguments"]
+        usage = {"prompt_tokens": len(json.dumps(messages).split()) + len(json.dumps(body.get("tools")).split()),
+                 "completion_tokens": len(reply.split())}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        self._count(usage["prompt_tokens"], usage["completion_tokens"])
+        finish = "tool_calls" if message.get("tool_calls") else "stop"
+        self._think(usage["completion_tokens"])
+        if not body.get("stream"):
+            return self._send(json.dumps({
+                "id": "stub", "object": "chat.completion", "created": int(time.time()), "model": model, "usage": usage,
+                "choices": [{"index": 0, "finish_reason": finish, "message": message}]}))
+
+        self._start_stream("text/event-stream")
+        def event(delta, finish=None, **extra):
+            chunk = {"id": "stub", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                     "choices": [{"index": 0, "delta": delta, "finish_reason": finish}] if delta is not None else [],
+                     **extra}
+            self._chunk(f"data: {json.dumps(chunk)}\n\n")
+        if message.get("tool_calls"):
+            call = message["tool_calls"][0]
+            event({"role": "assistant", "tool_calls": [{"index": 0, "id": call["id"], "type": "function",
+                                                        "function": {"name": call["function"]["name"], "arguments": ""}}]})
+            event({"tool_calls": [{"index": 0, "function": {"arguments": call["function"]["arguments"]}}]})
+        else:
+            for i, word in enumerate(message["content"].split(" ")):
+                event({"content": word if i == 0 else " " + word})
+        event({}, finish)
+        if (body.get("stream_options") or {}).get("include_usage"):
+            event(None, usage=usage)
+        self._chunk("data: [DONE]\n\n")
+        self._end_stream()
+
+    def _gemini(self, body, path):
+        model = path[len("/v1beta/models/"):].split(":")[0]
+        question, results = gemini_agent_state(body.get("contents", []))
+        tool, arguments = agent_step(question, results)
+        part = {"functionCall": {"name": tool, "args": arguments}} if tool else {"text": arguments}
+        prompt_tokens = len(json.dumps(body).split())
+        completion_tokens = len(json.dumps(part).split())
+        self._count(prompt_tokens, completion_tokens)
+        self._think(completion_tokens)
+        response = json.dumps({
+            "candidates": [{"content": {"role": "model", "parts": [part]}, "finishReason": "STOP", "index": 0}],
+            "usageMetadata": {"promptTokenCount": prompt_tokens, "candidatesTokenCount": completion_tokens,
+                              "totalTokenCount": prompt_tokens + completion_tokens},
+            "modelVersion": model})
+        if path.endswith("streamGenerateContent"):
+            # The whole reply in one server-sent event, tool calls aren't split up anyway
+            self._start_stream("text/event-stream")
+            self._chunk(f"data: {response}\r\n\r\n")
+            return self._end_stream()
+        self._send(response)
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops connections when a batch run opens dozens at once
+    request_queue_size = 256
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up mid-stream (a losing hedge, a cancelled run) are normal here
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+def start_stub_server(port=0, ttft=0.05, tokens_per_second=200, completion_tokens=60, paragraphs=30):
+    """Start the stub in a background thread. Returns (server, base_url), stop it with server.shutdown()."""
+    server = StubServer(("127.0.0.1", port), StubHandler)
+    server.settings = {"ttft": ttft, "tokens_per_second": tokens_per_second,
+                       "completion_tokens": completion_tokens, "paragraphs": paragraphs}
+    server.stats = {"requests": {}, "prompt_tokens": 0, "completion_tokens": 0}
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+def start_stub_process(ttft=0.05, tokens_per_second=200, completion_tokens=60, timeout=30):
+    """Run the stub in a subprocess. Returns (process, base_url), stop it with process.terminate()."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    process = subprocess.Popen([sys.executable, __file__, "--port", str(port), "--ttft", str(ttft),
+                                "--tokens-per-second", str(tokens_per_second),
+                                "--completion-tokens", str(completion_tokens)], stdout=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + timeout
+    while True:
+        try:
+            urllib.request.urlopen(url, timeout=1).close()
+            return process, url
+        except OSError:
+            if process.poll() is not None or time.time() > deadline:
+                process.kill()
+                raise RuntimeError("The stub LLM server didn't start")
+            time.sleep(0.05)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--ttft", type=float, default=0.05, help="Seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=200)
+    parser.add_argument("--completion-tokens", type=int, default=60)
+    args = parser.parse_args()
+
+    server, url = start_stub_server(args.port, args.ttft, args.tokens_per_second, args.completion_tokens)
+    print(f"Stub LLM server on {url}, OLLAMA_HOST={url} OPENAI_BASE_URL={url}/v1")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
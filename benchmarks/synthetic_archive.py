@@ -0,0 +1,140 @@
+"""
+Generate a synthetic blog archive for benchmarking the maintenance scripts.
+
+Every post is a posts/<date>-<slug>/index.ipynb laid out like the real ones:
+a raw front matter cell in the styles qblog2 new and the hand-written posts
+use, then markdown and code cells with stream, HTML table and base64 PNG
+outputs. Sizes follow the real posts (a few KB for most, a long tail with
+plots), about 2% of posts are dated in the future and some already have
+their social media card.
+
+    uv run benchmarks/synthetic_archive.py /tmp/archive --posts 10000
+"""
+import os
+import json
+import base64
+import random
+import shutil
+import argparse
+import datetime
+
+WORDS = ("the model context token embedding agent vector search page summary blog python ollama "
+         "openai faiss chunk query notebook render draft card llama deepseek football data").split()
+CATEGORIES = ["ollama", "embedding", "llama", "agents", "langchain", "TIL", "openai", "football", "python", "rag"]
+CARD_IMAGE = "social-media-card.png"
+SITE_FILES = ["styles.css", "blog-logo.svg"]
+# Shared pool of image data, sliced for each plot so generating 50k posts stays quick
+_PNG_POOL = base64.b64encode(random.Random(0).randbytes(400 * 1024)).decode("ascii")
+
+def sentence(rng, n=None):
+    return " ".join(rng.choice(WORDS) for _ in range(n or rng.randint(6, 18))).capitalize() + "."
+
+def front_matter(rng, i, date):
+    title = sentence(rng, rng.randint(3, 9))[:-1]
+    lines = [f'title: "{title} {i}"']
+    if rng.random() < 0.2:
+        lines.append(f'subtitle: "{sentence(rng, 6)[:-1]}"')
+    future = date > datetime.date.today()
+    # Both the quoted strings qblog2 writes and the bare values of hand-written posts
+    if rng.random() < 0.5:
+        lines += [f'date: "{date}"', f'draft: "{str(future).lower()}"', f'publish: "{str(not future).lower()}"']
+    else:
+        # Hand-written posts often say draft: False even when dated ahead, the pre-render fixes that
+        lines += [f"date: {date}", "draft: False"]
+        if rng.random() < 0.8:
+            lines.append(f"publish: {not future}")
+    lines.append("callout-appearance: simple")
+    lines.append(f"categories: [{', '.join(rng.sample(CATEGORIES, rng.randint(1, 4)))}]")
+    if rng.random() < 0.5:
+        lines.append(f'abstract: "{sentence(rng, 20)}"')
+    image = rng.random()
+    if image < 0.4:
+        lines.append(f'image: "{CARD_IMAGE}"')
+    elif image < 0.45:
+        lines.append('image: "cover.jpg"')
+    elif image < 0.7:
+        lines.append('image: "" ')
+    return "---\n" + "\n".join(lines) + "\n---\n"
+
+def outputs(rng, plots):
+    kind = rng.random()
+    if plots and kind < 0.3:
+        size = int(rng.lognormvariate(10.5, 0.8))
+        start = rng.randrange(0, len(_PNG_POOL) // 2)
+        data = _PNG_POOL[start:start + min(size, len(_PNG_POOL) - start)]
+        return [{"output_type": "display_data", "metadata": {},
+                 "data": {"image/png": data, "text/plain": ["<Figure size 640x480 with 1 Axes>"]}}]
+    if kind < 0.5:
+        rows = "".join(f"<tr><td>{r}</td><td>{rng.choice(WORDS)}</td><td>{rng.random():.3f}</td></tr>"
+                       for r in range(rng.randint(3, 30)))
+        return [{"output_type": "execute_result", "execution_count": 1, "metadata": {},
+                 "data": {"text/html": [f"<table><thead><tr><th></th><th>word</th><th>score</th></tr></thead>"
+                                        f"<tbody>{rows}</tbody></table>"],
+                          "text/plain": ["<DataFrame>"]}}]
+    if kind < 0.8:
+        return [{"output_type": "stream", "name": "stdout",
+                 "text": [sentence(rng) + "\n" for _ in range(rng.randint(1, 20))]}]
+    return []
+
+def notebook(rng, i, date):
+    cells = [{"cell_type": "raw", "id": f"fm{i:06x}", "metadata": {}, "source": front_matter(rng, i, date)}]
+    # Most posts are short, some are long with plots, like the real archive
+    length = min(int(rng.lognormvariate(1.8, 0.7)) + 2, 60)
+    plots = rng.random() < 0.15
+    for cell in range(length):
+        if rng.random() < 0.5:
+            cells.append({"cell_type": "markdown", "id": f"m{i:06x}{cell}", "metadata": {},
+                          "source": "\n\n".join(" ".join(sentence(rng) for _ in range(rng.randint(2, 6)))
+                                                for _ in range(rng.randint(1, 3)))})
+        else:
+            cells.append({"cell_type": "code", "id": f"c{i:06x}{cell}", "metadata": {}, "execution_count": cell,
+                          "source": f"import {rng.choice(WORDS)}\nresult = {rng.choice(WORDS)}.run('{sentence(rng, 4)}')",
+                          "outputs": outputs(rng, plots)})
+    return {"cells": cells, "metadata": {"kernelspec": {"display_name": "Python 3", "language": "python",
+                                                        "name": "python3"}},
+            "nbformat": 4, "nbformat_minor": 5}
+
+def post_date(rng):
+    today = datetime.date.today()
+    if rng.random() < 0.02:
+        return today + datetime.timedelta(days=rng.randint(1, 60))
+    return today - datetime.timedelta(days=rng.randint(0, 3650))
+
+def write_archive(base_folder, posts, seed=0):
+    """
+    Write posts synthetic posts under base_folder/posts, plus the site files
+    the card check hashes. Returns {"posts", "bytes"}.
+    """
+    rng = random.Random(seed)
+    posts_dir = os.path.join(base_folder, "posts")
+    os.makedirs(posts_dir, exist_ok=True)
+    root = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    for name in SITE_FILES:
+        shutil.copy(os.path.join(root, name), os.path.join(base_folder, name))
+
+    total = 0
+    for i in range(posts):
+        date = post_date(rng)
+        folder = os.path.join(posts_dir, f"{date}-{'-'.join(sentence(rng, 3)[:-1].lower().split())}-{i}")
+        os.makedirs(folder, exist_ok=True)
+        nb = notebook(rng, i, date)
+        text = json.dumps(nb, indent=1, ensure_ascii=False) + "\n"
+        with open(os.path.join(folder, "index.ipynb"), "w", encoding="utf-8") as f:
+            f.write(text)
+        total += len(text)
+        if f'image: "{CARD_IMAGE}"' in nb["cells"][0]["source"] and rng.random() < 0.8:
+            with open(os.path.join(folder, CARD_IMAGE), "wb") as f:
+                f.write(b"\x89PNG\r\n\x1a\n")
+    return {"posts": posts, "bytes": total}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("base_folder")
+    parser.add_argument("--posts", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    stats = write_archive(args.base_folder, args.posts, args.seed)
+    print(f"Wrote {stats['posts']} posts ({stats['bytes'] / 1024 / 1024:.1f} MB) to {args.base_folder}/posts")
+
+if __name__ == "__main__":
+    main()
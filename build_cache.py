@@ -0,0 +1,31 @@
+"""
+Small helpers shared by the scripts that keep state in .cache/ between runs.
+"""
+import os
+import json
+import hashlib
+
+CACHE_DIR = ".cache"
+
+def load_manifest(path):
+    """Load a JSON manifest, or an empty one if it is missing or unreadable."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(manifest, path):
+    """Write a JSON manifest atomically so an interrupted run can't corrupt it."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
@@ -0,0 +1,100 @@
+"""
+Draw social media cards straight from a post's front matter.
+
+This is the browser-free alternative to screenshotting _site/posts/*/index.html:
+the same 800x418 layout (logo top left, title, date underneath) is drawn with
+PyMuPDF, so cards can be made before `quarto render` has run and many can be
+drawn in parallel in one process pool.
+"""
+import time
+import datetime
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+
+import pymupdf
+
+CARD_WIDTH = 800
+CARD_HEIGHT = 418
+MARGIN = 24
+# Same as the card JavaScript: the navbar logo blown up to 140px
+LOGO_TOP = 18
+LOGO_HEIGHT = 140
+# h1.title in styles.css: weight 600 in Inter/Helvetica, rgb(38 39 48), line-height 1.
+# The card JavaScript sets it to 2em of the 1.15em body font.
+TITLE_FONT = "hebo"
+TITLE_SIZE = 36.8
+TITLE_MIN_SIZE = 20
+TITLE_COLOR = (38 / 255, 39 / 255, 48 / 255)
+TITLE_TOP = LOGO_TOP + LOGO_HEIGHT + 40
+# span.date is gray
+DATE_FONT = "helv"
+DATE_SIZE = 16.5
+DATE_COLOR = (0.5, 0.5, 0.5)
+
+@lru_cache(maxsize=None)
+def _logo_pdf(logo_path):
+    # Convert the SVG once per process, PyMuPDF can only place PDF pages
+    with pymupdf.open(logo_path) as svg:
+        return pymupdf.open("pdf", svg.convert_to_pdf())
+
+def format_date(value):
+    """Format a front matter date the way it shows under the title."""
+    try:
+        date = datetime.date.fromisoformat(str(value))
+    except ValueError:
+        return str(value)
+    return f"{date:%B} {date.day}, {date.year}"
+
+def _insert_title(page, title):
+    """Write the title, shrinking it until it fits above the date. Returns its bottom."""
+    rect = pymupdf.Rect(MARGIN, TITLE_TOP, CARD_WIDTH - MARGIN, CARD_HEIGHT - MARGIN - DATE_SIZE * 2)
+    size = TITLE_SIZE
+    while True:
+        shape = page.new_shape()
+        spare = shape.insert_textbox(rect, title, fontname=TITLE_FONT, fontsize=size,
+                                     color=TITLE_COLOR, lineheight=1.1)
+        if spare >= 0 or size <= TITLE_MIN_SIZE:
+            shape.commit()
+            return rect.y1 - max(spare, 0)
+        size -= 2
+
+def draw_card(metadata, output_path, logo_path):
+    """Draw one card for the given front matter and save it as a PNG."""
+    page_doc = pymupdf.open()
+    page = page_doc.new_page(width=CARD_WIDTH, height=CARD_HEIGHT)
+
+    logo = _logo_pdf(logo_path)
+    logo_rect = logo[0].rect
+    logo_width = LOGO_HEIGHT * logo_rect.width / logo_rect.height
+    page.show_pdf_page(pymupdf.Rect(MARGIN, LOGO_TOP, MARGIN + logo_width, LOGO_TOP + LOGO_HEIGHT), logo, 0)
+
+    title_bottom = _insert_title(page, str(metadata.get("title", "")))
+    if metadata.get("date"):
+        page.insert_text((MARGIN, title_bottom + DATE_SIZE * 1.5), format_date(metadata["date"]),
+                         fontname=DATE_FONT, fontsize=DATE_SIZE, color=DATE_COLOR)
+
+    # One PDF point per pixel gives an 800x418 image
+    page.get_pixmap(alpha=False).save(output_path)
+    page_doc.close()
+    return output_path
+
+def _draw_card_job(job):
+    metadata, output_path, logo_path = job
+    start = time.perf_counter()
+    try:
+        draw_card(metadata, output_path, logo_path)
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return output_path, time.perf_counter() - start, error
+
+def draw_cards(jobs, workers=None):
+    """
+    Draw many cards across a process pool. jobs is a list of
+    (metadata, output_path, logo_path). Returns (output_path, seconds, error)
+    for each job, in order.
+    """
+    if len(jobs) <= 1 or workers == 1:
+        return [_draw_card_job(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_draw_card_job, jobs))
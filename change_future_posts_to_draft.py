@@ -1,62 +1,106 @@
 import os
-import json
-import nbformat
+import sys
 from datetime import datetime
+from front_matter import read_front_matter, update_front_matter, as_bool
+from build_cache import CACHE_DIR, load_manifest, save_manifest, file_hash
+from post_index import find_notebooks
+import tracing
+from tracing import span, traced
 
 POSTS_DIR = "posts"
 DATE_FORMAT = "%Y-%m-%d"
+# Remembers what each notebook looked like last time so unchanged posts can be skipped
+MANIFEST_PATH = os.path.join(CACHE_DIR, "draft-manifest.json")
 
-def update_draft_status():
+def decide_draft(date, publish, draft, today):
+    """Return the draft value a post should have today."""
+    post_date = datetime.strptime(date, DATE_FORMAT).date()
+    if post_date > today:
+        return True
+    elif publish:
+        return False
+    return draft
+
+def is_unchanged(entry, stat, notebook_path):
+    """True if the notebook on disk is the one recorded in the manifest entry."""
+    if not entry:
+        return False
+    if entry["mtime"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+        return True
+    # Touched but maybe not edited (e.g. git checkout), fall back to the content hash
+    if entry["size"] == stat.st_size and entry["hash"] == file_hash(notebook_path):
+        entry["mtime"] = stat.st_mtime_ns
+        return True
+    return False
+
+@traced("draft.update_notebook")
+def update_notebook(notebook_path, today):
+    """
+    Read a notebook's front matter and fix its draft status. Returns the
+    manifest entry for the notebook and whether it was rewritten.
+    """
+    metadata = read_front_matter(notebook_path)
+    entry = {"date": None, "draft": None, "publish": None}
+    rewritten = False
+
+    # Check date and update draft status only if publish is true
+    if "date" in metadata:
+        current = as_bool(metadata["draft"]) if "draft" in metadata else None
+        publish = as_bool(metadata.get("publish", False))
+        draft = decide_draft(str(metadata["date"]), publish, current, today)
+        entry = {"date": str(metadata["date"]), "draft": draft, "publish": publish}
+
+        # Only touch the file when the front matter really changes,
+        # rewriting bumps the mtime and defeats Quarto's freeze
+        if draft is not None and current != draft:
+            rewritten = update_front_matter(notebook_path, {"draft": draft})
+            if rewritten:
+                print(f"Updated draft status in: {notebook_path}")
+
+    stat = os.stat(notebook_path)
+    entry.update({"mtime": stat.st_mtime_ns, "size": stat.st_size,
+                  "hash": file_hash(notebook_path)})
+    return entry, rewritten
+
+def update_draft_status(full=False, manifest_path=MANIFEST_PATH):
+    """
+    Walk the posts and make sure future posts are drafts and published posts
+    are not. Notebooks that haven't changed since the last run, and whose date
+    hasn't crossed today, are skipped without being parsed. Pass full=True to
+    ignore the manifest and parse everything.
+    """
     today = datetime.today().date()
-    
-    for root, _, files in os.walk(POSTS_DIR):
-        if "index.ipynb" in files:
-            notebook_path = os.path.join(root, "index.ipynb")
-            with open(notebook_path, "r", encoding="utf-8") as f:
-                nb = nbformat.read(f, as_version=4)
-            
-            # Check if the first cell is a raw cell and contains metadata
-            if nb.cells and nb.cells[0].cell_type == "raw":
-                raw_content = nb.cells[0].source.strip()
-                if raw_content.startswith("---") and raw_content.endswith("---"):
-                    metadata_lines = raw_content.split("\n")[1:-1]  # Remove the surrounding ---
-                    metadata = {}
-                    
-                    for line in metadata_lines:
-                        key, value = line.split(":", 1)
-                        key = key.strip()
-                        if key in ["draft", "publish", "date"]:
-                            value = value.strip().strip('"')
-                        #if key == "categories":
-                        #    value = [cat.strip() for cat in value.strip("[]").split(",")]
-                        if key == "draft" or key == "publish":
-                            value = value.lower() == "true"
-                        metadata[key] = value
-                    
-                    # Check date and update draft status only if publish is true
-                    if "date" in metadata:
-                        post_date = datetime.strptime(metadata["date"], DATE_FORMAT).date()
-                        if post_date > today:
-                            metadata["draft"] = True
-                        elif metadata.get("publish", False):
-                            metadata["draft"] = False
-                            
-                        # Rebuild raw cell content
-                        updated_raw_content = "---\n" + "\n".join(
-                            f"{k}: {json.dumps(v) if isinstance(v, list) else v}"
-                            for k, v in metadata.items()
-                        ) + "\n---"
-                        
-                        nb.cells[0].source = updated_raw_content
-                        
-                        # Save updated notebook
-                        with open(notebook_path, "w", encoding="utf-8") as f:
-                            nbformat.write(nb, f)
-                        print(f"Updated draft status in: {notebook_path}")
+    manifest = {} if full else load_manifest(manifest_path)
+    new_manifest = {}
+    scanned = skipped = rewritten = 0
+
+    with span("scan.notebooks") as scan:
+        for _, notebook_path in find_notebooks(POSTS_DIR):
+            scanned += 1
+            entry = manifest.get(notebook_path)
+            stat = os.stat(notebook_path)
+
+            if is_unchanged(entry, stat, notebook_path):
+                # Same file as last time, only re-parse if the date crossed today
+                if entry["date"] is None or decide_draft(
+                        entry["date"], entry["publish"], entry["draft"], today) == entry["draft"]:
+                    new_manifest[notebook_path] = entry
+                    skipped += 1
+                    continue
+
+            new_manifest[notebook_path], changed = update_notebook(notebook_path, today)
+            rewritten += changed
+        scan.set(scanned=scanned, skipped=skipped, rewritten=rewritten)
+
+    with span("manifest.save"):
+        save_manifest(new_manifest, manifest_path)
+    print(f"Draft status: scanned {scanned}, skipped {skipped}, rewrote {rewritten}")
+    return {"scanned": scanned, "skipped": skipped, "rewritten": rewritten}
 
 if __name__ == "__main__":
+    tracing.enable_from_env()
     if not os.getenv("QUARTO_PROJECT_RENDER_ALL"):
         print("Not fixing draft status")
         exit()
     else:
-        update_draft_status()
+        update_draft_status(full="--full" in sys.argv[1:])
@@ -0,0 +1,264 @@
+"""
+Embed text in batches with Ollama, OpenAI or a deterministic stub.
+
+get_embedder("ollama:nomic-embed-text"), get_embedder("openai:text-embedding-3-small")
+or get_embedder("stub") returns an embedder whose embed(texts) sends the
+texts in batches, one request per batch with several batches in flight at
+once, and returns one float32 row per text, normalised so the inner product
+is the cosine similarity. embed_query(text) and embed_documents(texts) return
+the model's raw vectors as lists, like LangChain's OllamaEmbeddings, so new
+experiments can use it in place of that.
+
+Vectors from Ollama and OpenAI are cached on disk keyed by (model,
+dimensions, text hash), so embedding the same text with the same model again
+needs no request. The vectors are float32 rows appended to one file that is
+memory-mapped for reading, with their offsets in SQLite. The cache lives in
+the repository's .cache/embeddings/ wherever it is used from, so notebooks
+run from their post folders share it. Set QBLOG_NO_CACHE=1 to bypass it.
+
+The stub hashes words into a fixed number of dimensions. It needs no model
+or network, gives the same vector for the same text every time, and texts
+sharing words still come out similar, so it is good enough for tests and
+benchmarks.
+"""
+import os
+import re
+import hashlib
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from build_cache import CACHE_DIR
+
+DEFAULT_EMBEDDER = "ollama:nomic-embed-text"
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_CONCURRENCY = 4
+STUB_DIMENSIONS = 256
+WORD = re.compile(r"\w+")
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), CACHE_DIR, "embeddings")
+# Lookups per query, below SQLite's limit on the number of parameters
+LOOKUP_BATCH = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS vectors (
+    model TEXT NOT NULL,
+    dims INTEGER NOT NULL,
+    text_hash TEXT NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    PRIMARY KEY (model, dims, text_hash)
+) WITHOUT ROWID;
+"""
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+def text_hash(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+class VectorCache:
+    """Float32 vectors appended to one file, found by (model, dims, text hash) in SQLite."""
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR):
+        self.directory = directory
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, "vectors.sqlite3"), check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._mapped = None
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _rows(self, end):
+        """The vectors file memory-mapped as float32, remapped if it has grown past end."""
+        if self._mapped is None or len(self._mapped) < end:
+            self._mapped = np.memmap(self.vectors_path, dtype=np.float32, mode="r")
+        return self._mapped
+
+    def get_many(self, model, dims, hashes):
+        """Return {text_hash: vector} for the hashes that are cached."""
+        hashes = list(hashes)
+        found = {}
+        with self._lock:
+            for start in range(0, len(hashes), LOOKUP_BATCH):
+                part = hashes[start:start + LOOKUP_BATCH]
+                found.update((row[0], row[1:]) for row in self._db.execute(
+                    f"SELECT text_hash, offset, length FROM vectors WHERE model = ? AND dims = ? "
+                    f"AND text_hash IN ({', '.join('?' for _ in part)})", [model, dims, *part]))
+            if not found:
+                return {}
+            rows = self._rows(max(offset + length for offset, length in found.values()))
+            return {key: np.array(rows[offset:offset + length]) for key, (offset, length) in found.items()}
+
+    def put_many(self, model, dims, vectors):
+        """Append {text_hash: vector} to the file and record where each one is."""
+        if not vectors:
+            return
+        with self._lock:
+            # The write lock keeps other processes from appending at the same time
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                with open(self.vectors_path, "ab") as f:
+                    # Offsets count float32s, a half-written row from a crash is skipped
+                    end = f.tell()
+                    if end % 4:
+                        f.write(b"\0" * (4 - end % 4))
+                    offset = f.tell() // 4
+                    records = []
+                    for key, vector in vectors.items():
+                        vector = np.asarray(vector, dtype=np.float32)
+                        f.write(vector.tobytes())
+                        records.append((model, dims, key, offset, len(vector)))
+                        offset += len(vector)
+                self._db.executemany("INSERT OR REPLACE INTO vectors (model, dims, text_hash, offset, length) "
+                                     "VALUES (?, ?, ?, ?, ?)", records)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def stats(self):
+        with self._lock:
+            models = self._db.execute("SELECT model, dims, COUNT(*) FROM vectors GROUP BY model, dims "
+                                      "ORDER BY model, dims").fetchall()
+        size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        return {"vectors": sum(count for _, _, count in models), "bytes": size, "models": models}
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM vectors")
+            self._mapped = None
+            if os.path.exists(self.vectors_path):
+                os.remove(self.vectors_path)
+
+def get_cache():
+    """The shared vector cache, or None if QBLOG_NO_CACHE is set."""
+    global _cache
+    if os.environ.get("QBLOG_NO_CACHE"):
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = VectorCache()
+        return _cache
+
+class Embedder:
+    """Base class, subclasses implement _embed_batch(texts) returning a list of vectors."""
+
+    def __init__(self, name, batch_size=DEFAULT_BATCH_SIZE, concurrency=DEFAULT_CONCURRENCY, cache=None, dims=None):
+        self.name = name
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.cache = cache
+        self.dims = dims
+        self.stats = {"cached": 0, "embedded": 0, "requests": 0}
+
+    def _embed_batch(self, texts):
+        raise NotImplementedError
+
+    def _embed_raw(self, texts):
+        """The model's vectors for texts as a float32 array, from the cache where possible."""
+        keys = [text_hash(text) for text in texts]
+        found = self.cache.get_many(self.name, self.dims or 0, set(keys)) if self.cache else {}
+        missing = list({key: text for key, text in zip(keys, texts) if key not in found}.items())
+        batches = [missing[i:i + self.batch_size] for i in range(0, len(missing), self.batch_size)]
+        if len(batches) > 1 and self.concurrency > 1:
+            with ThreadPoolExecutor(max_workers=min(self.concurrency, len(batches))) as pool:
+                results = list(pool.map(lambda batch: self._embed_batch([text for _, text in batch]), batches))
+        else:
+            results = [self._embed_batch([text for _, text in batch]) for batch in batches]
+
+        new = {key: np.asarray(vector, dtype=np.float32)
+               for batch, vectors in zip(batches, results) for (key, _), vector in zip(batch, vectors)}
+        self.stats["cached"] += len(texts) - len(missing)
+        self.stats["embedded"] += len(new)
+        self.stats["requests"] += len(batches)
+        if self.cache and new:
+            self.cache.put_many(self.name, self.dims or 0, new)
+        found.update(new)
+        return np.vstack([found[key] for key in keys])
+
+    def embed(self, texts):
+        """Embed a list of texts, returning a normalised (len(texts), dims) float32 array."""
+        if not texts:
+            return np.zeros((0, self.dimensions()), dtype=np.float32)
+        return normalize(self._embed_raw(list(texts)))
+
+    def embed_documents(self, texts):
+        """The model's vectors for texts as lists of floats, not normalised."""
+        return self._embed_raw(list(texts)).tolist() if texts else []
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    def dimensions(self):
+        return self.dims or len(self._embed_raw(["dimensions"])[0])
+
+class OllamaEmbedder(Embedder):
+    def __init__(self, model, client=None, batch_size=DEFAULT_BATCH_SIZE, concurrency=DEFAULT_CONCURRENCY,
+                 cache=None):
+        import ollama
+        super().__init__(f"ollama:{model}", batch_size, concurrency, cache)
+        self.model = model
+        self.client = client or ollama.Client()
+
+    def _embed_batch(self, texts):
+        return self.client.embed(model=self.model, input=texts)["embeddings"]
+
+class OpenAIEmbedder(Embedder):
+    def __init__(self, model, client=None, batch_size=DEFAULT_BATCH_SIZE, concurrency=DEFAULT_CONCURRENCY,
+                 cache=None, dimensions=None):
+        import openai
+        super().__init__(f"openai:{model}:{dimensions}" if dimensions else f"openai:{model}",
+                         batch_size, concurrency, cache, dimensions)
+        self.model = model
+        self.client = client or openai.OpenAI()
+
+    def _embed_batch(self, texts):
+        extra = {"dimensions": self.dims} if self.dims else {}
+        response = self.client.embeddings.create(model=self.model, input=texts, **extra)
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+class StubEmbedder(Embedder):
+    def __init__(self, dimensions=STUB_DIMENSIONS, batch_size=DEFAULT_BATCH_SIZE):
+        # Hashing words is quicker than a thread pool or a cache lookup
+        super().__init__(f"stub:{dimensions}", batch_size, concurrency=1, dims=dimensions)
+
+    def _embed_batch(self, texts):
+        vectors = np.zeros((len(texts), self.dims), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in WORD.findall(text.lower()):
+                digest = hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest()
+                bucket = int.from_bytes(digest[:4], "little") % self.dims
+                vectors[row, bucket] += 1 if digest[4] & 1 else -1
+        return vectors
+
+def get_embedder(spec=DEFAULT_EMBEDDER, client=None, batch_size=DEFAULT_BATCH_SIZE,
+                 concurrency=DEFAULT_CONCURRENCY, dimensions=None, cache=True):
+    """
+    Embedder for "ollama:<model>", "openai:<model>[:<dimensions>]" or
+    "stub[:<dimensions>]". cache=True uses the shared vector cache, or pass a
+    VectorCache, or False for none.
+    """
+    backend, _, model = spec.partition(":")
+    if backend == "stub":
+        return StubEmbedder(int(model) if model else STUB_DIMENSIONS, batch_size)
+    cache = get_cache() if cache is True else cache or None
+    if backend == "ollama":
+        return OllamaEmbedder(model, client, batch_size, concurrency, cache)
+    if backend == "openai":
+        model, _, dims = model.partition(":")
+        return OpenAIEmbedder(model, client, batch_size, concurrency, cache, dimensions or int(dims or 0) or None)
+    raise ValueError(f"Unknown embedder {spec!r}, use ollama:<model>, openai:<model> or stub")
@@ -0,0 +1,202 @@
+"""
+Read and write the Quarto front matter of a post notebook without going
+through nbformat.
+
+Every post keeps its front matter in the first raw cell of index.ipynb.
+nbformat parses and validates the whole notebook just to get at that cell,
+which is slow for posts with large base64 outputs. The reader here streams
+the file until the first cell has been decoded and stops, and the writer
+splices a new first cell into the file, leaving every other byte as it was.
+"""
+import os
+import re
+import json
+import datetime
+import yaml
+
+CHUNK_SIZE = 8 * 1024
+# nbformat writes keys sorted, so "cells" is the first key of the notebook
+CELLS_START = re.compile(r'\A\s*\{\s*"cells"\s*:\s*\[\s*')
+
+_decoder = json.JSONDecoder()
+# The C loader is much faster when libyaml is available
+SafeLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+def _find_first_cell(f):
+    """
+    Read from an open notebook until the first cell has been decoded.
+    Returns (cell, start, end, text_read) where start/end are offsets of the
+    cell's JSON in the text, or None if the notebook doesn't start with cells.
+    """
+    text = ""
+    while True:
+        chunk = f.read(CHUNK_SIZE)
+        text += chunk
+        match = CELLS_START.match(text)
+        if match:
+            start = match.end()
+            if text[start:start + 1] == "]":
+                return None  # No cells at all
+            try:
+                cell, end = _decoder.raw_decode(text, start)
+                return cell, start, end, text
+            except json.JSONDecodeError:
+                pass  # The cell runs past what we've read so far
+        elif len(text) > 64 or not chunk:
+            # Enough read to know "cells" isn't the first key
+            return None
+        if not chunk:
+            return None
+
+def cell_source(cell):
+    source = cell.get("source", "")
+    return "".join(source) if isinstance(source, list) else source
+
+def read_first_cell(notebook_path):
+    """Return the first cell of a notebook as a dict, or None."""
+    with open(notebook_path, "r", encoding="utf-8") as f:
+        found = _find_first_cell(f)
+        if found:
+            return found[0]
+        # Unusual key order, fall back to loading the whole thing
+        f.seek(0)
+        cells = json.load(f).get("cells", [])
+        return cells[0] if cells else None
+
+def split_front_matter(source):
+    """
+    Return the YAML between the --- fences of a raw cell, or None if the
+    cell isn't front matter.
+    """
+    stripped = source.strip()
+    if not stripped.startswith("---"):
+        return None
+    lines = stripped.split("\n")
+    for i, line in enumerate(lines[1:], start=1):
+        if line.strip() == "---":
+            return "\n".join(lines[1:i])
+    return None
+
+def parse_front_matter(source):
+    """Parse the front matter of a raw cell into a dict ({} if there is none)."""
+    body = split_front_matter(source)
+    if body is None:
+        return {}
+    try:
+        metadata = yaml.load(body, Loader=SafeLoader) or {}
+    except yaml.YAMLError:
+        return {}
+    if not isinstance(metadata, dict):
+        return {}
+    # YAML turns unquoted dates into date objects, the scripts work with strings
+    for key, value in metadata.items():
+        if isinstance(value, (datetime.date, datetime.datetime)):
+            metadata[key] = value.isoformat()
+    return metadata
+
+def read_front_matter(notebook_path):
+    """Return the front matter of a notebook as a dict ({} if there is none)."""
+    cell = read_first_cell(notebook_path)
+    if not cell or cell.get("cell_type") != "raw":
+        return {}
+    return parse_front_matter(cell_source(cell))
+
+def as_bool(value):
+    """Front matter has both draft: false and draft: "false", treat them the same."""
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().strip('"').lower() == "true"
+
+def _format_value(value, quoted):
+    if isinstance(value, bool):
+        value = "true" if value else "false"
+    elif isinstance(value, list):
+        return json.dumps(value)
+    # A JSON string is also a YAML double quoted string, with any quotes escaped
+    return json.dumps(str(value), ensure_ascii=False) if quoted else f"{value}"
+
+def set_front_matter_fields(source, fields):
+    """
+    Return the raw cell source with the given top level keys set. Existing
+    lines are replaced in place, keeping their quoting, and new keys are
+    added just before the closing ---.
+    """
+    lines = source.split("\n")
+    remaining = dict(fields)
+
+    # Find the fences, leading blank lines are allowed before the opening one
+    fences = [i for i, line in enumerate(lines) if line.strip() == "---"][:2]
+    if len(fences) < 2:
+        body = "\n".join(f"{k}: {_format_value(v, True)}" for k, v in fields.items())
+        return f"---\n{body}\n---\n"
+    opening, closing = fences
+
+    i = opening + 1
+    while i < closing:
+        line = lines[i]
+        i += 1
+        if line[:1].isspace() or ":" not in line:
+            continue  # Nested value or continuation line
+        key, value = line.split(":", 1)
+        if key.strip() in remaining:
+            quoted = value.strip().startswith('"')
+            lines[i - 1] = f"{key.strip()}: {_format_value(remaining.pop(key.strip()), quoted)}"
+            # The old value's continuation lines go with it
+            end = i
+            while end < closing and (lines[end][:1].isspace() or not lines[end].strip()):
+                end += 1
+            while end > i and not lines[end - 1].strip():
+                end -= 1  # Blank lines after the value aren't part of it
+            del lines[i:end]
+            closing -= end - i
+
+    new_lines = [f"{k}: {_format_value(v, True)}" for k, v in remaining.items()]
+    lines[closing:closing] = new_lines
+    return "\n".join(lines)
+
+def _dump_cell(cell):
+    # Same layout as nbformat.write: indent=1, sorted keys, the cell sits two
+    # levels deep, and the source is stored as a list of lines
+    cell = dict(cell)
+    if isinstance(cell.get("source"), str):
+        cell["source"] = cell["source"].splitlines(True)
+    return json.dumps(cell, indent=1, sort_keys=True, ensure_ascii=False).replace("\n", "\n  ")
+
+def update_front_matter(notebook_path, fields):
+    """
+    Set keys in a notebook's front matter, rewriting only the first cell.
+    Returns True if the file changed.
+    """
+    with open(notebook_path, "r", encoding="utf-8") as f:
+        found = _find_first_cell(f)
+        if found:
+            cell, start, end, text = found
+            text += f.read()
+            notebook = None
+        else:
+            f.seek(0)
+            text = f.read()
+            notebook = json.loads(text)
+            if not notebook.get("cells"):
+                return False
+            cell = notebook["cells"][0]
+
+    if cell.get("cell_type") != "raw":
+        return False
+
+    old_source = cell_source(cell)
+    new_source = set_front_matter_fields(old_source, fields)
+    if new_source == old_source:
+        return False
+    cell["source"] = new_source
+
+    if notebook is None:
+        new_text = text[:start] + _dump_cell(cell) + text[end:]
+    else:
+        new_text = json.dumps(notebook, indent=1, sort_keys=True, ensure_ascii=False) + "\n"
+
+    tmp_path = notebook_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(new_text)
+    os.replace(tmp_path, notebook_path)
+    return True
@@ -1,38 +1,60 @@
 import click
 import subprocess
 import os
-import nbformat
+import time
+import json
+import asyncio
+import hashlib
+from front_matter import read_front_matter, update_front_matter
+from build_cache import CACHE_DIR, load_manifest, save_manifest, file_hash
+from post_index import find_notebooks
+import tracing
+from tracing import span, traced
+
+# JavaScript that turns a rendered post into a social media card
+CARD_JAVASCRIPT = '''
+document.querySelector('h1.title').style.fontSize='2em';
+document.querySelector('.navbar-toggler-icon').style.display = 'none';
+document.querySelectorAll('section').forEach(el => el.style.display = 'none');
+document.querySelector('.navbar-brand-logo img').style.height='140px';
+document.querySelector('.navbar-brand-logo').style.marginTop='10px';
+document.querySelector('.quarto-title').style.marginTop='40px';
+document.querySelector('h1.title').style.top = "10px";
+document.querySelectorAll('p').forEach(el => el.style.display = 'none');
+document.querySelectorAll('li').forEach(el => el.style.display = 'none');
+document.querySelectorAll('pre').forEach(el => el.style.display = 'none');
+document.querySelectorAll('hr').forEach(el => el.style.display = 'none');
+document.querySelectorAll('div.cell').forEach(el => el.style.display = 'none');
+document.querySelectorAll('div.callout').forEach(el => el.style.display = 'none');
+'''
+CARD_WIDTH = 800
+CARD_HEIGHT = 418
+CARD_IMAGE = "social-media-card.png"
+# Front matter keys that show up on a card
+CARD_FIELDS = ["title", "subtitle", "date"]
+# Site files that change how every card looks
+CARD_ASSETS = ["styles.css", "blog-logo.svg"]
+# Hash of the inputs each generated card was made from. It also goes in the
+# post's front matter, which is committed, since CI starts without .cache/
+CARD_MANIFEST = os.path.join(CACHE_DIR, "social-cards.json")
+CARD_HASH_FIELD = "card-hash"
 
 def run_shot_scraper(url, output_folder, output_image):
     """
     Run the shot-scraper command with the given URL and predefined JavaScript modifications,
     saving the output image with the specified name.
     """
-    javascript_code = '''
-    document.querySelector('h1.title').style.fontSize='2em';
-    document.querySelector('.navbar-toggler-icon').style.display = 'none';
-    document.querySelectorAll('section').forEach(el => el.style.display = 'none');
-    document.querySelector('.navbar-brand-logo img').style.height='140px';
-    document.querySelector('.navbar-brand-logo').style.marginTop='10px';
-    document.querySelector('.quarto-title').style.marginTop='40px';
-    document.querySelector('h1.title').style.top = "10px";
-    document.querySelectorAll('p').forEach(el => el.style.display = 'none');
-    document.querySelectorAll('li').forEach(el => el.style.display = 'none');
-    document.querySelectorAll('pre').forEach(el => el.style.display = 'none');
-    document.querySelectorAll('hr').forEach(el => el.style.display = 'none');
-    document.querySelectorAll('div.cell').forEach(el => el.style.display = 'none');
-    document.querySelectorAll('div.callout').forEach(el => el.style.display = 'none');
-    '''
     
     command = [
         "uv", "run", "shot-scraper", url,
-        "-h", "418", "-w", "800",
-        "--javascript", javascript_code,
+        "-h", str(CARD_HEIGHT), "-w", str(CARD_WIDTH),
+        "--javascript", CARD_JAVASCRIPT,
         "-o", os.path.join(output_folder, output_image)
     ]
     
     try:
-        result = subprocess.run(command, check=True, capture_output=True, text=True)
+        with span("shot_scraper", url=url):
+            result = subprocess.run(command, check=True, capture_output=True, text=True)
         click.echo(f"Created screenshot for:https://geirfreysson.com/{url}".replace("_site/",""))
         return True
     except Exception as e:
@@ -40,75 +62,193 @@ def run_shot_scraper(url, output_folder, output_image):
         click.echo(f"Shot-scraper stderr:\n{e.stderr}", err=True)
         return False
 
-def update_notebook_image_tag(notebook_path, image_name):
-    """Update the notebook's first raw cell to include the image tag."""
+async def _shoot_cards(jobs, workers):
+    """
+    Screenshot every (url, output_path) in jobs with one headless Chromium and
+    a pool of pages. Returns a list of (url, output_path, seconds, error).
+    """
+    from playwright.async_api import async_playwright
+
+    queue = asyncio.Queue()
+    for job in jobs:
+        queue.put_nowait(job)
+    results = []
+
+    async with async_playwright() as p:
+        browser = await p.chromium.launch()
+
+        async def worker():
+            # Each worker reuses one page for all of its cards
+            page = await browser.new_page(viewport={"width": CARD_WIDTH, "height": CARD_HEIGHT})
+            while not queue.empty():
+                url, output_path = queue.get_nowait()
+                start = time.perf_counter()
+                try:
+                    await page.goto("file://" + os.path.abspath(url), wait_until="load")
+                    await page.evaluate(CARD_JAVASCRIPT)
+                    await page.screenshot(path=output_path)
+                    error = None
+                except Exception as e:
+                    error = e
+                results.append((url, output_path, time.perf_counter() - start, error))
+            await page.close()
+
+        await asyncio.gather(*(worker() for _ in range(min(workers, len(jobs)))))
+        await browser.close()
+    return results
+
+@traced("screenshots.batch")
+def run_batch_screenshots(jobs, workers=4):
+    """
+    Screenshot all cards in one browser instead of one shot-scraper process
+    per card. Prints a timing line per card and returns the set of urls that
+    were created.
+    """
+    if not jobs:
+        return set()
+    start = time.perf_counter()
+    results = asyncio.run(_shoot_cards(jobs, workers))
+    created = set()
+    for url, output_path, seconds, error in results:
+        if error:
+            click.echo(f"Error screenshotting {url}: {error}", err=True)
+        else:
+            created.add(url)
+            click.echo(f"Created screenshot for:https://geirfreysson.com/{url} ({seconds * 1000:.0f}ms)".replace("_site/",""))
+    elapsed = time.perf_counter() - start
+    click.echo(f"Created {len(created)} of {len(jobs)} cards in {elapsed:.1f}s with {workers} workers")
+    return created
+
+@traced("front_matter.write")
+def update_notebook_image_tag(notebook_path, image_name, current_hash=None):
+    """Update the notebook's first raw cell to include the image tag and the hash the card was made from."""
+    fields = {"image": image_name}
+    if current_hash:
+        fields[CARD_HASH_FIELD] = current_hash
     try:
-        with open(notebook_path, 'r', encoding='utf-8') as f:
-            notebook = nbformat.read(f, as_version=4)
-            
-        if notebook.cells and notebook.cells[0].cell_type == "raw":
-            metadata = notebook.cells[0].source
-            lines = metadata.split("\n")
-            new_lines = []
-            image_tag_found = False
-            
-            for line in lines:
-                if line.strip().startswith("image:"):
-                    new_lines.append(f"image: \"{image_name}\"")
-                    image_tag_found = True
-                else:
-                    new_lines.append(line)
-            
-            # Ensure the image tag is added as the second-to-last line
-            if not image_tag_found:
-                if len(new_lines) > 0:
-                    new_lines.insert(len(new_lines) - 1, f"image: \"{image_name}\"")
-                else:
-                    new_lines.append(f"image: \"{image_name}\"")
-            
-            notebook.cells[0].source = "\n".join(new_lines)
-            
-        with open(notebook_path, 'w', encoding='utf-8') as f:
-            nbformat.write(notebook, f)
+        update_front_matter(notebook_path, fields)
     except Exception as e:
         click.echo(f"Error updating notebook {notebook_path}: {e}", err=True)
 
-def check_notebook_for_image_tag(notebook_path):
-    """Check if the first raw cell of the notebook contains a non-empty image tag."""
-    try:
-        with open(notebook_path, 'r', encoding='utf-8') as f:
-            notebook = nbformat.read(f, as_version=4)
-            if notebook.cells and notebook.cells[0].cell_type == "raw":
-                metadata = notebook.cells[0].source
-                if "image:" in metadata:
-                    lines = metadata.split("\n")
-                    for line in lines:
-                        if line.strip().startswith("image:"):
-                            image_value = line.split(":", 1)[-1].strip().strip('"')
-                            return bool(image_value)  # True if image is not empty
-    except Exception as e:
-        click.echo(f"Error checking notebook {notebook_path}: {e}", err=True)
-    return False
+def card_style_hash(base_folder, engine="batch"):
+    """Hash of everything that styles a card, shared by all posts."""
+    h = hashlib.sha256()
+    if engine == "raster":
+        # The raster layout lives in card_raster.py rather than the JavaScript
+        h.update(file_hash(os.path.join(os.path.dirname(os.path.abspath(__file__)), "card_raster.py")).encode("ascii"))
+    else:
+        h.update(f"{CARD_WIDTH}x{CARD_HEIGHT}\n{CARD_JAVASCRIPT}".encode("utf-8"))
+    for asset in CARD_ASSETS:
+        asset_path = os.path.join(base_folder, asset)
+        h.update(file_hash(asset_path).encode("ascii") if os.path.exists(asset_path) else b"missing")
+    return h.hexdigest()
+
+def card_hash(metadata, style_hash):
+    """Hash of the inputs that affect how one post's card looks."""
+    fields = {field: str(metadata.get(field, "")) for field in CARD_FIELDS}
+    fields["style"] = style_hash
+    # Short, it's written into every post's front matter
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+def find_stale_cards(posts_path, manifest, style_hash):
+    """
+    Return (folder, notebook_path, metadata, card_hash) for every post whose generated
+    card is missing or was made from different inputs. Posts with their own
+    image in the front matter are left alone.
+
+    The hash a card was made from comes from the post's card-hash, or else the
+    manifest. A card from before hashes were recorded counts as up to date
+    and its hash is added to manifest, so a first run doesn't re-shoot them all.
+    """
+    stale = []
+    with span("scan.cards") as scan:
+        for folder, notebook_path in find_notebooks(posts_path):
+            folder_path = os.path.join(posts_path, folder)
+            try:
+                with span("front_matter.read"):
+                    metadata = read_front_matter(notebook_path)
+            except Exception as e:
+                click.echo(f"Error checking notebook {notebook_path}: {e}", err=True)
+                continue
+            image = metadata.get("image") or ""
+            if image and image != CARD_IMAGE:
+                continue
+            current = card_hash(metadata, style_hash)
+            recorded = str(metadata[CARD_HASH_FIELD]) if metadata.get(CARD_HASH_FIELD) else manifest.get(folder)
+            if image and recorded is None:
+                manifest[folder] = current
+            elif (not image or recorded != current
+                    # A card made here that has since been deleted, CI checkouts have no card files
+                    or (folder in manifest and not os.path.exists(os.path.join(folder_path, CARD_IMAGE)))):
+                stale.append((folder, notebook_path, metadata, current))
+        scan.set(stale=len(stale))
+    return stale
 
 @click.command()
 @click.argument('base_folder', type=click.Path(exists=True), default=".")
-def main(base_folder):
-    """Loop through all folders in 'posts' and check for missing images."""
+@click.option("--workers", default=4, show_default=True, help="Browser pages (or raster processes) to use in parallel")
+@click.option("--engine", type=click.Choice(["batch", "shot-scraper", "raster"]), default="batch", show_default=True,
+              help="Screenshot all cards in one browser, run shot-scraper once per card, "
+                   "or draw cards from the front matter without a browser")
+@click.option("--check", is_flag=True, help="List stale cards without rendering them")
+@click.option("--profile", is_flag=True, help="Time each stage, print a table and write a trace to .cache/traces/")
+def main(base_folder, workers, engine, check, profile):
+    """
+    Loop through all folders in 'posts' and (re)generate social media cards
+    that are missing or whose title, date, subtitle or styling has changed.
+    """
+    tracing.enable_from_env(["--profile"] if profile else [])
     posts_path = os.path.join(base_folder, "posts")
-    
-    for folder in os.listdir(posts_path):
-        folder_path = os.path.join(posts_path, folder)
-        if os.path.isdir(folder_path):
-            notebook_path = os.path.join(folder_path, "index.ipynb")
-            if os.path.exists(notebook_path):
-                if not check_notebook_for_image_tag(notebook_path):
-                    image_name = f"social-media-card.png"
-                    site_url = os.path.join("_site/posts", folder, "index.html")
-                    output_folder = os.path.join("./posts/", folder)
-                    if run_shot_scraper(site_url, output_folder, image_name):
-                        update_notebook_image_tag(notebook_path, image_name)
-                    else:
-                        click.echo(f"Shot-scraper error.")
+    manifest_path = os.path.join(base_folder, CARD_MANIFEST)
+    manifest = load_manifest(manifest_path)
+    stale = find_stale_cards(posts_path, manifest, card_style_hash(base_folder, engine))
+
+    if check:
+        for folder, _, _, _ in stale:
+            click.echo(f"Stale card: posts/{folder}/{CARD_IMAGE}")
+        click.echo(f"{len(stale)} stale cards")
+        raise SystemExit(1 if stale else 0)
+
+    def card_created(folder, notebook_path, current):
+        update_notebook_image_tag(notebook_path, CARD_IMAGE, current)
+        manifest[folder] = current
+
+    missing = [(folder, notebook_path, current, os.path.join("_site/posts", folder, "index.html"))
+               for folder, notebook_path, _, current in stale]
+
+    if engine == "raster":
+        from card_raster import draw_cards
+
+        logo_path = os.path.join(base_folder, "blog-logo.svg")
+        jobs = [(metadata, os.path.join(posts_path, folder, CARD_IMAGE), logo_path)
+                for folder, _, metadata, _ in stale]
+        start = time.perf_counter()
+        with span("cards.raster", cards=len(jobs)):
+            results = draw_cards(jobs, workers)
+        drawn = 0
+        for (folder, notebook_path, _, current), (output_path, seconds, error) in zip(stale, results):
+            if error:
+                click.echo(f"Error drawing card for posts/{folder}: {error}", err=True)
+            else:
+                click.echo(f"Drew card for posts/{folder} ({seconds * 1000:.0f}ms)")
+                card_created(folder, notebook_path, current)
+                drawn += 1
+        click.echo(f"Drew {drawn} of {len(stale)} cards in {time.perf_counter() - start:.1f}s with {workers} workers")
+    elif engine == "shot-scraper":
+        for folder, notebook_path, current, site_url in missing:
+            if run_shot_scraper(site_url, os.path.join("./posts/", folder), CARD_IMAGE):
+                card_created(folder, notebook_path, current)
+            else:
+                click.echo(f"Shot-scraper error.")
+    else:
+        jobs = [(site_url, os.path.join("./posts/", folder, CARD_IMAGE)) for folder, _, _, site_url in missing]
+        created = run_batch_screenshots(jobs, workers)
+        for folder, notebook_path, current, site_url in missing:
+            if site_url in created:
+                card_created(folder, notebook_path, current)
+
+    with span("manifest.save"):
+        save_manifest(manifest, manifest_path)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,186 @@
+"""
+Pull the readable main content out of a web page for qblog.py and qblog2.py.
+
+Scripts, styles and page chrome (header, footer, nav, aside) are dropped,
+then the first <article>, <main> or div.content is used as the main content,
+falling back to the whole body.
+
+StreamingExtractor works on a page that is still being downloaded, so
+reading can stop once there is enough text, and extract_content runs it on
+a whole page. The page is parsed incrementally with lxml's pull parser when
+lxml is installed and the standard library's html.parser otherwise.
+"""
+from html.parser import HTMLParser
+
+try:
+    from lxml import etree
+except ImportError:  # Fall back to the slower pure Python parser
+    etree = None
+
+# Never part of the text
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "iframe"}
+# Page chrome around the content
+BOILERPLATE_TAGS = {"header", "footer", "nav", "aside"}
+
+class _LxmlEngine:
+    """Feeds lxml's incremental HTML parser and replays its tree as start, end and text calls."""
+    def __init__(self, extractor):
+        self.extractor = extractor
+        self.parser = etree.HTMLPullParser(events=("start", "end"), remove_comments=True, remove_pis=True)
+
+    def feed(self, data):
+        self.parser.feed(data)
+        self._read()
+
+    def close(self):
+        try:
+            self.parser.close()
+        except etree.XMLSyntaxError:
+            # Nothing was fed, e.g. an empty page
+            return
+        self._read()
+
+    def _read(self):
+        extractor = self.extractor
+        for event, element in self.parser.read_events():
+            if event == "start":
+                # Text before this element is the parent's text or the previous sibling's tail
+                parent = element.getparent()
+                previous = element.getprevious()
+                text = previous.tail if previous is not None else parent.text if parent is not None else None
+                if text:
+                    extractor.data(text)
+                extractor.start(element.tag, element.get("class"))
+                # Siblings already read are no longer needed, so memory stays flat on big pages
+                if previous is not None:
+                    while element.getprevious() is not None:
+                        del parent[0]
+            else:
+                text = element[-1].tail if len(element) else element.text
+                if text:
+                    extractor.data(text)
+                extractor.end(element.tag)
+                element.clear(keep_tail=True)
+
+class _HTMLParserEngine(HTMLParser):
+    # Elements that never get an end tag
+    VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+    def __init__(self, extractor):
+        super().__init__(convert_charrefs=True)
+        self.extractor = extractor
+
+    def handle_starttag(self, tag, attrs):
+        self.extractor.start(tag, dict(attrs).get("class"))
+        if tag in self.VOID_TAGS:
+            self.extractor.end(tag)
+
+    def handle_endtag(self, tag):
+        self.extractor.end(tag)
+
+    def handle_data(self, data):
+        self.extractor.data(data)
+
+class StreamingExtractor:
+    """
+    Collects a page's title and main content as it is parsed. Feed it
+    decoded HTML with feed(), and stop reading once done is True: by then
+    it has collected max_chars of main content, or of body text on a page
+    with no main content element.
+    """
+    def __init__(self, max_chars=None):
+        self.max_chars = max_chars
+        self.title_parts = []
+        self.main_parts = []
+        self.body_parts = []
+        self.main_chars = 0
+        self.body_chars = 0
+        self.main_seen = False
+        # Open elements, with whether each one is skipped or main content
+        self._stack = []
+        self._skip = 0
+        self._main = 0
+        self._in_title = False
+        # Text arrives in pieces split at chunk boundaries, join it up to the next tag
+        self._pending = []
+        self._engine = _LxmlEngine(self) if etree is not None else _HTMLParserEngine(self)
+        self._closed = False
+
+    def feed(self, data):
+        if data:
+            self._engine.feed(data)
+
+    @property
+    def done(self):
+        if self.max_chars is None:
+            return False
+        if self.main_chars >= self.max_chars:
+            return True
+        # No main content element so far, give up waiting for one eventually
+        return not self.main_seen and self.body_chars >= 2 * self.max_chars
+
+    def start(self, tag, classes):
+        self._flush()
+        skip = tag in SKIP_TAGS or tag in BOILERPLATE_TAGS
+        main = tag in ("article", "main") or (tag == "div" and "content" in (classes or "").split())
+        # Only the first main content element counts
+        main = main and (not self.main_seen or self._main > 0)
+        self._stack.append((tag, skip, main))
+        self._skip += skip
+        self._main += main
+        self.main_seen = self.main_seen or main
+        self._in_title = tag == "title"
+
+    def end(self, tag):
+        self._flush()
+        # lxml always closes the innermost element, html.parser follows the page's own tags
+        if not self._stack or (self._stack[-1][0] != tag and not any(open_tag == tag for open_tag, _, _ in self._stack)):
+            return
+        # Close everything up to the matching tag, HTML often leaves tags open
+        while self._stack:
+            open_tag, skip, main = self._stack.pop()
+            self._skip -= skip
+            self._main -= main
+            if open_tag == tag:
+                break
+        self._in_title = False
+
+    def data(self, data):
+        self._pending.append(data)
+
+    def _flush(self):
+        if not self._pending:
+            return
+        data = "".join(self._pending)
+        self._pending = []
+        if self._in_title:
+            self.title_parts.append(data)
+            return
+        text = data.strip()
+        if not text or self._skip:
+            return
+        if self._main:
+            self.main_parts.append(text)
+            self.main_chars += len(text) + 1
+        elif not self.main_seen:
+            self.body_parts.append(text)
+            self.body_chars += len(text) + 1
+
+    def result(self):
+        """Return (title, text) for what has been read so far."""
+        if not self._closed and not self.done:
+            # Elements still open at the end of the page only end now
+            self._closed = True
+            self._engine.close()
+        self._flush()
+        parts = self.main_parts if self.main_parts else self.body_parts
+        text = "\n".join(parts)
+        if self.max_chars is not None:
+            text = text[:self.max_chars]
+        return "".join(self.title_parts).strip(), text
+
+def extract_content(html):
+    """Return (title, text) for the main content of a whole HTML page."""
+    extractor = StreamingExtractor()
+    extractor.feed(html)
+    return extractor.result()
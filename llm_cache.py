@@ -0,0 +1,267 @@
+"""
+Cache of LLM responses for the post summarisers in qblog.py and qblog2.py.
+
+Responses are stored in SQLite keyed on a hash of the backend, model, prompt
+template and content, so asking the same model the same thing again is
+instant. Entries expire after a TTL and the least recently used ones are
+evicted when the cache grows too big. Each entry keeps the latency and token
+counts of the original call, and every real call is logged with its
+time-to-first-token and tokens per second so models can be compared.
+
+Set QBLOG_NO_CACHE=1 to bypass the cache, or QBLOG_REFRESH=1 to ask the
+model again and overwrite what is cached.
+"""
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+
+from build_cache import CACHE_DIR
+
+DEFAULT_PATH = os.path.join(CACHE_DIR, "llm.sqlite3")
+DEFAULT_TTL = 30 * 24 * 60 * 60
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    backend TEXT NOT NULL,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    latency REAL,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS calls (
+    backend TEXT NOT NULL,
+    model TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    latency REAL NOT NULL,
+    ttft REAL,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    streamed INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS backend_calls (
+    backend TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    latency REAL NOT NULL,
+    outcome TEXT NOT NULL,
+    hedged INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+"""
+
+STAT_NAMES = ["hits", "misses", "refreshed", "expired", "evictions", "seconds_saved"]
+
+_cache = None
+_cache_lock = threading.Lock()
+_cache_settings = {
+    "enabled": not os.environ.get("QBLOG_NO_CACHE"),
+    "refresh": bool(os.environ.get("QBLOG_REFRESH")),
+    "path": None,
+}
+
+def cache_key(backend, model, template, content):
+    h = hashlib.sha256()
+    for part in (backend, model, template, content):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+class ResponseCache:
+    def __init__(self, path=DEFAULT_PATH, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _count(self, name, n=1):
+        self._db.execute("INSERT INTO stats (name, value) VALUES (?, ?) "
+                         "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", (name, n))
+
+    def record(self, name, n=1):
+        with self._lock, self._db:
+            self._count(name, n)
+
+    def get(self, key):
+        """Return the cached entry as a dict, or None if missing or expired."""
+        now = time.time()
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT response, latency, prompt_tokens, completion_tokens, created_at "
+                "FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if now - row[4] > self.ttl:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._count("expired")
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+        return dict(zip(["response", "latency", "prompt_tokens", "completion_tokens", "created_at"], row))
+
+    def put(self, key, backend, model, response, latency=None, prompt_tokens=None, completion_tokens=None):
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, backend, model, response, latency, "
+                "prompt_tokens, completion_tokens, created_at, last_used, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, backend, model, response, latency, prompt_tokens, completion_tokens,
+                 now, now, len(response.encode("utf-8"))))
+            self._evict(now)
+
+    def _evict(self, now):
+        expired = self._db.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,)).rowcount
+        if expired:
+            self._count("expired", expired)
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._count("evictions")
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def record_call(self, backend, model, latency, ttft=None, prompt_tokens=None,
+                    completion_tokens=None, streamed=False):
+        """Log the timing of a real call to a model."""
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO calls (backend, model, started_at, latency, ttft, prompt_tokens, "
+                "completion_tokens, streamed) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (backend, model, time.time() - latency, latency, ttft, prompt_tokens,
+                 completion_tokens, int(streamed)))
+
+    def record_backend_call(self, backend, latency, outcome, hedged=False):
+        """Log one attempt made by llm_router: ok, error, won or lost a hedge, or skipped."""
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO backend_calls (backend, started_at, latency, outcome, hedged) VALUES (?, ?, ?, ?, ?)",
+                (backend, time.time() - latency, latency, outcome, int(hedged)))
+
+    def backend_calls(self, since=None):
+        """
+        Every logged router attempt as {backend: {"latencies": [...], outcome: count}},
+        optionally only those started after since.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT backend, latency, outcome FROM backend_calls WHERE started_at >= ? ORDER BY backend",
+                (since or 0,)).fetchall()
+        backends = {}
+        for backend, latency, outcome in rows:
+            entry = backends.setdefault(backend, {"latencies": []})
+            entry[outcome] = entry.get(outcome, 0) + 1
+            if outcome in ("ok", "won", "lost"):
+                entry["latencies"].append(latency)
+        return backends
+
+    def model_stats(self):
+        """
+        Average latency, time-to-first-token and generation speed per backend
+        and model, over every logged call.
+        """
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT backend, model, COUNT(*), AVG(latency), AVG(ttft), "
+                "AVG(CASE WHEN completion_tokens > 0 AND latency > COALESCE(ttft, 0) "
+                "    THEN completion_tokens / (latency - COALESCE(ttft, 0)) END) "
+                "FROM calls GROUP BY backend, model ORDER BY backend, model").fetchall()
+        return [dict(zip(["backend", "model", "calls", "latency", "ttft", "tokens_per_second"], row))
+                for row in rows]
+
+    def stats(self):
+        with self._lock:
+            stats = {name: 0 for name in STAT_NAMES}
+            stats.update(dict(self._db.execute("SELECT name, value FROM stats").fetchall()))
+            stats["entries"], stats["bytes"], stats["prompt_tokens"], stats["completion_tokens"] = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(prompt_tokens), 0), "
+                "COALESCE(SUM(completion_tokens), 0) FROM responses").fetchone()
+        return stats
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM responses")
+            self._db.execute("DELETE FROM calls")
+            self._db.execute("DELETE FROM backend_calls")
+            self._db.execute("DELETE FROM stats")
+
+def configure_cache(enabled=True, refresh=False, path=None):
+    """Turn the response cache on or off, or make every call refresh its entry."""
+    global _cache
+    # A long-running process (qblog2 serve) keeps its open cache unless it has to change
+    if (enabled, path) != (_cache_settings["enabled"], _cache_settings["path"]):
+        _cache = None
+    _cache_settings.update(enabled=enabled, refresh=refresh, path=path)
+
+def get_cache():
+    """The shared ResponseCache, or None if caching is turned off."""
+    global _cache
+    if not _cache_settings["enabled"]:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(_cache_settings["path"]) if _cache_settings["path"] else ResponseCache()
+        return _cache
+
+# Timing of the most recent real model call, for printing after a summary
+last_call = {}
+
+def cached_completion(backend, model, template, content, call, on_token=None):
+    """
+    Return the model's response for template + content, from the cache if
+    possible. call() does the real request and returns
+    (text, prompt_tokens, completion_tokens, ttft); token counts and the
+    time-to-first-token may be None. If on_token is given it is called with
+    the cached response on a hit, streaming callers pass it to call themselves.
+    """
+    cache = get_cache()
+    key = cache_key(backend, model, template, content)
+    if cache and not _cache_settings["refresh"]:
+        entry = cache.get(key)
+        if entry:
+            cache.record("hits")
+            cache.record("seconds_saved", entry["latency"] or 0)
+            if on_token:
+                on_token(entry["response"])
+            return entry["response"]
+
+    start = time.perf_counter()
+    text, prompt_tokens, completion_tokens, ttft = call()
+    latency = time.perf_counter() - start
+    if cache:
+        cache.record("refreshed" if _cache_settings["refresh"] else "misses")
+        cache.put(key, backend, model, text, latency, prompt_tokens, completion_tokens)
+        cache.record_call(backend, model, latency, ttft, prompt_tokens, completion_tokens,
+                          streamed=ttft is not None)
+    last_call.update(backend=backend, model=model, latency=latency, ttft=ttft,
+                     completion_tokens=completion_tokens)
+    return text
+
+def format_call(call):
+    """One line describing how fast a model call was."""
+    line = f"{call['backend']}/{call['model']}: {call['latency']:.1f}s"
+    if call.get("ttft") is not None:
+        line += f", first token after {call['ttft']:.2f}s"
+        generating = call["latency"] - call["ttft"]
+        if call.get("completion_tokens") and generating > 0:
+            line += f", {call['completion_tokens'] / generating:.1f} tokens/s"
+    return line
@@ -0,0 +1,241 @@
+"""
+Route summariser calls across LLM backends.
+
+OpenAI and each Ollama server get a limit on how many calls can run against
+them at once, shared by all the models on that server, and each backend
+(OpenAI, or an Ollama model) gets a circuit breaker that stops sending it
+work for a while after it fails several times in a row. A call names the backends to
+use in order of preference: the first one is tried, and if it hasn't answered
+after hedge_after seconds the same prompt is sent to the next one as well
+(a hedged request), and whichever answers first wins. A backend that fails
+hands over to the next one straight away.
+
+Every attempt's latency and outcome is logged in the summary cache database
+so `qblog2 backends` can show latency histograms per backend.
+"""
+import os
+import time
+import threading
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+
+import llm_cache
+
+DEFAULT_HEDGE_AFTER = 20.0
+DEFAULT_TIMEOUT = 300.0
+# Calls allowed at once per server, a local Ollama only runs a couple in parallel
+DEFAULT_LIMITS = {"openai": 8, "ollama": 2}
+DEFAULT_OLLAMA_HOST = "localhost:11434"
+# Consecutive failures that open the circuit, and how long it stays open
+FAILURE_THRESHOLD = 3
+RESET_AFTER = 30.0
+# Upper bounds in seconds of the latency histogram buckets
+HISTOGRAM_BUCKETS = [0.5, 1, 2, 5, 10, 20, 30, 60, 120, float("inf")]
+
+_router = None
+_router_lock = threading.Lock()
+_router_settings = {"hedge_after": DEFAULT_HEDGE_AFTER, "timeout": DEFAULT_TIMEOUT}
+
+class BackendError(Exception):
+    """A backend couldn't be used, for example because it isn't configured."""
+
+class AllBackendsFailed(Exception):
+    """Raised when no backend produced an answer."""
+
+def backend_kind(name):
+    return "openai" if name.lower() == "openai" else "ollama"
+
+def backend_server(name):
+    """Which server a backend runs on, every Ollama model on the same OLLAMA_HOST shares one."""
+    if backend_kind(name) == "openai":
+        return "openai"
+    return f"ollama@{os.environ.get('OLLAMA_HOST') or DEFAULT_OLLAMA_HOST}"
+
+class Backend:
+    def __init__(self, name, limit, slots=None):
+        self.name = name
+        # Shared with the other backends on the same server
+        self.slots = slots or threading.BoundedSemaphore(limit)
+        self.limit = limit
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            return "open" if time.time() - self.opened_at < RESET_AFTER else "half-open"
+
+    def allow(self):
+        """False while the circuit is open. Once RESET_AFTER has passed one trial call is let through."""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.time() - self.opened_at < RESET_AFTER:
+                return False
+            # Half-open: let this call through and keep others out until it reports back
+            self.opened_at = time.time()
+            return True
+
+    def succeeded(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def failed(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= FAILURE_THRESHOLD:
+                self.opened_at = time.time()
+
+class _Race:
+    """Shared state of one routed call: who won, and whose tokens are being streamed."""
+    def __init__(self, on_token):
+        self.on_token = on_token
+        self.winner = None
+        self.streaming = None
+        self.lock = threading.Lock()
+
+    def token_callback(self, name):
+        if not self.on_token:
+            return None
+        def on_token(token):
+            # The first backend to produce a token gets the stream, the others stay quiet.
+            # Once there is a winner only it may stream, a loser still generating is cut off
+            with self.lock:
+                if self.winner is not None and self.winner != name:
+                    return
+                if self.streaming is None:
+                    self.streaming = name
+                mine = self.streaming == name
+            if mine:
+                self.on_token(token)
+        return on_token
+
+class Router:
+    def __init__(self, hedge_after=DEFAULT_HEDGE_AFTER, timeout=DEFAULT_TIMEOUT, limits=None):
+        self.hedge_after = hedge_after
+        self.timeout = timeout
+        self.limits = dict(DEFAULT_LIMITS, **(limits or {}))
+        self.backends = {}
+        self.servers = {}
+        self._lock = threading.Lock()
+
+    def backend(self, name):
+        with self._lock:
+            if name not in self.backends:
+                limit = self.limits[backend_kind(name)]
+                server = backend_server(name)
+                if server not in self.servers:
+                    self.servers[server] = threading.BoundedSemaphore(limit)
+                self.backends[name] = Backend(name, limit, self.servers[server])
+            return self.backends[name]
+
+    def _attempt(self, backend, call, race, hedged):
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            with backend.slots:
+                text = call(backend.name, race.token_callback(backend.name))
+            backend.succeeded()
+            with race.lock:
+                if race.winner is None:
+                    race.winner = backend.name
+                    outcome = "won" if hedged else "ok"
+                else:
+                    outcome = "lost"
+            return text
+        except Exception:
+            backend.failed()
+            raise
+        finally:
+            _record(backend.name, time.perf_counter() - start, outcome, hedged)
+
+    def _start(self, backend, call, race, hedged):
+        future = Future()
+        def run():
+            try:
+                future.set_result(self._attempt(backend, call, race, hedged))
+            except Exception as e:
+                future.set_exception(e)
+        # Daemon threads, so a hedge that lost doesn't keep the command from exiting
+        threading.Thread(target=run, name=f"llm-{backend.name}", daemon=True).start()
+        return future
+
+    def call(self, names, call, on_token=None):
+        """
+        Return call(name, on_token) from the first of the named backends to
+        answer, hedging to the next backend after hedge_after seconds and
+        failing over straight away on errors. Raises AllBackendsFailed.
+        """
+        race = _Race(on_token)
+        waiting = list(dict.fromkeys(names))
+        pending = {}
+        errors = []
+        deadline = time.perf_counter() + self.timeout
+
+        def start_next():
+            while waiting:
+                backend = self.backend(waiting.pop(0))
+                if not backend.allow():
+                    errors.append(f"{backend.name}: circuit open")
+                    _record(backend.name, 0, "skipped", bool(pending or errors))
+                    continue
+                future = self._start(backend, call, race, bool(pending or errors))
+                pending[future] = backend
+                return
+
+        start_next()
+        while pending:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            done, _ = wait(pending, timeout=min(self.hedge_after, remaining) if waiting else remaining,
+                           return_when=FIRST_COMPLETED)
+            if not done:
+                # Still waiting, ask the next backend too
+                start_next()
+                continue
+            for future in done:
+                backend = pending.pop(future)
+                try:
+                    return future.result()
+                except Exception as e:
+                    errors.append(f"{backend.name}: {e}")
+                    start_next()
+
+        for backend in pending.values():
+            # Whatever is still running is left to finish in the background
+            errors.append(f"{backend.name}: no answer after {self.timeout:.0f}s")
+            backend.failed()
+        raise AllBackendsFailed("; ".join(errors) or "no backends to try")
+
+def _record(backend, latency, outcome, hedged):
+    cache = llm_cache.get_cache()
+    if cache:
+        cache.record_backend_call(backend, latency, outcome, hedged)
+
+def configure_router(hedge_after=DEFAULT_HEDGE_AFTER, timeout=DEFAULT_TIMEOUT):
+    """Change the hedging delay and timeout, keeping the backends' limits and circuit state."""
+    _router_settings.update(hedge_after=hedge_after, timeout=timeout)
+    if _router:
+        _router.hedge_after, _router.timeout = hedge_after, timeout
+
+def get_router():
+    """The shared Router, created on first use."""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = Router(**_router_settings)
+        return _router
+
+def histogram(latencies, buckets=HISTOGRAM_BUCKETS):
+    """Count latencies into buckets, each count being the latencies up to that bucket's bound."""
+    counts = [0] * len(buckets)
+    for latency in latencies:
+        for i, bound in enumerate(buckets):
+            if latency <= bound:
+                counts[i] += 1
+                break
+    return counts
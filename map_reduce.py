@@ -0,0 +1,115 @@
+"""
+Summarise pages that are too long for one prompt.
+
+The text is counted with tiktoken and split into chunks that fit a token
+budget, each chunk is summarised in parallel (map), and the partial
+summaries are summarised into the final summary (reduce). Text that already
+fits the budget goes to the model in one go, as before.
+"""
+import re
+import time
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+
+import tiktoken
+
+DEFAULT_ENCODING = "o200k_base"
+DEFAULT_WORKERS = 4
+# Prompt for the map step, the final summary uses the caller's own prompt
+CHUNK_PROMPT = """
+Below is one part of a longer web page. Summarise what this part says in a short paragraph,
+keeping the key facts, names and numbers and leaving out navigation, adverts and other boilerplate.
+Text:
+"""
+
+@lru_cache(maxsize=None)
+def get_encoding(name=DEFAULT_ENCODING):
+    return tiktoken.get_encoding(name)
+
+def count_tokens(text, encoding=DEFAULT_ENCODING):
+    return len(get_encoding(encoding).encode(text, disallowed_special=()))
+
+def clean_text(text):
+    """Collapse the runs of blank lines and spaces that get_text() leaves behind."""
+    text = re.sub(r"[ \t\r\f\v]+", " ", text)
+    text = re.sub(r" ?\n ?", "\n", text)
+    text = re.sub(r"\n\s*\n+", "\n\n", text)
+    return text.strip()
+
+def split_into_chunks(text, max_tokens, encoding=DEFAULT_ENCODING):
+    """
+    Split text into chunks of at most max_tokens, breaking between paragraphs
+    where possible and inside a paragraph only if it is too long by itself.
+    """
+    enc = get_encoding(encoding)
+    chunks = []
+    current = []
+    current_tokens = 0
+
+    for paragraph in text.split("\n\n"):
+        tokens = enc.encode(paragraph, disallowed_special=())
+        if len(tokens) > max_tokens:
+            if current:
+                chunks.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            chunks.extend(enc.decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens), max_tokens))
+            continue
+        if current_tokens + len(tokens) > max_tokens:
+            chunks.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        current.append(paragraph)
+        # The paragraph break costs about a token
+        current_tokens += len(tokens) + 1
+
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+def map_reduce_summarize(text, summarize, max_tokens, workers=DEFAULT_WORKERS, encoding=DEFAULT_ENCODING):
+    """
+    Summarise text within a token budget. summarize(content, template) calls
+    the model, template=None meaning the caller's final summary prompt.
+    Returns (summary, report) where report has the token counts, number of
+    chunks and wall-clock time.
+    """
+    start = time.perf_counter()
+    raw_tokens = count_tokens(text, encoding)
+    text = clean_text(text)
+    text_tokens = count_tokens(text, encoding)
+    report = {"raw_tokens": raw_tokens, "input_tokens": text_tokens, "chunks": 0, "rounds": 0, "tokens_sent": 0}
+
+    # Keep mapping until the partial summaries fit in one prompt
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        while text_tokens > max_tokens:
+            chunks = split_into_chunks(text, max_tokens, encoding)
+            report["chunks"] += len(chunks)
+            report["rounds"] += 1
+            report["tokens_sent"] += sum(count_tokens(chunk, encoding) for chunk in chunks)
+            partials = list(pool.map(lambda chunk: summarize(chunk, CHUNK_PROMPT), chunks))
+            text = "\n\n".join(partial.strip() for partial in partials)
+
+            previous_tokens, text_tokens = text_tokens, count_tokens(text, encoding)
+            if text_tokens >= previous_tokens:
+                # The model isn't shortening anything, cut to the budget rather than loop forever
+                text = get_encoding(encoding).decode(get_encoding(encoding).encode(text, disallowed_special=())[:max_tokens])
+                text_tokens = max_tokens
+
+    report["tokens_sent"] += text_tokens
+    summary = summarize(text, None)
+    report["seconds"] = time.perf_counter() - start
+    return summary, report
+
+def format_report(report):
+    """
+    Describe a map-reduce run next to what one single-shot prompt would have
+    sent, and how long it took if report has single_shot_seconds.
+    """
+    single_shot = f"single shot would send {report['raw_tokens']} tokens"
+    if report.get("single_shot_seconds") is not None:
+        single_shot = f"single shot sent {report['raw_tokens']} tokens in {report['single_shot_seconds']:.1f}s"
+    if not report["chunks"]:
+        return (f"Summarised {report['input_tokens']} tokens in one prompt in {report['seconds']:.1f}s "
+                f"({single_shot})")
+    return (f"Summarised {report['input_tokens']} tokens as {report['chunks']} chunks "
+            f"over {report['rounds']} round(s), sending {report['tokens_sent']} tokens "
+            f"in {report['seconds']:.1f}s ({single_shot})")
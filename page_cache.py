@@ -0,0 +1,163 @@
+"""
+Persistent cache of fetched web pages for qblog.py and qblog2.py.
+
+Pages are kept in a SQLite file with their ETag and Last-Modified headers so
+they can be revalidated with a conditional request, and with whatever text
+was extracted from them so re-running a summary doesn't parse the HTML again.
+The cache is bounded in size and evicts the least recently used pages.
+"""
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+
+from build_cache import CACHE_DIR
+
+DEFAULT_PATH = os.path.join(CACHE_DIR, "pages.sqlite3")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    body BLOB NOT NULL,
+    encoding TEXT,
+    etag TEXT,
+    last_modified TEXT,
+    body_hash TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS extracted (
+    url TEXT NOT NULL,
+    extractor TEXT NOT NULL,
+    body_hash TEXT NOT NULL,
+    result TEXT NOT NULL,
+    PRIMARY KEY (url, extractor)
+);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+# Counters kept in the stats table
+STAT_NAMES = ["hits", "revalidated", "misses", "extract_hits", "extract_misses", "evictions"]
+
+class CachedPage:
+    def __init__(self, url, body, encoding, etag, last_modified, body_hash, fetched_at):
+        self.url = url
+        self.body = body
+        self.encoding = encoding
+        self.etag = etag
+        self.last_modified = last_modified
+        self.body_hash = body_hash
+        self.fetched_at = fetched_at
+
+    @property
+    def text(self):
+        return self.body.decode(self.encoding or "utf-8", errors="replace")
+
+    def conditional_headers(self):
+        """Headers that ask the server to answer 304 if the page hasn't changed."""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+class PageCache:
+    def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _count(self, name, n=1):
+        self._db.execute("INSERT INTO stats (name, value) VALUES (?, ?) "
+                         "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", (name, n))
+
+    def record(self, name):
+        """Bump one of the STAT_NAMES counters."""
+        with self._lock, self._db:
+            self._count(name)
+
+    def get(self, url):
+        """Return the CachedPage for a URL, or None."""
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT url, body, encoding, etag, last_modified, body_hash, fetched_at "
+                "FROM pages WHERE url = ?", (url,)).fetchone()
+            if row:
+                self._db.execute("UPDATE pages SET last_used = ? WHERE url = ?", (time.time(), url))
+        return CachedPage(*row) if row else None
+
+    def put(self, url, body, encoding=None, etag=None, last_modified=None):
+        """Store a page and evict old ones if the cache has grown too big."""
+        now = time.time()
+        body_hash = hashlib.sha256(body).hexdigest()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO pages "
+                "(url, body, encoding, etag, last_modified, body_hash, fetched_at, last_used, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, body, encoding, etag, last_modified, body_hash, now, now, len(body)))
+            self._evict()
+        return CachedPage(url, body, encoding, etag, last_modified, body_hash, now)
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for url, size in self._db.execute("SELECT url, size FROM pages ORDER BY last_used").fetchall():
+            self._db.execute("DELETE FROM pages WHERE url = ?", (url,))
+            self._db.execute("DELETE FROM extracted WHERE url = ?", (url,))
+            self._count("evictions")
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def extracted(self, page, extractor, extract):
+        """
+        Return extract(page.text), reusing the result from a previous run if
+        the page body hasn't changed. extractor names the extraction function
+        and the result must be JSON serialisable.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT result FROM extracted WHERE url = ? AND extractor = ? AND body_hash = ?",
+                (page.url, extractor, page.body_hash)).fetchone()
+        if row:
+            self.record("extract_hits")
+            return json.loads(row[0])
+        result = extract(page.text)
+        with self._lock, self._db:
+            self._count("extract_misses")
+            self._db.execute("INSERT OR REPLACE INTO extracted (url, extractor, body_hash, result) "
+                             "VALUES (?, ?, ?, ?)", (page.url, extractor, page.body_hash, json.dumps(result)))
+        return result
+
+    def stats(self):
+        """Counters since the cache was created, plus its current size."""
+        with self._lock:
+            stats = {name: 0 for name in STAT_NAMES}
+            stats.update(dict(self._db.execute("SELECT name, value FROM stats").fetchall()))
+            stats["pages"], stats["bytes"] = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages").fetchone()
+        return stats
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM pages")
+            self._db.execute("DELETE FROM extracted")
+            self._db.execute("DELETE FROM stats")
@@ -0,0 +1,250 @@
+"""
+Ingest a folder of PDFs into a persistent FAISS index for searching.
+
+Pages are extracted with PyMuPDF in a process pool, a few pages per task, and
+the chunks are embedded in batches as soon as they arrive instead of after
+every PDF has been read. The index, the chunk texts and a manifest of each
+file's hash are kept under .cache/pdf/<folder name>/, so running it again
+only embeds PDFs that are new or changed and drops the ones that were
+deleted.
+
+    uv run pdf_ingest.py "sample_data/The 2025 AI Engineer Reading List" --embedder openai:text-embedding-3-small
+    uv run pdf_ingest.py "sample_data/The 2025 AI Engineer Reading List" --query "using llms to search documents"
+"""
+import os
+import time
+import sqlite3
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import click
+import numpy as np
+
+from build_cache import CACHE_DIR, load_manifest, save_manifest, file_hash
+from embeddings import get_embedder, DEFAULT_EMBEDDER, DEFAULT_BATCH_SIZE
+from tracing import peak_rss_mb
+
+# Same sizes as the PDF search post's RecursiveCharacterTextSplitter
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+PAGES_PER_TASK = 8
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY,
+    file TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chunks_file ON chunks (file);
+"""
+
+def split_text(text, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    """Split text into pieces of about size characters overlapping by overlap, breaking at whitespace."""
+    text = " ".join(text.split())
+    pieces = []
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            # Back up to the last space so words aren't cut in half
+            space = text.rfind(" ", start + size // 2, end)
+            end = space if space > 0 else end
+        pieces.append(text[start:end])
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return pieces
+
+def page_count(path):
+    import pymupdf
+    with pymupdf.open(path) as doc:
+        return doc.page_count
+
+def extract_pages(path, first, last, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP):
+    """Runs in a worker: return [(page_number, chunk_text)] for pages first..last-1 of a PDF."""
+    import pymupdf
+
+    chunks = []
+    with pymupdf.open(path) as doc:
+        for number in range(first, min(last, doc.page_count)):
+            chunks.extend((number + 1, text) for text in split_text(doc[number].get_text(), size, overlap))
+    return chunks
+
+class PdfIndex:
+    def __init__(self, directory):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "index.faiss")
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(directory, "chunks.sqlite3"))
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    def _load(self, embedder, manifest):
+        """The existing index, or a new one (and an empty manifest) if it can't be reused."""
+        import faiss
+
+        count = self._db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+        if manifest.get("embedder") == embedder.name and os.path.exists(self.index_path):
+            index = faiss.read_index(self.index_path)
+            if index.ntotal == count:
+                return index, manifest
+        with self._db:
+            self._db.execute("DELETE FROM chunks")
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(embedder.dimensions())), {"embedder": embedder.name, "files": {}}
+
+    def _drop(self, index, name):
+        """Remove a file's chunks from the index and the chunk table."""
+        ids = [row[0] for row in self._db.execute("SELECT id FROM chunks WHERE file = ?", (name,))]
+        if ids:
+            index.remove_ids(np.array(ids, dtype=np.int64))
+        self._db.execute("DELETE FROM chunks WHERE file = ?", (name,))
+
+    def ingest(self, pdf_dir, embedder, workers=4, full=False, on_progress=None):
+        """
+        Embed the new and changed PDFs in pdf_dir and drop deleted ones.
+        Returns counts, timings and peak memory. A PDF that can't be read is
+        left out, with its error in stats["failed"], and tried again next run.
+        """
+        import faiss
+
+        start = time.perf_counter()
+        manifest = {} if full else load_manifest(self.manifest_path)
+        index, manifest = self._load(embedder, manifest)
+        known = manifest["files"]
+
+        current = {}
+        for name in sorted(os.listdir(pdf_dir)):
+            if not name.lower().endswith(".pdf"):
+                continue
+            path = os.path.join(pdf_dir, name)
+            stat = os.stat(path)
+            entry = known.get(name)
+            # Same size and mtime as last time means same file, without hashing it again
+            if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns:
+                current[name] = entry
+            else:
+                current[name] = {"hash": file_hash(path), "size": stat.st_size, "mtime": stat.st_mtime_ns}
+        changed = [name for name, entry in current.items()
+                   if name not in known or known[name]["hash"] != entry["hash"]]
+        removed = [name for name in known if name not in current]
+        stats = {"files": len(current), "changed": len(changed), "removed": len(removed),
+                 "pages": 0, "chunks": 0, "embed_seconds": 0.0, "failed": {}}
+
+        for name in changed + removed:
+            self._drop(index, name)
+            known.pop(name, None)
+        # Touched but not changed, e.g. by a copy or a checkout: remember the new mtime so it isn't hashed again
+        for name, entry in current.items():
+            if name in known:
+                known[name].update(entry)
+
+        pending = []
+
+        def embed_batch(batch):
+            ids = [self._db.execute("INSERT INTO chunks (file, page, text) VALUES (?, ?, ?)", chunk).lastrowid
+                   for chunk in batch]
+            embed_start = time.perf_counter()
+            vectors = embedder.embed([text for _, _, text in batch])
+            stats["embed_seconds"] += time.perf_counter() - embed_start
+            index.add_with_ids(vectors, np.array(ids, dtype=np.int64))
+            stats["chunks"] += len(batch)
+
+        # Spawned rather than forked, the embedder may already have threads running
+        with ProcessPoolExecutor(max_workers=max(workers, 1), mp_context=multiprocessing.get_context("spawn")) as pool:
+            counts = {name: pool.submit(page_count, os.path.join(pdf_dir, name)) for name in changed}
+            pages = {}
+            for name, task in counts.items():
+                try:
+                    pages[name] = task.result()
+                except Exception as e:
+                    # A corrupt or truncated PDF shouldn't stop the others
+                    stats["failed"][name] = str(e)
+            tasks = {pool.submit(extract_pages, os.path.join(pdf_dir, name), first, first + PAGES_PER_TASK):
+                     (name, min(PAGES_PER_TASK, count - first))
+                     for name, count in pages.items() for first in range(0, count, PAGES_PER_TASK)}
+            # Chunks are embedded in batches as the pages come in
+            for task in as_completed(tasks):
+                name, page_total = tasks[task]
+                if name in stats["failed"]:
+                    continue
+                try:
+                    chunks = task.result()
+                except Exception as e:
+                    stats["failed"][name] = str(e)
+                    continue
+                stats["pages"] += page_total
+                pending.extend((name, page, text) for page, text in chunks)
+                while len(pending) >= embedder.batch_size:
+                    embed_batch(pending[:embedder.batch_size])
+                    del pending[:embedder.batch_size]
+                if on_progress:
+                    on_progress(stats)
+        pending = [chunk for chunk in pending if chunk[0] not in stats["failed"]]
+        if pending:
+            embed_batch(pending)
+
+        # Pages of a failed PDF that were read before the error come out again
+        for name in stats["failed"]:
+            self._drop(index, name)
+        for name in changed:
+            if name not in stats["failed"]:
+                known[name] = dict(current[name], pages=pages[name])
+        tmp_path = self.index_path + ".tmp"
+        faiss.write_index(index, tmp_path)
+        os.replace(tmp_path, self.index_path)
+        self._db.commit()
+        save_manifest(manifest, self.manifest_path)
+
+        stats["seconds"] = time.perf_counter() - start
+        stats["peak_rss_mb"] = peak_rss_mb(children=True)
+        return stats
+
+    def search(self, query, embedder, k=10):
+        """Return [(score, file, page, text)] for the k chunks most similar to the query."""
+        import faiss
+
+        index = faiss.read_index(self.index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        if index.ntotal == 0:
+            return []
+        scores, ids = index.search(embedder.embed([query]), min(k, index.ntotal))
+        results = []
+        for score, chunk_id in zip(scores[0], ids[0]):
+            row = self._db.execute("SELECT file, page, text FROM chunks WHERE id = ?", (int(chunk_id),)).fetchone()
+            if row:
+                results.append((float(score), *row))
+        return results
+
+def default_index_dir(pdf_dir):
+    return os.path.join(CACHE_DIR, "pdf", os.path.basename(os.path.normpath(pdf_dir)).replace(" ", "-"))
+
+@click.command()
+@click.argument("pdf_dir", type=click.Path(exists=True, file_okay=False))
+@click.option("--index", "index_dir", help="Where to keep the index, defaults to .cache/pdf/<folder name>")
+@click.option("--embedder", "embedder_spec", default=DEFAULT_EMBEDDER, show_default=True,
+              help="ollama:<model>, openai:<model> or stub")
+@click.option("--workers", default=4, show_default=True, help="Processes extracting pages")
+@click.option("--batch-size", default=DEFAULT_BATCH_SIZE, show_default=True, help="Chunks per embedding request")
+@click.option("--full", is_flag=True, help="Embed every PDF again")
+@click.option("--query", help="Search the index after updating it")
+@click.option("-k", "top_k", default=10, show_default=True, help="Results to show for --query")
+def main(pdf_dir, index_dir, embedder_spec, workers, batch_size, full, query, top_k):
+    """Extract, chunk and embed the PDFs in PDF_DIR into a persistent FAISS index."""
+    embedder = get_embedder(embedder_spec, batch_size=batch_size)
+    index = PdfIndex(index_dir or default_index_dir(pdf_dir))
+    stats = index.ingest(pdf_dir, embedder, workers=workers, full=full)
+    click.echo(f"{stats['files']} PDFs: embedded {stats['changed']} new or changed, removed {stats['removed']}")
+    if stats["pages"]:
+        click.echo(f"{stats['pages']} pages, {stats['chunks']} chunks in {stats['seconds']:.2f}s: "
+                   f"{stats['pages'] / stats['seconds']:.1f} pages/s, "
+                   f"{stats['embed_seconds']:.2f}s embedding, peak RSS {stats['peak_rss_mb']:.0f} MB")
+    for name, error in stats["failed"].items():
+        click.echo(f"Couldn't read {name}: {error}", err=True)
+
+    if query:
+        for score, name, page, text in index.search(query, embedder, k=top_k):
+            click.echo(f"{score:.3f}  {name} p.{page}: {text[:120]}...")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+One index of every post, shared by the maintenance scripts.
+
+find_notebooks() is the single way to discover posts. PostIndex keeps a row
+per post folder in SQLite (.cache/posts.sqlite3) with its slug, date,
+draft/publish flags, categories, image, word count and content hash.
+update() only re-reads notebooks whose size or mtime changed since the last
+run, so `qblog2 posts` can answer questions like "which posts are drafts" or
+"which posts have no card" without parsing every notebook.
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import sqlite3
+
+from build_cache import CACHE_DIR
+from front_matter import cell_source, parse_front_matter, as_bool
+
+POSTS_DIR = "posts"
+NOTEBOOK = "index.ipynb"
+DEFAULT_PATH = os.path.join(CACHE_DIR, "posts.sqlite3")
+# Folders are named like 2025-02-09-some-title, the slug is the part after the date
+DATE_PREFIX = re.compile(r"^\d{4}-\d{2}-\d{2}[a-z]?-")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    folder TEXT PRIMARY KEY,
+    notebook_path TEXT NOT NULL,
+    slug TEXT NOT NULL,
+    title TEXT,
+    date TEXT,
+    draft INTEGER,
+    publish INTEGER,
+    categories TEXT NOT NULL,
+    image TEXT,
+    has_image INTEGER NOT NULL,
+    word_count INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS posts_date ON posts (date);
+"""
+
+COLUMNS = ["folder", "notebook_path", "slug", "title", "date", "draft", "publish", "categories",
+           "image", "has_image", "word_count", "content_hash", "mtime_ns", "size", "indexed_at"]
+
+def find_notebooks(posts_dir=POSTS_DIR):
+    """
+    Return (folder, notebook_path) for every post folder with an index.ipynb,
+    sorted by folder. No posts folder means no posts.
+    """
+    found = []
+    try:
+        entries = os.scandir(posts_dir)
+    except FileNotFoundError:
+        return found
+    with entries:
+        for entry in entries:
+            notebook_path = os.path.join(entry.path, NOTEBOOK)
+            if entry.is_dir() and os.path.exists(notebook_path):
+                found.append((entry.name, notebook_path))
+    return sorted(found)
+
+def slug_for(folder):
+    return DATE_PREFIX.sub("", folder)
+
+def count_words(notebook):
+    """Words in the markdown cells, the prose of the post."""
+    return sum(len(cell_source(cell).split()) for cell in notebook.get("cells", [])
+               if cell.get("cell_type") == "markdown")
+
+def read_post(folder, notebook_path):
+    """Build the index row for one post from its notebook."""
+    with open(notebook_path, "rb") as f:
+        data = f.read()
+    notebook = json.loads(data)
+    cells = notebook.get("cells", [])
+    metadata = {}
+    if cells and cells[0].get("cell_type") == "raw":
+        metadata = parse_front_matter(cell_source(cells[0]))
+
+    image = metadata.get("image") or None
+    categories = metadata.get("categories") or []
+    stat = os.stat(notebook_path)
+    return {
+        "folder": folder,
+        "notebook_path": notebook_path,
+        "slug": slug_for(folder),
+        "title": metadata.get("title"),
+        "date": str(metadata["date"]) if metadata.get("date") else None,
+        "draft": as_bool(metadata["draft"]) if "draft" in metadata else None,
+        "publish": as_bool(metadata["publish"]) if "publish" in metadata else None,
+        "categories": json.dumps(categories if isinstance(categories, list) else [categories]),
+        "image": image,
+        "has_image": bool(image) and os.path.exists(os.path.join(os.path.dirname(notebook_path), image)),
+        "word_count": count_words(notebook),
+        "content_hash": hashlib.sha256(data).hexdigest(),
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "indexed_at": time.time(),
+    }
+
+class PostIndex:
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        self._db.close()
+
+    def update(self, posts_dir=POSTS_DIR, full=False):
+        """
+        Bring the index in line with the posts on disk, re-reading only the
+        notebooks that changed (or all of them with full=True) and dropping
+        posts that were deleted. Returns counts of what was done.
+        """
+        known = {row["folder"]: row for row in self._db.execute(
+            "SELECT folder, mtime_ns, size, image, has_image FROM posts")}
+        stats = {"scanned": 0, "updated": 0, "removed": 0, "errors": 0}
+        seen = set()
+
+        with self._db:
+            for folder, notebook_path in find_notebooks(posts_dir):
+                stats["scanned"] += 1
+                seen.add(folder)
+                row = known.get(folder)
+                stat = os.stat(notebook_path)
+                if not full and row and row["mtime_ns"] == stat.st_mtime_ns and row["size"] == stat.st_size:
+                    # Same notebook, but the image file can appear or go away on its own
+                    has_image = bool(row["image"]) and os.path.exists(os.path.join(posts_dir, folder, row["image"]))
+                    if has_image != bool(row["has_image"]):
+                        self._db.execute("UPDATE posts SET has_image = ? WHERE folder = ?", (has_image, folder))
+                    continue
+                try:
+                    post = read_post(folder, notebook_path)
+                except (OSError, ValueError) as e:
+                    print(f"Error indexing {notebook_path}: {e}")
+                    stats["errors"] += 1
+                    continue
+                self._db.execute(f"INSERT OR REPLACE INTO posts ({', '.join(COLUMNS)}) "
+                                 f"VALUES ({', '.join('?' for _ in COLUMNS)})", [post[c] for c in COLUMNS])
+                stats["updated"] += 1
+
+            for folder in set(known) - seen:
+                self._db.execute("DELETE FROM posts WHERE folder = ?", (folder,))
+                stats["removed"] += 1
+        return stats
+
+    def posts(self):
+        rows = self._db.execute("SELECT * FROM posts ORDER BY date, folder").fetchall()
+        posts = []
+        for row in rows:
+            post = dict(row)
+            post["categories"] = json.loads(post["categories"])
+            post["draft"] = None if post["draft"] is None else bool(post["draft"])
+            post["publish"] = None if post["publish"] is None else bool(post["publish"])
+            post["has_image"] = bool(post["has_image"])
+            posts.append(post)
+        return posts
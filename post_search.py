@@ -0,0 +1,231 @@
+"""
+Semantic search over the blog's own posts.
+
+Every post notebook is split into chunks, markdown and code cells alike,
+which are embedded in batches (see embeddings.py) and stored in a FAISS
+inner-product index on disk under .cache/search/, with the chunk texts in
+SQLite next to it. update() uses the post index to find posts whose content
+hash changed and only re-embeds those, removing their old vectors by id.
+search() memory-maps the FAISS file instead of reading it into memory.
+"""
+import os
+import json
+import time
+import sqlite3
+
+import numpy as np
+
+from build_cache import CACHE_DIR
+from embeddings import normalize
+from front_matter import cell_source, parse_front_matter
+from post_index import PostIndex, POSTS_DIR
+
+DEFAULT_DIR = os.path.join(CACHE_DIR, "search")
+MAX_CHUNK_CHARS = 1500
+# Posts embedded per batch of updates, bounds how many chunks are held in memory
+POSTS_PER_BATCH = 32
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    id INTEGER PRIMARY KEY,
+    folder TEXT NOT NULL,
+    cell INTEGER NOT NULL,
+    kind TEXT NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS chunks_folder ON chunks (folder);
+CREATE TABLE IF NOT EXISTS posts (
+    folder TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+def split_text(text, max_chars=MAX_CHUNK_CHARS):
+    """Split text into pieces of up to max_chars, between paragraphs where possible."""
+    pieces = []
+    current = ""
+    for paragraph in text.split("\n\n"):
+        while len(paragraph) > max_chars:
+            pieces.append(paragraph[:max_chars])
+            paragraph = paragraph[max_chars:]
+        if current and len(current) + len(paragraph) + 2 > max_chars:
+            pieces.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current.strip():
+        pieces.append(current)
+    return [piece.strip() for piece in pieces if piece.strip()]
+
+def chunk_notebook(notebook_path, max_chars=MAX_CHUNK_CHARS):
+    """Return (title, [(cell_index, kind, text)]) for the markdown and code cells of a notebook."""
+    with open(notebook_path, "r", encoding="utf-8") as f:
+        cells = json.load(f).get("cells", [])
+    title = ""
+    chunks = []
+    for i, cell in enumerate(cells):
+        kind = cell.get("cell_type")
+        if i == 0 and kind == "raw":
+            title = str(parse_front_matter(cell_source(cell)).get("title") or "")
+            continue
+        if kind not in ("markdown", "code"):
+            continue
+        chunks.extend((i, kind, text) for text in split_text(cell_source(cell), max_chars))
+    return title, chunks
+
+class SearchIndex:
+    def __init__(self, directory=DEFAULT_DIR):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "index.faiss")
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(directory, "chunks.sqlite3"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._mapped = None
+        self._mapped_mtime = None
+
+    def close(self):
+        self._db.close()
+
+    def meta(self, name):
+        row = self._db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def _load_for_update(self, embedder, full):
+        """The index to add to, or a new empty one if the embedder changed or the files disagree."""
+        import faiss
+
+        count = self._db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+        if not full and self.meta("embedder") == embedder.name and os.path.exists(self.index_path):
+            index = faiss.read_index(self.index_path)
+            if index.ntotal == count:
+                return index, False
+        # Start again, e.g. after switching embedding model or an interrupted update
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(embedder.dimensions())), True
+
+    def update(self, embedder, posts_dir=POSTS_DIR, post_index=None, full=False):
+        """
+        Embed the chunks of new and changed posts and drop deleted ones.
+        Returns counts and timings of what was done.
+        """
+        import faiss
+
+        start = time.perf_counter()
+        post_index = post_index or PostIndex()
+        post_index.update(posts_dir)
+        current = {post["folder"]: post for post in post_index.posts()}
+
+        index, rebuild = self._load_for_update(embedder, full)
+        indexed = {} if rebuild else dict(self._db.execute("SELECT folder, content_hash FROM posts"))
+        changed = [folder for folder, post in current.items() if indexed.get(folder) != post["content_hash"]]
+        removed = [folder for folder in indexed if folder not in current]
+        stats = {"posts": len(current), "changed": len(changed), "removed": len(removed),
+                 "chunks": 0, "embed_seconds": 0.0}
+        if not changed and not removed and not rebuild:
+            stats["seconds"] = time.perf_counter() - start
+            return stats
+
+        with self._db:
+            if rebuild:
+                self._db.execute("DELETE FROM chunks")
+                self._db.execute("DELETE FROM posts")
+            for folder in changed + removed:
+                ids = [row[0] for row in self._db.execute("SELECT id FROM chunks WHERE folder = ?", (folder,))]
+                if ids:
+                    index.remove_ids(np.array(ids, dtype=np.int64))
+                self._db.execute("DELETE FROM chunks WHERE folder = ?", (folder,))
+                self._db.execute("DELETE FROM posts WHERE folder = ?", (folder,))
+
+            for batch_start in range(0, len(changed), POSTS_PER_BATCH):
+                ids, texts = [], []
+                for folder in changed[batch_start:batch_start + POSTS_PER_BATCH]:
+                    post = current[folder]
+                    title, chunks = chunk_notebook(post["notebook_path"])
+                    for cell, kind, text in chunks:
+                        cursor = self._db.execute("INSERT INTO chunks (folder, cell, kind, text) VALUES (?, ?, ?, ?)",
+                                                  (folder, cell, kind, text))
+                        ids.append(cursor.lastrowid)
+                        # The title gives short chunks like code cells some context
+                        texts.append(f"{title}\n\n{text}")
+                    self._db.execute("INSERT OR REPLACE INTO posts (folder, content_hash) VALUES (?, ?)",
+                                     (folder, post["content_hash"]))
+                if texts:
+                    embed_start = time.perf_counter()
+                    vectors = embedder.embed(texts)
+                    stats["embed_seconds"] += time.perf_counter() - embed_start
+                    index.add_with_ids(vectors, np.array(ids, dtype=np.int64))
+                    stats["chunks"] += len(texts)
+
+            self._db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('embedder', ?)", (embedder.name,))
+            # The index is written before the chunks are committed, a crash in between
+            # leaves them disagreeing and the next update rebuilds
+            tmp_path = self.index_path + ".tmp"
+            faiss.write_index(index, tmp_path)
+            os.replace(tmp_path, self.index_path)
+
+        stats["seconds"] = time.perf_counter() - start
+        return stats
+
+    def mapped_index(self):
+        """The FAISS index memory-mapped read-only, reopened if the file has been rewritten."""
+        import faiss
+
+        mtime = os.stat(self.index_path).st_mtime_ns
+        if self._mapped is None or mtime != self._mapped_mtime:
+            self._mapped = faiss.read_index(self.index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            self._mapped_mtime = mtime
+        return self._mapped
+
+    def search(self, query, embedder, k=5, per_post=1):
+        """
+        Return up to k posts most similar to the query, best first, as dicts
+        with the folder, score and the best matching chunks.
+        """
+        if self.meta("embedder") != embedder.name:
+            raise ValueError(f"The search index was built with {self.meta('embedder')}, not {embedder.name}")
+        index = self.mapped_index()
+        if index.ntotal == 0:
+            return []
+        # Ask for more chunks than posts, several chunks usually come from the same post
+        scores, ids = index.search(embedder.embed([query]), min(k * 8, index.ntotal))
+        hits = [(float(score), int(chunk_id)) for score, chunk_id in zip(scores[0], ids[0]) if chunk_id >= 0]
+        rows = {row[0]: row[1:] for row in self._db.execute(
+            f"SELECT id, folder, cell, kind, text FROM chunks WHERE id IN ({', '.join('?' for _ in hits)})",
+            [chunk_id for _, chunk_id in hits])}
+
+        results = {}
+        for score, chunk_id in hits:
+            if chunk_id not in rows:
+                continue
+            folder, cell, kind, text = rows[chunk_id]
+            result = results.setdefault(folder, {"folder": folder, "score": score, "chunks": []})
+            if len(result["chunks"]) < per_post:
+                result["chunks"].append({"cell": cell, "kind": kind, "text": text, "score": score})
+        return sorted(results.values(), key=lambda result: -result["score"])[:k]
+
+    def post_vectors(self):
+        """
+        One vector per post, the normalised mean of its chunk vectors. Returns
+        (folders, content_hashes, matrix) with the rows of the float32 matrix
+        in folder order.
+        """
+        import faiss
+
+        if not os.path.exists(self.index_path):
+            return [], [], np.zeros((0, 0), dtype=np.float32)
+        index = self.mapped_index()
+        ids = faiss.vector_to_array(index.id_map)
+        vectors = faiss.downcast_index(index.index).reconstruct_n(0, index.ntotal)
+
+        hashes = dict(self._db.execute("SELECT folder, content_hash FROM posts"))
+        folders = sorted(hashes)
+        row_of = {folder: row for row, folder in enumerate(folders)}
+        folder_of = dict(self._db.execute("SELECT id, folder FROM chunks"))
+        rows = np.array([row_of[folder_of[chunk_id]] for chunk_id in ids], dtype=np.int64)
+
+        matrix = np.zeros((len(folders), index.d), dtype=np.float32)
+        np.add.at(matrix, rows, vectors)
+        return folders, [hashes[folder] for folder in folders], normalize(matrix)
@@ -0,0 +1,205 @@
+# /// script
+# requires-python = ">=3.12.1"
+# dependencies = [
+#     "google-adk",
+#     "google-genai",
+#     "llama-index",
+#     "llama-index-llms-openai",
+# ]
+# ///
+"""
+Run a file of questions through the ADK or LlamaIndex two-tool agent, many at
+a time, writing each answer to a JSONL file as soon as it is ready.
+
+One agent is shared by all questions. Each question borrows a session from a
+pool (an InMemorySessionService session for ADK, a Context for LlamaIndex)
+and gives it back when it's done. A session is reset after --session-turns
+questions, so answers don't pick up earlier questions' history unless asked
+to. --concurrency questions are in flight at once and the file is only read
+a little ahead of them.
+
+Questions are one per line, either plain text or JSON with a "question" and
+optionally an "id":
+
+    uv run batch_agent_runner.py questions.txt --framework adk --concurrency 64 --output results.jsonl
+
+Every line of the output has the question, answer, tool calls, seconds and
+error (if any), in the order they finished. A summary with throughput and
+p50/p99 latency goes to stderr at the end, the last line of it as JSON.
+"""
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+
+APP_NAME = "average_calculator_app"
+USER_ID = "batch"
+
+class AdkBackend:
+    def __init__(self):
+        from google.adk.runners import Runner
+        from google.adk.sessions import InMemorySessionService
+        from two_tool_agent_adk import agent
+
+        self.session_service = InMemorySessionService()
+        self.runner = Runner(app_name=APP_NAME, agent=agent, session_service=self.session_service)
+
+    async def new_session(self):
+        return await self.session_service.create_session(app_name=APP_NAME, user_id=USER_ID)
+
+    async def reset(self, session):
+        # Dropping the old session frees its events
+        await self.session_service.delete_session(app_name=APP_NAME, user_id=USER_ID, session_id=session.id)
+        return await self.new_session()
+
+    async def ask(self, session, question):
+        from google.genai import types
+
+        content = types.Content(role="user", parts=[types.Part(text=question)])
+        answer, tool_calls = None, 0
+        async for event in self.runner.run_async(user_id=USER_ID, session_id=session.id, new_message=content):
+            tool_calls += len(event.get_function_calls())
+            if event.is_final_response() and event.content and event.content.parts:
+                answer = "".join(part.text or "" for part in event.content.parts)
+        return answer, tool_calls
+
+class LlamaIndexBackend:
+    def __init__(self):
+        from two_tool_agent_llamaindex_script import agent
+
+        self.agent = agent
+
+    async def new_session(self):
+        from llama_index.core.workflow import Context
+
+        return Context(self.agent)
+
+    async def reset(self, session):
+        return await self.new_session()
+
+    async def ask(self, session, question):
+        from llama_index.core.agent.workflow import ToolCallResult
+
+        handler = self.agent.run(question, ctx=session)
+        tool_calls = 0
+        async for event in handler.stream_events():
+            if isinstance(event, ToolCallResult):
+                tool_calls += 1
+        return str(await handler), tool_calls
+
+BACKENDS = {"adk": AdkBackend, "llamaindex": LlamaIndexBackend}
+
+class SessionPool:
+    """Sessions lent out one question at a time, reset after max_turns questions or a failure."""
+    def __init__(self, backend, size, max_turns):
+        self.backend = backend
+        self.size = size
+        self.max_turns = max_turns
+        self.free = asyncio.Queue()
+
+    async def start(self):
+        for _ in range(self.size):
+            self.free.put_nowait([await self.backend.new_session(), 0])
+
+    async def acquire(self):
+        return await self.free.get()
+
+    async def release(self, slot, failed=False):
+        slot[1] += 1
+        # A failed question can leave a half-finished conversation behind
+        if failed or slot[1] >= self.max_turns:
+            slot[0] = await self.backend.reset(slot[0])
+            slot[1] = 0
+        self.free.put_nowait(slot)
+
+def read_questions(path):
+    """Yield {"id", "question"} for each non-empty line of path."""
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                item = json.loads(line)
+                yield {"id": item.get("id", number), "question": item["question"]}
+            else:
+                yield {"id": number, "question": line}
+
+async def run_batch(backend, questions, output, concurrency=16, sessions=None, max_turns=1, timeout=120.0):
+    """
+    Answer every question in the iterable questions with concurrency workers,
+    writing results to the open file output as they finish. Returns a summary dict.
+    """
+    pool = SessionPool(backend, sessions or concurrency, max_turns)
+    await pool.start()
+    # Bounded, so a huge file is read only as fast as the workers get through it
+    todo = asyncio.Queue(maxsize=2 * concurrency)
+    done = asyncio.Queue()
+    latencies = []
+    errors = 0
+
+    async def read():
+        for item in questions:
+            await todo.put(item)
+        for _ in range(concurrency):
+            await todo.put(None)
+
+    async def work():
+        while (item := await todo.get()) is not None:
+            slot = await pool.acquire()
+            start = time.perf_counter()
+            answer, tool_calls, error = None, 0, None
+            try:
+                answer, tool_calls = await asyncio.wait_for(backend.ask(slot[0], item["question"]), timeout)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+            seconds = time.perf_counter() - start
+            await pool.release(slot, failed=error is not None)
+            await done.put({**item, "answer": answer, "tool_calls": tool_calls, "seconds": round(seconds, 4),
+                            "error": error})
+
+    async def write():
+        nonlocal errors
+        while (result := await done.get()) is not None:
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+            latencies.append(result["seconds"])
+            errors += result["error"] is not None
+
+    start = time.perf_counter()
+    writer = asyncio.create_task(write())
+    await asyncio.gather(read(), *(work() for _ in range(concurrency)))
+    await done.put(None)
+    await writer
+    elapsed = time.perf_counter() - start
+    # quantiles() wants two values at least
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else (latencies or [0]) * 99
+    return {"questions": len(latencies), "errors": errors, "seconds": elapsed,
+            "per_second": len(latencies) / elapsed if elapsed else 0,
+            "p50_seconds": cuts[49], "p99_seconds": cuts[98]}
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a file of questions with the ADK or LlamaIndex agent")
+    parser.add_argument("questions", help="File with one question per line, text or JSON")
+    parser.add_argument("--framework", choices=sorted(BACKENDS), default="adk")
+    parser.add_argument("--output", default="results.jsonl", help="JSONL file for the answers")
+    parser.add_argument("--concurrency", type=int, default=16, help="Questions in flight at once")
+    parser.add_argument("--sessions", type=int, default=None, help="Sessions in the pool, defaults to --concurrency")
+    parser.add_argument("--session-turns", type=int, default=1, help="Questions a session answers before it is reset")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds to wait for one answer")
+    args = parser.parse_args()
+
+    backend = BACKENDS[args.framework]()
+    with open(args.output, "w", encoding="utf-8") as output:
+        summary = asyncio.run(run_batch(backend, read_questions(args.questions), output, args.concurrency,
+                                        args.sessions, args.session_turns, args.timeout))
+    print(f"{summary['questions']} questions in {summary['seconds']:.1f}s ({summary['per_second']:.1f}/s) "
+          f"with {args.concurrency} at a time, p50 {summary['p50_seconds'] * 1000:.0f}ms, "
+          f"p99 {summary['p99_seconds'] * 1000:.0f}ms, {summary['errors']} errors. Answers in {args.output}",
+          file=sys.stderr)
+    print(json.dumps(summary), file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
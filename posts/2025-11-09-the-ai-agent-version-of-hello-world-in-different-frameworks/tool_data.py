@@ -0,0 +1,88 @@
+"""
+Big tool arguments by reference. Arrays are registered once and the agent's
+tools are given a short handle like "arr_1f3a9c0e" instead of the numbers,
+which would otherwise travel through the model as JSON, token by token.
+
+    from tool_data import register, tools_for
+    handle = register(np.random.rand(10_000_000))
+    agent = ReActAgent(tools=tools_for("llamaindex"), llm=llm)
+    agent.run(f"What is the average of the numbers in {handle}?")
+
+Arrays can live in memory or be memory-mapped from a .npy or raw binary
+file with register_file, so a dataset bigger than RAM works too: the pages
+are only read as the reduction gets to them. sum_numbers and divide_sum are
+the two-tool example's tools taking a handle, and tools_for() wraps them
+for smolagents, ADK, LangGraph or LlamaIndex.
+"""
+import secrets
+import threading
+
+import numpy as np
+
+_arrays = {}
+_lock = threading.Lock()
+
+def register(array, handle=None):
+    """Keep array (anything np.asarray takes, flattened) under a new handle and return the handle."""
+    array = np.asarray(array).reshape(-1)
+    with _lock:
+        while handle is None or handle in _arrays:
+            handle = f"arr_{secrets.token_hex(4)}"
+        _arrays[handle] = array
+    return handle
+
+def register_file(path, dtype="float64"):
+    """Memory-map a .npy file, or a raw file of dtype values, and return its handle."""
+    if path.endswith(".npy"):
+        array = np.load(path, mmap_mode="r")
+    else:
+        array = np.memmap(path, dtype=dtype, mode="r")
+    return register(array)
+
+def release(handle):
+    with _lock:
+        _arrays.pop(handle, None)
+
+def get(handle):
+    """The array behind handle. Unknown handles raise a ValueError the model can read and recover from."""
+    try:
+        return _arrays[handle.strip()]
+    except KeyError:
+        raise ValueError(f"Unknown data handle {handle!r}, the known handles are: {', '.join(_arrays) or 'none'}") from None
+
+def sum_numbers(handle: str) -> float:
+    """
+    Calculate the sum of the numbers stored under a data handle.
+
+    Args:
+        handle: The data handle of the numbers, e.g. arr_1f3a9c0e
+    """
+    # Summed in float64 whatever the stored type, numpy converts in buffered blocks
+    return float(np.sum(get(handle), dtype=np.float64))
+
+def divide_sum(total: float, handle: str) -> float:
+    """
+    Divide a sum by how many numbers are stored under a data handle to get the average.
+
+    Args:
+        total: The sum/total to divide
+        handle: The data handle the sum was calculated from
+    """
+    return total / len(get(handle))
+
+def tools_for(framework):
+    """sum_numbers and divide_sum as tools for "smolagents", "adk", "langgraph" or "llamaindex"."""
+    functions = [sum_numbers, divide_sum]
+    if framework == "adk":
+        # ADK takes plain functions
+        return functions
+    if framework == "smolagents":
+        from smolagents import tool
+        return [tool(fn) for fn in functions]
+    if framework == "langgraph":
+        from langchain_core.tools import tool
+        return [tool(fn) for fn in functions]
+    if framework == "llamaindex":
+        from llama_index.core.tools import FunctionTool
+        return [FunctionTool.from_defaults(fn=fn) for fn in functions]
+    raise ValueError(f"Unknown framework {framework!r}")
@@ -71,4 +71,6 @@ async def main():
         if event.content.parts and event.content.parts[0].text:
             print(f"{event.author}: {event.content.parts[0].text}")
 
-asyncio.run(main())
+# Guarded so batch_agent_runner.py can import the agent
+if __name__ == "__main__":
+    asyncio.run(main())
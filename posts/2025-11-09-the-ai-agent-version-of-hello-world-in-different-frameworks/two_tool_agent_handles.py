@@ -0,0 +1,93 @@
+# /// script
+# requires-python = ">=3.12.1"
+# dependencies = [
+#     "numpy",
+#     "smolagents",
+#     "litellm",
+#     "google-adk",
+#     "google-genai",
+#     "langgraph",
+#     "langchain-openai",
+#     "llama-index",
+#     "llama-index-llms-openai",
+# ]
+# ///
+"""
+The two-tool agent, averaging millions of numbers: the numbers are registered
+with tool_data and the agent only ever sees their handle.
+
+    uv run two_tool_agent_handles.py --framework langgraph --size 10000000
+"""
+import asyncio
+import argparse
+
+import numpy as np
+
+from tool_data import register, tools_for
+
+def run_smolagents(question):
+    from smolagents import ToolCallingAgent, LiteLLMModel
+
+    model = LiteLLMModel(model_id="gpt-4o-mini")
+    agent = ToolCallingAgent(tools=tools_for("smolagents"), model=model)
+    return agent.run(question)
+
+def run_adk(question):
+    from google.adk.agents import Agent
+    from google.adk.runners import Runner
+    from google.adk.sessions import InMemorySessionService
+    from google.genai import types
+
+    agent = Agent(
+        name="average_calculator",
+        model="gemini-2.0-flash-exp",
+        description="Agent that calculates averages using sum and divide operations.",
+        instruction="You are a helpful agent that can calculate averages of stored numbers by first summing "
+                    "them and then dividing by the count. The numbers are given as a data handle.",
+        tools=tools_for("adk")
+    )
+
+    async def main():
+        session_service = InMemorySessionService()
+        session = await session_service.create_session(state={}, app_name="average_calculator_app", user_id="user")
+        runner = Runner(app_name="average_calculator_app", agent=agent, session_service=session_service)
+        content = types.Content(role="user", parts=[types.Part(text=question)])
+        answer = None
+        async for event in runner.run_async(user_id="user", session_id=session.id, new_message=content):
+            if event.is_final_response() and event.content and event.content.parts:
+                answer = event.content.parts[0].text
+        return answer
+
+    return asyncio.run(main())
+
+def run_langgraph(question):
+    from langchain_openai import ChatOpenAI
+    from langgraph.prebuilt import create_react_agent
+
+    agent = create_react_agent(ChatOpenAI(model="gpt-4o-mini"), tools_for("langgraph"))
+    return agent.invoke({"messages": [("user", question)]})["messages"][-1].content
+
+def run_llamaindex(question):
+    from llama_index.core.agent.workflow import ReActAgent
+    from llama_index.llms.openai import OpenAI
+
+    agent = ReActAgent(tools=tools_for("llamaindex"), llm=OpenAI(model="gpt-4o-mini"))
+
+    async def main():
+        return str(await agent.run(question))
+
+    return asyncio.run(main())
+
+FRAMEWORKS = {"smolagents": run_smolagents, "adk": run_adk, "langgraph": run_langgraph, "llamaindex": run_llamaindex}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--framework", choices=sorted(FRAMEWORKS), default="langgraph")
+    parser.add_argument("--size", type=int, default=10_000_000, help="How many numbers to average")
+    args = parser.parse_args()
+
+    numbers = np.random.default_rng(0).uniform(0, 100, args.size)
+    handle = register(numbers)
+    print(f"Registered {args.size:,} numbers as {handle}, numpy says the average is {numbers.mean()}")
+    answer = FRAMEWORKS[args.framework](f"What is the average of the numbers in {handle}?")
+    print(f"Final response: {answer}")
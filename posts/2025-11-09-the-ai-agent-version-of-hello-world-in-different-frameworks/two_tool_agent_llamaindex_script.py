@@ -46,4 +46,6 @@ async def main():
     response = await handler
     print(f"\n\nFinal response: {response}")
 
-asyncio.run(main())
+# Guarded so batch_agent_runner.py can import the agent
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -2,56 +2,91 @@
 # requires-python = ">=3.10"
 # dependencies = [
 #     "bs4",
+#     "lxml",
 #     "click",
 #     "ollama",
 #     "nbformat",
 #     "requests",
+#     "tiktoken",
+#     "pymupdf",
 # ]
 # ///
 
-from bs4 import BeautifulSoup
 import requests
 import nbformat
+import time
 import datetime
 import ollama
+from web_fetch import fetch_content
+from tracing import peak_rss_mb
+from llm_cache import cached_completion, last_call, format_call
+from map_reduce import map_reduce_summarize, format_report
+import tracing
+from tracing import span, traced
 
+@traced("fetch_website_content")
 def fetch_website_content(url):
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        
-        # Parse the HTML content
-        soup = BeautifulSoup(response.text, "html.parser")
-        
-        # Attempt to find main content from common semantic tags
-        main_content = soup.find("article")  # Most blogs use <article> for posts
-        if not main_content:
-            main_content = soup.find("main")  # Try <main> if <article> isn't present
-        if not main_content:
-            main_content = soup.find("div", {"class": "content"})  # Generic fallback
-        
-        # Extract text content
-        if main_content:
-            return main_content.get_text(separator="\n").strip()
-        else:
-            # Fallback to all paragraphs if no main content is found
-            paragraphs = soup.find_all("p")
-            return "\n\n".join(p.get_text() for p in paragraphs).strip()
-
+        # Big pages are read in chunks and only until there is enough text to summarize
+        title, text = fetch_content(url, max_tokens=READ_MAX_TOKENS)
+        print(f"Read page, peak RSS {peak_rss_mb():.0f} MB")
+        return text
     except requests.exceptions.RequestException as e:
         raise Exception(f"Error fetching website: {e}")
 
 
+# Pages longer than this many tokens are summarized in chunks
+SUMMARY_MAX_TOKENS = 6000
+# Stop reading a page after this many tokens of content
+READ_MAX_TOKENS = 60000
+SUMMARY_PROMPT = "Summarize the following website content in three short sentances. The first sentance says what the topic is, the second whan this blog post and the third one the result.:\n\n"
+
 # Function to summarize content using Ollama
-def summarize_content(content, model="llama3.1"):
+@traced("summarize_content")
+def summarize_content(content, model="llama3.1", stream=False, max_tokens=None):
     try:
-        ollama_prompt = f"Summarize the following website content in three short sentances. The first sentance says what the topic is, the second whan this blog post and the third one the result.:\n\n{content}"
-        summary = ollama.generate(model=model, prompt=ollama_prompt)
-        return summary
+        def summarize(text, template=None, stream=stream):
+            template = template or SUMMARY_PROMPT
+            ollama_prompt = template + text
+            def generate():
+                if not stream:
+                    response = ollama.generate(model=model, prompt=ollama_prompt)
+                    return response['response'], response.get('prompt_eval_count'), response.get('eval_count'), None
+
+                # Print tokens as they arrive and time the first one
+                start = time.perf_counter()
+                ttft = prompt_tokens = completion_tokens = None
+                parts = []
+                for chunk in ollama.generate(model=model, prompt=ollama_prompt, stream=True):
+                    if chunk['response']:
+                        if ttft is None:
+                            ttft = time.perf_counter() - start
+                        parts.append(chunk['response'])
+                        print(chunk['response'], end="", flush=True)
+                    if chunk.get('done'):
+                        prompt_tokens, completion_tokens = chunk.get('prompt_eval_count'), chunk.get('eval_count')
+                print()
+                return "".join(parts), prompt_tokens, completion_tokens, ttft
+
+            # Identical prompts for the same model are answered from the cache
+            with span("llm.ollama", model=model, chars=len(text)):
+                return cached_completion("ollama", model, template, text, generate)
+
+        if max_tokens:
+            # Long pages are summarized in chunks, only the final summary is streamed
+            summary, report = map_reduce_summarize(
+                content, lambda text, template: summarize(text, template, stream and template is None), max_tokens)
+            print(format_report(report))
+        else:
+            summary = summarize(content)
+        if last_call:
+            print(format_call(last_call))
+        return {"response": summary}
     except Exception as e:
         raise(f"Error summarizing content: {e}")
 
 # Function to create a Jupyter notebook with Quarto frontmatter
+@traced("create_notebook")
 def create_notebook(summary, url):
     # Quarto frontmatter
     frontmatter = f"""
@@ -77,7 +112,7 @@ categories: [summary, automation]
 
     # Save the notebook
     filename = f"summary_{datetime.date.today().isoformat()}.ipynb"
-    with open(filename, "w") as f:
+    with open(filename, "w") as f, span("nbf.write"):
         nbformat.write(nb, f)
 
     return filename
@@ -92,7 +127,7 @@ def main():
         return
     
     print("Fetching content...")
-    summary = summarize_content(content)
+    summary = summarize_content(content, stream=True, max_tokens=SUMMARY_MAX_TOKENS)
     
     if "Error" in summary:
         print(summary)
@@ -104,5 +139,7 @@ def main():
     print(f"Notebook created: {notebook_path}")
 
 if __name__ == "__main__":
+    # --profile (or QBLOG_PROFILE=1) prints where the run spent its time
+    tracing.enable_from_env()
     main()
 
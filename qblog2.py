@@ -2,22 +2,36 @@
 # requires-python = ">=3.10"
 # dependencies = [
 #     "bs4",
+#     "lxml",
 #     "click",
 #     "ollama",
 #     "nbformat",
 #     "requests",
 #     "openai",
+#     "tiktoken",
+#     "pymupdf",
+#     "pyyaml",
+#     "numpy",
+#     "faiss-cpu",
+#     "pyarrow",
 # ]
 # ///
 
 import click
 import os
+import sys
+import time
 import datetime
-import requests
-from bs4 import BeautifulSoup
-import ollama
-import nbformat as nbf
-import openai  # Import OpenAI for API calls
+import functools
+import llm_router
+import tracing
+from tracing import span, traced
+# Everything heavier (requests, bs4, ollama, openai, nbformat, tiktoken) is imported
+# where it is used, so commands that don't need it start quickly
+
+# Same as web_fetch.DEFAULT_MAX_BYTES and map_reduce.DEFAULT_WORKERS
+DEFAULT_MAX_BYTES = 20 * 1024 * 1024
+DEFAULT_LLM_WORKERS = 4
 
 # Function to load OpenAI API key from ~/.geir
 def load_openai_api_key():
@@ -49,6 +63,28 @@ Keep the sentences clear and punchy, and feel free to use line breaks so it does
 HTML content:
 """
 
+OPENAI_MODEL = "gpt-4o"
+OPENAI_SYSTEM_PROMPT = "Summarize the following text:"
+
+_openai_client = None
+
+def get_openai_client():
+    """The OpenAI client, created on first use so its connection pool is reused. None if there is no key."""
+    global _openai_client
+    if _openai_client is None:
+        api_key = load_openai_api_key()
+        if not api_key:
+            return None
+        import openai
+        _openai_client = openai.OpenAI(api_key=api_key)
+    return _openai_client
+
+@functools.lru_cache(maxsize=None)
+def get_ollama_client():
+    """One Ollama client (and connection pool) for every call, OLLAMA_HOST picks the server."""
+    import ollama
+    return ollama.Client()
+
 # Helper function to generate the next Sunday date
 def next_sunday():
     today = datetime.date.today()
@@ -61,41 +97,223 @@ def next_sunday():
 def slugify(title):
     return "-".join(title.lower().split())
 
-def summarize_with_ollama(content, model):
-    """Use Ollama to generate a summary."""
-    response = ollama.generate(model=model, prompt=prompt + content)
-    return response['response']
+def summarize_with_ollama(content, model, on_token=None, template=None):
+    """Use Ollama to generate a summary. If on_token is given the summary is streamed to it."""
+    from llm_cache import cached_completion
+
+    template = template or prompt
+    # Separate from the call itself, the first one includes importing the client library
+    with span("llm.client", backend="ollama"):
+        client = get_ollama_client()
+    def generate():
+        if not on_token:
+            response = client.generate(model=model, prompt=template + content)
+            return response['response'], response.get('prompt_eval_count'), response.get('eval_count'), None
+
+        start = time.perf_counter()
+        ttft = None
+        prompt_tokens = completion_tokens = None
+        parts = []
+        for chunk in client.generate(model=model, prompt=template + content, stream=True):
+            if chunk['response']:
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                parts.append(chunk['response'])
+                on_token(chunk['response'])
+            if chunk.get('done'):
+                prompt_tokens, completion_tokens = chunk.get('prompt_eval_count'), chunk.get('eval_count')
+        return "".join(parts), prompt_tokens, completion_tokens, ttft
+
+    with span("llm.ollama", model=model, chars=len(content)):
+        return cached_completion("ollama", model, template, content, generate, on_token)
 
-def summarize_with_openai(content):
-    """Use OpenAI's API to generate a summary (OpenAI v1.0.0+ format)."""
-    api_key = load_openai_api_key()
-    if not api_key:
-        return "Error: Missing OpenAI API key."
+def summarize_with_openai(content, on_token=None, template=None):
+    """
+    Use OpenAI's API to generate a summary (OpenAI v1.0.0+ format). If
+    on_token is given the summary is streamed to it.
+    """
+    from llm_cache import cached_completion
 
-    client = openai.OpenAI(api_key=api_key)  # Updated API usage
+    template = template or prompt
+    with span("llm.client", backend="openai"):
+        client = get_openai_client()
+    if not client:
+        raise llm_router.BackendError("Missing OpenAI API key")
 
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[
-            {"role": "system", "content": "Summarize the following text:"},
-            {"role": "user", "content": prompt + content}
+    def complete():
+        messages = [
+            {"role": "system", "content": OPENAI_SYSTEM_PROMPT},
+            {"role": "user", "content": template + content}
         ]
-    )
-    return response.choices[0].message.content
+
+        if not on_token:
+            response = client.chat.completions.create(model=OPENAI_MODEL, messages=messages)
+            usage = response.usage
+            return (response.choices[0].message.content,
+                    usage.prompt_tokens if usage else None, usage.completion_tokens if usage else None, None)
+
+        start = time.perf_counter()
+        ttft = None
+        parts = []
+        usage = None
+        stream = client.chat.completions.create(model=OPENAI_MODEL, messages=messages, stream=True,
+                                                stream_options={"include_usage": True})
+        for chunk in stream:
+            # The last chunk has the token usage and no choices
+            if chunk.usage:
+                usage = chunk.usage
+            if chunk.choices and chunk.choices[0].delta.content:
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                parts.append(chunk.choices[0].delta.content)
+                on_token(chunk.choices[0].delta.content)
+        return ("".join(parts), usage.prompt_tokens if usage else None,
+                usage.completion_tokens if usage else len(parts), ttft)
+
+    with span("llm.openai", model=OPENAI_MODEL, chars=len(content)):
+        return cached_completion("openai", OPENAI_MODEL, OPENAI_SYSTEM_PROMPT + template, content, complete, on_token)
+
+def summarize(content, models, on_token=None, template=None):
+    """
+    Summarize with OpenAI or the named Ollama model. models can also be a
+    list, in which case the router hedges and fails over from the first to
+    the next ones. template defaults to the blog post prompt.
+    """
+    def call(model, on_token):
+        if model.lower() == "openai":
+            return summarize_with_openai(content, on_token, template)
+        return summarize_with_ollama(content, model, on_token, template)
+
+    models = [models] if isinstance(models, str) else models
+    return llm_router.get_router().call(models, call, on_token)
+
+class StreamingCell:
+    """
+    Collects streamed tokens into a markdown cell, echoing them to the
+    terminal and saving the notebook every few seconds so the post can be
+    watched as it is written.
+    """
+    def __init__(self, nb, notebook_path, save_every=2.0):
+        import nbformat as nbf
+
+        self.nb = nb
+        self.notebook_path = notebook_path
+        self.save_every = save_every
+        self.cell = nbf.v4.new_markdown_cell("")
+        nb.cells.append(self.cell)
+        self.last_save = time.perf_counter()
+
+    def __call__(self, token):
+        self.cell.source += token
+        click.echo(token, nl=False)
+        if time.perf_counter() - self.last_save > self.save_every:
+            write_notebook(self.nb, self.notebook_path)
+            self.last_save = time.perf_counter()
+
+    def finish(self, summary):
+        # Make sure the cell ends up with the whole summary, even on a cache hit
+        self.cell.source = summary
+        click.echo("")
+        write_notebook(self.nb, self.notebook_path)
+
+def write_notebook(nb, notebook_path):
+    import nbformat as nbf
+
+    with open(notebook_path, "w") as f, span("nbf.write"):
+        nbf.write(nb, f)
+
+@traced("add_summary")
+def add_summary(nb, notebook_path, content, models, stream, max_tokens=None, llm_workers=DEFAULT_LLM_WORKERS):
+    """
+    Summarize content into a new markdown cell, streaming it if asked to.
+    With max_tokens, long content is summarized in chunks first (map-reduce).
+    """
+    import nbformat as nbf
+    import llm_cache
+    from map_reduce import map_reduce_summarize, format_report
+
+    llm_cache.last_call.clear()
+    cell = StreamingCell(nb, notebook_path) if stream else None
+
+    try:
+        if max_tokens:
+            # Only the final summary is streamed, the chunk summaries run in parallel
+            summary, report = map_reduce_summarize(
+                content, lambda text, template: summarize(text, models, cell if template is None else None, template),
+                max_tokens, workers=llm_workers)
+        else:
+            summary = summarize(content, models, on_token=cell)
+    except llm_router.AllBackendsFailed as e:
+        click.echo(f"\nError summarizing: {e}")
+        if cell:
+            nb.cells.remove(cell.cell)
+        return
+
+    if cell:
+        cell.finish(summary)
+    else:
+        nb.cells.append(nbf.v4.new_markdown_cell(summary))
+    if llm_cache.last_call:
+        click.echo(llm_cache.format_call(llm_cache.last_call))
+    if max_tokens:
+        click.echo(format_report(report))
 
 # Command to create a new blog post
 @click.group()
-def cli():
-    pass
+@click.option("--profile", is_flag=True,
+              help="Time the command's stages, print a table and write a trace to .cache/traces/ (or set QBLOG_PROFILE)")
+@click.pass_context
+def cli(ctx, profile):
+    setting = os.environ.get(tracing.ENV_VAR)
+    if profile or setting:
+        tracing.enable(setting if setting and setting != "1" else None, name="qblog2")
+        ctx.call_on_close(lambda: tracing.finish(click.echo))
 
 @cli.command()
 @click.argument("title")
-@click.option("--url", default=None, help="URL to fetch and summarize")
+@click.option("--url", multiple=True, help="URL to fetch and summarize, can be given several times")
+@click.option("--urls-file", type=click.Path(exists=True, dir_okay=False), help="File with one URL per line")
 @click.option("--model", default="openai", help="Model to use: 'ollama' (default) or 'openai'")
-def new(title, url, model):
+@click.option("--hedge", multiple=True,
+              help="Backup model, asked as well if --model is slow or failing, can be given several times")
+@click.option("--hedge-after", default=llm_router.DEFAULT_HEDGE_AFTER, show_default=True,
+              help="Seconds to wait for a model before also asking the next one")
+@click.option("--timeout", default=llm_router.DEFAULT_TIMEOUT, show_default=True,
+              help="Seconds to wait for a summary from any model")
+@click.option("--workers", default=8, show_default=True, help="Pages to download at the same time")
+@click.option("--no-summary", is_flag=True, help="Put the extracted page text in the post instead of a summary")
+@click.option("--no-cache", is_flag=True, help="Don't use the page or summary caches")
+@click.option("--refresh", is_flag=True, help="Ask the model again even if the summary is cached")
+@click.option("--offline", is_flag=True, help="Only use pages that are already in the page cache")
+@click.option("--stream", is_flag=True, help="Print the summary as it is generated and write it into the post as it arrives")
+@click.option("--max-tokens", type=int, default=None,
+              help="Token budget per prompt, longer pages are summarized in chunks and then combined")
+@click.option("--llm-workers", default=DEFAULT_LLM_WORKERS, show_default=True, help="Chunks to summarize at the same time")
+@click.option("--max-bytes", default=DEFAULT_MAX_BYTES, show_default=True, help="Never read more than this much of a page")
+@click.option("--read-tokens", type=int, default=None,
+              help="Stop reading a page once about this many tokens of main content have been collected")
+def new(title, url, urls_file, model, hedge, hedge_after, timeout, workers, no_summary, no_cache, refresh, offline, stream, max_tokens, llm_workers,
+        max_bytes, read_tokens):
+    import nbformat as nbf
+    import llm_cache
+    from web_fetch import fetch_content, fetch_many, read_urls, configure_cache
+    from tracing import peak_rss_mb
+    from post_index import find_notebooks, slug_for
+
+    # The flags add to QBLOG_NO_CACHE/QBLOG_OFFLINE/QBLOG_REFRESH rather than override them
+    no_cache = no_cache or bool(os.environ.get("QBLOG_NO_CACHE"))
+    configure_cache(enabled=not no_cache, offline=offline or bool(os.environ.get("QBLOG_OFFLINE")))
+    llm_cache.configure_cache(enabled=not no_cache, refresh=refresh or bool(os.environ.get("QBLOG_REFRESH")))
+    llm_router.configure_router(hedge_after=hedge_after, timeout=timeout)
+    models = [model, *hedge]
+
     # Create the folder name using next Sunday's date and the slugified title
     post_date = next_sunday().strftime("%Y-%m-%d")
     folder_name = f"posts/{post_date}-{slugify(title)}"
+    # Folder names are enough for this, no need to read every notebook into the post index
+    for folder, existing_path in find_notebooks():
+        if slug_for(folder) == slugify(title):
+            click.echo(f"Note: there is already a post called {slug_for(folder)} in {existing_path}")
     os.makedirs(folder_name, exist_ok=True)
 
     # Create the index.ipynb file with metadata
@@ -105,35 +323,323 @@ def new(title, url, model):
     metadata = f"""---\ntitle: "{title}"\ndate: "{post_date}"\ndraft: "true"\npublish: "false"\nimage: "" \ncallout-appearance: simple\ncategories: []\n---\n"""
     nb.cells.append(nbf.v4.new_raw_cell(metadata))
 
-    # If a URL is provided, fetch the page and summarize it
-    if url:
+    notebook_path = f"{folder_name}/index.ipynb"
+    urls = list(url) + (read_urls(urls_file) if urls_file else [])
+
+    # If a single URL is provided, fetch the page and summarize it
+    if len(urls) == 1:
         try:
-            response = requests.get(url)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            # Extract the main content of the page (ignoring headers, footers, etc.)
-            for tag in soup(['header', 'footer', 'nav', 'aside']):
-                tag.decompose()
-            content = soup.get_text()
-
-            # Choose model for summarization
-            if model.lower() == "openai":
-                summary = summarize_with_openai(content)
-            else:
-                summary = summarize_with_ollama(content, model)
+            page_title, content = fetch_content(urls[0], max_bytes=max_bytes, max_tokens=read_tokens)
+        except Exception as e:
+            # A page that can't be read, e.g. a truncated PDF, still leaves an empty post to write
+            click.echo(f"Error fetching the URL: {e}")
+        else:
+            click.echo(f"Read page, peak RSS {peak_rss_mb():.0f} MB")
 
             # Add the summary as a markdown cell
-            nb.cells.append(nbf.v4.new_markdown_cell(summary))
+            if no_summary:
+                nb.cells.append(nbf.v4.new_markdown_cell(content))
+            else:
+                add_summary(nb, notebook_path, content, models, stream, max_tokens, llm_workers)
 
-        except requests.exceptions.RequestException as e:
-            click.echo(f"Error fetching the URL: {e}")
+    # Several URLs are downloaded concurrently and get a section each
+    elif urls:
+        click.echo(f"Fetching {len(urls)} pages...")
+        read_page = functools.partial(fetch_content, max_bytes=max_bytes, max_tokens=read_tokens)
+        with span("fetch_many", pages=len(urls)):
+            pages = fetch_many(urls, workers=workers, fetch_one=read_page)
+        click.echo(f"Read {len(urls)} pages, peak RSS {peak_rss_mb():.0f} MB")
+        for source_url, page, error in pages:
+            if error:
+                click.echo(f"Error fetching {source_url}: {error}")
+                continue
+            page_title, content = page
+            nb.cells.append(nbf.v4.new_markdown_cell(f"## [{page_title or source_url}]({source_url})"))
+            if no_summary:
+                nb.cells.append(nbf.v4.new_markdown_cell(content.strip()))
+            else:
+                add_summary(nb, notebook_path, content, models, stream, max_tokens, llm_workers)
 
     # Write the notebook to the index.ipynb file
-    with open(f"{folder_name}/index.ipynb", "w") as f:
-        nbf.write(nb, f)
+    write_notebook(nb, notebook_path)
+
+    click.echo(f"Blog post created at ./{notebook_path}")
+
+@cli.command()
+@click.option("--drafts", is_flag=True, help="Only posts with draft: true")
+@click.option("--upcoming", is_flag=True, help="Only posts dated after today")
+@click.option("--missing-cards", is_flag=True, help="Only posts without an image, or whose image file is missing")
+@click.option("--category", help="Only posts in this category")
+@click.option("--full", is_flag=True, help="Re-read every notebook instead of only the changed ones")
+def posts(drafts, upcoming, missing_cards, category, full):
+    """List posts from the post index, updating it for changed folders first."""
+    from post_index import PostIndex
+
+    start = time.perf_counter()
+    index = PostIndex()
+    with span("post_index.update"):
+        stats = index.update(full=full)
+    rows = index.posts()
+    if drafts:
+        rows = [post for post in rows if post["draft"]]
+    if upcoming:
+        today = datetime.date.today().isoformat()
+        rows = [post for post in rows if post["date"] and post["date"] > today]
+    if missing_cards:
+        rows = [post for post in rows if not post["has_image"]]
+    if category:
+        rows = [post for post in rows if category in post["categories"]]
+
+    click.echo(f"{'date':<11} {'draft':<6} {'words':>6} {'card':<5} slug")
+    for post in rows:
+        draft = "yes" if post["draft"] else "no"
+        card = "yes" if post["has_image"] else "no"
+        click.echo(f"{post['date'] or '-':<11} {draft:<6} {post['word_count']:>6} {card:<5} {post['slug']}")
+    click.echo(f"{len(rows)} posts ({stats['updated']} of {stats['scanned']} re-indexed, "
+               f"{stats['removed']} removed) in {(time.perf_counter() - start) * 1000:.0f}ms")
+
+@functools.lru_cache(maxsize=None)
+def get_embedder(spec):
+    """Embedder for search, sharing the summarisers' clients."""
+    from embeddings import get_embedder
+
+    backend = spec.partition(":")[0]
+    if backend == "openai":
+        client = get_openai_client()
+        if not client:
+            raise click.ClickException("Missing OpenAI API key")
+        return get_embedder(spec, client=client)
+    return get_embedder(spec, client=get_ollama_client() if backend == "ollama" else None)
+
+@cli.command()
+@click.argument("query")
+@click.option("-k", "top_k", default=5, show_default=True, help="Number of posts to show")
+@click.option("--embedder", "embedder_spec", default=None,
+              help="ollama:<model>, openai:<model> or stub, defaults to the one the index was built with "
+                   "or ollama:nomic-embed-text")
+@click.option("--no-update", is_flag=True, help="Search the index as it is, without embedding changed posts")
+@click.option("--rebuild", is_flag=True, help="Embed every post again")
+def search(query, top_k, embedder_spec, no_update, rebuild):
+    """Find the posts most similar to QUERY."""
+    from post_search import SearchIndex
+    from embeddings import DEFAULT_EMBEDDER
+
+    index = SearchIndex()
+    try:
+        embedder = get_embedder(embedder_spec or index.meta("embedder") or DEFAULT_EMBEDDER)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    if not no_update:
+        with span("search_index.update"):
+            stats = index.update(embedder, full=rebuild)
+        if stats["chunks"] or stats["removed"]:
+            rate = stats["chunks"] / stats["embed_seconds"] if stats["embed_seconds"] else 0
+            click.echo(f"Indexed {stats['changed']} changed posts ({stats['chunks']} chunks, {rate:.0f} chunks/s), "
+                       f"removed {stats['removed']}, in {stats['seconds']:.2f}s")
+
+    start = time.perf_counter()
+    try:
+        results = index.search(query, embedder, k=top_k)
+    except ValueError as e:
+        raise click.ClickException(f"{e}, run with --rebuild")
+    for result in results:
+        chunk = result["chunks"][0]
+        snippet = " ".join(chunk["text"].split())[:160]
+        click.echo(f"{result['score']:.3f}  posts/{result['folder']}")
+        click.echo(f"       [{chunk['kind']} cell {chunk['cell']}] {snippet}")
+    click.echo(f"Searched in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+@cli.command()
+@click.option("--clear", is_flag=True, help="Empty the page, summary and embedding caches")
+def cache(clear):
+    """Show page, summary and embedding cache statistics."""
+    import llm_cache
+    import embeddings
+    from web_fetch import get_cache
+
+    page_cache = get_cache()
+    response_cache = llm_cache.get_cache()
+    vector_cache = embeddings.get_cache()
+    # Each get_cache() is None when that cache is turned off, e.g. with QBLOG_NO_CACHE
+    if clear:
+        caches = [c for c in (page_cache, response_cache, vector_cache) if c]
+        for c in caches:
+            c.clear()
+        click.echo("Page, summary and embedding caches cleared" if caches else "Caching is off, nothing to clear")
+        return
+    if not page_cache:
+        click.echo("Page cache is off")
+    else:
+        stats = page_cache.stats()
+        lookups = stats["hits"] + stats["revalidated"] + stats["misses"]
+        click.echo(f"Pages cached:        {stats['pages']} ({stats['bytes'] / 1024 / 1024:.1f} MB)")
+        click.echo(f"Hits:                {stats['hits']}")
+        click.echo(f"Revalidated (304):   {stats['revalidated']}")
+        click.echo(f"Misses:              {stats['misses']}")
+        if lookups:
+            click.echo(f"Hit rate:            {(stats['hits'] + stats['revalidated']) / lookups:.0%}")
+        click.echo(f"Extraction hits:     {stats['extract_hits']}")
+        click.echo(f"Extraction misses:   {stats['extract_misses']}")
+        click.echo(f"Evictions:           {stats['evictions']}")
+
+    click.echo("")
+    if not response_cache:
+        click.echo("Summary cache is off")
+    else:
+        stats = response_cache.stats()
+        click.echo(f"Summaries cached:    {stats['entries']} ({stats['bytes'] / 1024:.1f} KB)")
+        click.echo(f"Hits:                {stats['hits']:.0f}")
+        click.echo(f"Misses:              {stats['misses']:.0f}")
+        click.echo(f"Refreshed:           {stats['refreshed']:.0f}")
+        click.echo(f"Expired/evicted:     {stats['expired']:.0f}/{stats['evictions']:.0f}")
+        click.echo(f"Model time saved:    {stats['seconds_saved']:.1f}s")
+        click.echo(f"Tokens cached:       {stats['prompt_tokens']} prompt, {stats['completion_tokens']} completion")
 
-    click.echo(f"Blog post created at ./{folder_name}/index.ipynb")
+    if vector_cache:
+        stats = vector_cache.stats()
+        click.echo("")
+        click.echo(f"Embeddings cached:   {stats['vectors']} ({stats['bytes'] / 1024 / 1024:.1f} MB)")
+        for model, dims, count in stats["models"]:
+            click.echo(f"  {model:<30} {count:>7}")
+
+@cli.command()
+def models():
+    """Compare latency, time-to-first-token and tokens/s of the models used so far."""
+    import llm_cache
+
+    response_cache = llm_cache.get_cache()
+    if not response_cache:
+        click.echo("The summary cache is off, so no model calls are recorded")
+        return
+    rows = response_cache.model_stats()
+    if not rows:
+        click.echo("No model calls recorded yet")
+        return
+    click.echo(f"{'backend/model':<30} {'calls':>6} {'latency':>9} {'first token':>12} {'tokens/s':>9}")
+    for row in rows:
+        ttft = f"{row['ttft']:.2f}s" if row["ttft"] is not None else "-"
+        speed = f"{row['tokens_per_second']:.1f}" if row["tokens_per_second"] is not None else "-"
+        click.echo(f"{row['backend'] + '/' + row['model']:<30} {row['calls']:>6} {row['latency']:>8.2f}s {ttft:>12} {speed:>9}")
+
+@cli.command()
+@click.option("--hours", type=float, default=None, help="Only count calls made in the last this many hours")
+def backends(hours):
+    """Latency percentiles and histograms, hedges and failures per model backend."""
+    import llm_cache
+
+    since = time.time() - hours * 3600 if hours else None
+    response_cache = llm_cache.get_cache()
+    if not response_cache:
+        click.echo("The summary cache is off, so no model calls are recorded")
+        return
+    calls = response_cache.backend_calls(since)
+    if not calls:
+        click.echo("No routed model calls recorded yet")
+        return
+    live = llm_router._router.backends if llm_router._router else {}
+    click.echo(f"{'backend':<24} {'ok':>5} {'won':>5} {'lost':>5} {'errors':>6} {'skipped':>7} "
+               f"{'p50':>7} {'p90':>7} {'p99':>7}  circuit")
+    for name, entry in calls.items():
+        p50, p90, p99 = (tracing.percentile(entry["latencies"], f) for f in (0.5, 0.9, 0.99))
+        fmt = lambda v: f"{v:.2f}s" if v is not None else "-"
+        # Circuit state is only known inside a running process, i.e. the qblog2 daemon
+        circuit = live[name].state if name in live else "-"
+        click.echo(f"{name:<24} {entry.get('ok', 0):>5} {entry.get('won', 0):>5} {entry.get('lost', 0):>5} "
+                   f"{entry.get('error', 0):>6} {entry.get('skipped', 0):>7} "
+                   f"{fmt(p50):>7} {fmt(p90):>7} {fmt(p99):>7}  {circuit}")
+
+    for name, entry in calls.items():
+        counts = llm_router.histogram(entry["latencies"])
+        if not any(counts):
+            continue
+        click.echo(f"\n{name} latency")
+        widest = max(counts)
+        for bound, count in zip(llm_router.HISTOGRAM_BUCKETS, counts):
+            label = f"<= {bound:g}s" if bound != float("inf") else f"> {llm_router.HISTOGRAM_BUCKETS[-2]:g}s"
+            click.echo(f"  {label:>8} {count:>5} {'#' * round(40 * count / widest)}")
+
+@cli.command()
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--column", "columns", multiple=True, help="Column to count, can be given several times, defaults to all")
+@click.option("--model", default="gpt-4o", show_default=True, help="Model whose tokenizer to use")
+@click.option("--encoding", default=None, help="tiktoken encoding to use instead of the model's, e.g. cl100k_base")
+@click.option("--workers", default=os.cpu_count() or 1, show_default=True, help="Processes encoding at the same time")
+@click.option("--block-mb", default=4, show_default=True, help="Megabytes of CSV or text read at a time")
+def tokens(path, columns, model, encoding, workers, block_mb):
+    """Count the tokens in a large CSV, Parquet or text file."""
+    import token_count
+
+    try:
+        result = token_count.count_file(path, list(columns) or None, model=model, encoding=encoding,
+                                        workers=workers, block_bytes=block_mb * 1024 * 1024)
+    except KeyError as e:
+        raise click.ClickException(f"Unknown model or encoding {e}")
+    totals = result["columns"]
+    seconds = result["seconds"]
+    rows = max((total["rows"] for total in totals.values()), default=0)
+    click.echo(f"{path}: {rows:,} rows, {result['bytes'] / 1024 / 1024:.1f} MB, {result['encoding']}")
+    click.echo(f"{'column':<20} {'tokens':>14} {'nulls':>8} {'mean':>8} {'p50':>7} {'p90':>7} "
+               f"{'p99':>7} {'max':>8} {'chars/token':>11}")
+    for column, total in totals.items():
+        present = total["rows"] - total["nulls"]
+        mean = total["tokens"] / present if present else 0
+        p50, p90, p99 = (token_count.histogram_percentile(total["histogram"], f) for f in (0.5, 0.9, 0.99))
+        ratio = total["chars"] / total["tokens"] if total["tokens"] else 0
+        click.echo(f"{column:<20} {total['tokens']:>14,} {total['nulls']:>8,} {mean:>8.1f} {p50:>7} {p90:>7} "
+                   f"{p99:>7} {total['max']:>8} {ratio:>11.2f}")
+    all_tokens = sum(total["tokens"] for total in totals.values())
+    click.echo(f"Total {all_tokens:,} tokens in {seconds:.2f}s: {all_tokens / seconds:,.0f} tokens/s, "
+               f"{rows / seconds:,.0f} rows/s, {result['bytes'] / 1024 / 1024 / seconds:.1f} MB/s "
+               f"with {workers} workers, peak RSS {result['peak_rss_mb']:.0f} MB")
+
+def warm_up():
+    """Import everything and open the sessions, caches and tokenizer a command might need."""
+    import requests
+    import nbformat
+    import ollama
+    import openai
+    import llm_cache
+    import web_fetch
+    from map_reduce import get_encoding
+
+    web_fetch.get_session()
+    web_fetch.get_cache()
+    llm_cache.get_cache()
+    get_openai_client()
+    get_ollama_client()
+    try:
+        get_encoding()
+    except Exception as e:
+        # tiktoken downloads the encoding on first use, carry on without it
+        click.echo(f"Tokenizer not loaded: {e}")
+
+def reset_settings():
+    """Put back the cache settings from the environment, a daemon command may have changed them."""
+    import llm_cache
+    import web_fetch
+
+    web_fetch.configure_cache(enabled=not os.environ.get("QBLOG_NO_CACHE"), offline=bool(os.environ.get("QBLOG_OFFLINE")))
+    llm_cache.configure_cache(enabled=not os.environ.get("QBLOG_NO_CACHE"), refresh=bool(os.environ.get("QBLOG_REFRESH")))
+
+@cli.command()
+@click.option("--socket", "socket_path", default=None, help="Socket to listen on, defaults to .cache/qblog2.sock")
+def serve(socket_path):
+    """
+    Keep qblog2 running in the background so other qblog2 commands start
+    instantly. Restart it after changing the code or ~/.geir.
+    """
+    import qblog_daemon
+    try:
+        qblog_daemon.serve(cli, socket_path, warm_up=warm_up, reset=reset_settings)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
 
 if __name__ == "__main__":
+    # Hand the command to a running `qblog2 serve` if there is one. The daemon
+    # doesn't see this environment, so QBLOG_PROFILE runs in-process (--profile is passed on)
+    if sys.argv[1:2] != ["serve"] and not os.environ.get(tracing.ENV_VAR):
+        from qblog_daemon import forward
+        exit_code = forward(sys.argv[1:])
+        if exit_code is not None:
+            sys.exit(exit_code)
     cli()
@@ -0,0 +1,207 @@
+"""
+Run qblog2 as a long-lived daemon so each command skips the startup cost.
+
+`qblog2 serve` imports everything once and keeps the HTTP session, OpenAI
+client, tokenizer and caches warm, listening on a Unix socket. A plain
+`qblog2 ...` then sends its arguments to the daemon with forward(), which
+only needs the standard library, and prints whatever the daemon writes back.
+If no daemon is running the command runs in-process as before.
+
+Commands run one at a time, in the client's working directory. The daemon
+keeps the environment it was started with, so a client whose FORWARDED_ENV
+variables (model hosts and keys, cache switches) differ from the daemon's
+runs the command in-process instead. Set QBLOG_NO_DAEMON=1 to always run
+in-process, or QBLOG_SOCKET to use another socket path.
+
+The protocol is one JSON object per line: the client sends
+{"args": [...], "cwd": ..., "env": digest}, the daemon answers with
+{"out": text} or {"err": text} messages as output is written and a final
+{"exit": code}, or just {"in_process": true} if the environments differ.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import hashlib
+import traceback
+import contextlib
+
+from build_cache import CACHE_DIR
+
+DEFAULT_SOCKET = os.path.join(CACHE_DIR, "qblog2.sock")
+# Read when the clients and caches are set up, so a command needs the same values as the daemon
+FORWARDED_ENV = ["OLLAMA_HOST", "OPENAI_API_KEY", "OPENAI_BASE_URL", "QBLOG_NO_CACHE", "QBLOG_OFFLINE", "QBLOG_REFRESH"]
+
+def socket_path(path=None):
+    return os.path.abspath(path or os.environ.get("QBLOG_SOCKET") or DEFAULT_SOCKET)
+
+def env_digest():
+    """A hash of the FORWARDED_ENV variables, so keys are compared without being sent."""
+    h = hashlib.sha256()
+    for name in FORWARDED_ENV:
+        h.update(f"{name}={os.environ.get(name)!r}\0".encode("utf-8"))
+    return h.hexdigest()
+
+def _send(conn, message):
+    conn.sendall(json.dumps(message).encode("utf-8") + b"\n")
+
+class SocketWriter:
+    """A text stream that sends everything written to it to the client."""
+    encoding = "utf-8"
+
+    def __init__(self, conn, stream):
+        self.conn = conn
+        self.stream = stream
+        self.closed_by_client = False
+
+    def write(self, text):
+        if not isinstance(text, str):
+            # click checks whether a stream takes bytes by trying to write some
+            raise TypeError("write() argument must be str")
+        if text and not self.closed_by_client:
+            try:
+                _send(self.conn, {self.stream: text})
+            except OSError:
+                # The client went away (Ctrl-C), let the command finish quietly
+                self.closed_by_client = True
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+def _run(cli, args, out, err):
+    """Run a click command with output going to out and err, and return its exit code."""
+    import click
+
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+        try:
+            result = cli.main(args=args, prog_name="qblog2", standalone_mode=False)
+            return result if isinstance(result, int) else 0
+        except click.exceptions.Exit as e:
+            return e.exit_code
+        except click.ClickException as e:
+            e.show(file=err)
+            return e.exit_code
+        except click.Abort:
+            err.write("Aborted!\n")
+            return 1
+        except SystemExit as e:
+            return e.code if isinstance(e.code, int) else 1
+        except Exception:
+            err.write(traceback.format_exc())
+            return 1
+
+def _handle(conn, cli, reset=None):
+    with conn, conn.makefile("r", encoding="utf-8") as f:
+        line = f.readline()
+        if not line:
+            return
+        request = json.loads(line)
+        args = request["args"]
+        if args[:1] == ["serve"]:
+            _send(conn, {"err": "A qblog2 daemon is already running\n"})
+            _send(conn, {"exit": 1})
+            return
+        if request.get("env") != env_digest():
+            print(f"qblog2 {' '.join(args)}: different environment, running in the client", flush=True)
+            _send(conn, {"in_process": True})
+            return
+
+        start = time.perf_counter()
+        cwd = os.getcwd()
+        os.chdir(request.get("cwd") or cwd)
+        try:
+            if reset:
+                reset()
+            code = _run(cli, args, SocketWriter(conn, "out"), SocketWriter(conn, "err"))
+        finally:
+            os.chdir(cwd)
+        elapsed = time.perf_counter() - start
+        print(f"qblog2 {' '.join(args)}: exit {code} in {elapsed * 1000:.0f}ms", flush=True)
+        with contextlib.suppress(OSError):
+            _send(conn, {"exit": code})
+
+def _is_running(path):
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.connect(path)
+        return True
+    except OSError:
+        return False
+
+def serve(cli, path=None, warm_up=None, reset=None):
+    """
+    Serve cli commands on a Unix socket until interrupted. warm_up() runs
+    once before listening, and reset() before every command to undo settings
+    an earlier command changed.
+    """
+    path = socket_path(path)
+    if os.path.exists(path):
+        if _is_running(path):
+            raise RuntimeError(f"A qblog2 daemon is already listening on {path}")
+        # Left behind by a daemon that didn't shut down cleanly
+        os.unlink(path)
+
+    start = time.perf_counter()
+    if warm_up:
+        warm_up()
+    print(f"Warmed up in {time.perf_counter() - start:.2f}s", flush=True)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        server.bind(path)
+        server.listen()
+        print(f"Listening on {path}, Ctrl-C to stop", flush=True)
+        while True:
+            conn, _ = server.accept()
+            try:
+                _handle(conn, cli, reset)
+            except (OSError, ValueError) as e:
+                print(f"Dropped a request: {e}", flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(path)
+
+def forward(args, path=None):
+    """
+    Run a command on the daemon, copying its output to stdout and stderr.
+    Returns the exit code, or None if there is no daemon to talk to or it
+    was started with a different environment.
+    """
+    if os.environ.get("QBLOG_NO_DAEMON"):
+        return None
+    path = socket_path(path)
+    if not os.path.exists(path):
+        return None
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(path)
+    except OSError:
+        conn.close()
+        return None
+
+    with conn, conn.makefile("r", encoding="utf-8") as f:
+        _send(conn, {"args": args, "cwd": os.getcwd(), "env": env_digest()})
+        for line in f:
+            message = json.loads(line)
+            if "out" in message:
+                sys.stdout.write(message["out"])
+                sys.stdout.flush()
+            elif "err" in message:
+                sys.stderr.write(message["err"])
+                sys.stderr.flush()
+            elif "exit" in message:
+                return message["exit"]
+            elif "in_process" in message:
+                return None
+    # The daemon died halfway through the command
+    sys.stderr.write("Lost the connection to the qblog2 daemon\n")
+    return 1
@@ -0,0 +1,206 @@
+"""
+Pre-render step that finds the most similar posts for every post.
+
+Post vectors come from the search index (the mean of each post's chunk
+embeddings, see post_search.py) as one contiguous matrix, and the top
+RELATED_COUNT neighbours of many posts are found with one matrix product per
+block of CHUNK_ROWS posts. The result is written to a _metadata.yml next to
+each post, which Quarto merges into the post's metadata as `related`, so the
+notebooks themselves are never touched.
+
+The manifest remembers each post's neighbours and scores. On the next run
+only posts whose embedding changed, or whose neighbours changed or went
+away, are recomputed against every post; the rest are only compared with
+the changed posts.
+
+With no search index yet (e.g. a fresh CI checkout) the posts are embedded
+with the embedder in QBLOG_RELATED_EMBEDDER if it is set, such as
+"openai:text-embedding-3-small". The stub embedder is only a test double,
+so related posts are never worked out from its vectors.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import yaml
+
+from build_cache import CACHE_DIR, load_manifest, save_manifest
+from post_index import PostIndex, POSTS_DIR
+import tracing
+from tracing import span, traced
+
+RELATED_COUNT = 3
+# Posts compared at once, bounds the similarity block to CHUNK_ROWS x posts floats
+CHUNK_ROWS = 1024
+METADATA_FILE = "_metadata.yml"
+MANIFEST_PATH = os.path.join(CACHE_DIR, "related-manifest.json")
+EMBEDDER_ENV = "QBLOG_RELATED_EMBEDDER"
+
+def top_k(matrix, rows, k, columns=None, chunk_rows=CHUNK_ROWS):
+    """
+    The k rows of matrix most similar to each of the given rows, never the
+    row itself, looking only at columns (row numbers) if given. Returns
+    (indices, scores), both shaped (len(rows), k) and best first; missing
+    neighbours have index -1 and score -inf.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    columns = np.arange(len(matrix)) if columns is None else np.asarray(columns, dtype=np.int64)
+    indices = np.full((len(rows), k), -1, dtype=np.int64)
+    scores = np.full((len(rows), k), -np.inf, dtype=np.float32)
+    if not len(rows) or not len(columns):
+        return indices, scores
+
+    candidates = np.ascontiguousarray(matrix[columns].T)
+    found = min(k, len(columns))
+    for start in range(0, len(rows), chunk_rows):
+        block = rows[start:start + chunk_rows]
+        similarity = matrix[block] @ candidates
+        similarity[block[:, None] == columns[None, :]] = -np.inf
+        best = np.argpartition(-similarity, found - 1, axis=1)[:, :found]
+        best_scores = np.take_along_axis(similarity, best, axis=1)
+        order = np.argsort(-best_scores, axis=1)
+        indices[start:start + len(block), :found] = columns[np.take_along_axis(best, order, axis=1)]
+        scores[start:start + len(block), :found] = np.take_along_axis(best_scores, order, axis=1)
+    # A row that is one of the few columns only has itself left to fill the last place
+    indices[np.isneginf(scores)] = -1
+    return indices, scores
+
+def _neighbours(folders, indices, scores):
+    return [[[folders[i], round(float(s), 4)] for i, s in zip(row_indices, row_scores) if i >= 0 and s > -np.inf]
+            for row_indices, row_scores in zip(indices, scores)]
+
+def compute_related(folders, hashes, matrix, candidate, manifest, k=RELATED_COUNT):
+    """
+    Return ({folder: [[neighbour, score], ...]}, recomputed, merged). candidate[i]
+    says whether post i may be shown as related (published posts only).
+    Neighbours in the manifest are reused unless they may have changed.
+    """
+    entries = {folder: manifest.get(folder) for folder in folders}
+    changed = {folder for folder, content_hash, is_candidate in zip(folders, hashes, candidate)
+               if not entries[folder] or entries[folder]["hash"] != content_hash
+               or entries[folder]["candidate"] != is_candidate}
+    invalid = changed | (set(manifest) - set(folders))
+    columns = np.flatnonzero(candidate)
+
+    dirty, clean = [], []
+    for row, folder in enumerate(folders):
+        old = entries[folder]
+        possible = min(k, len(columns) - bool(candidate[row]))
+        if folder in changed or len(old["related"]) < possible or any(
+                neighbour in invalid for neighbour, _ in old["related"]):
+            dirty.append(row)
+        else:
+            clean.append(row)
+
+    related = {}
+    if dirty:
+        indices, scores = top_k(matrix, dirty, k, columns)
+        for row, neighbours in zip(dirty, _neighbours(folders, indices, scores)):
+            related[folders[row]] = neighbours
+
+    # Unchanged posts only need comparing with the changed ones that can be shown
+    changed_columns = [row for row in columns if folders[row] in changed]
+    if clean and changed_columns:
+        indices, scores = top_k(matrix, clean, k, changed_columns)
+        for row, new in zip(clean, _neighbours(folders, indices, scores)):
+            merged = sorted(entries[folders[row]]["related"] + new, key=lambda pair: -pair[1])
+            related[folders[row]] = merged[:k]
+    else:
+        for row in clean:
+            related[folders[row]] = entries[folders[row]]["related"]
+    return related, len(dirty), len(clean)
+
+def write_metadata(post, neighbours, posts):
+    """Write the post's _metadata.yml. Returns True if it changed."""
+    path = os.path.join(os.path.dirname(post["notebook_path"]), METADATA_FILE)
+    related = []
+    for folder, score in neighbours:
+        other = posts.get(folder)
+        if other:
+            related.append({"title": other["title"] or other["slug"], "date": other["date"],
+                            "href": f"../{folder}/index.html", "score": score})
+    text = "# Written by related_posts.py at render time\n" + yaml.safe_dump(
+        {"related": related}, sort_keys=False, allow_unicode=True)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            if f.read() == text:
+                return False
+    except FileNotFoundError:
+        pass
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return True
+
+@traced("embeddings.refresh")
+def is_stub(spec):
+    return spec.partition(":")[0] == "stub"
+
+def refresh_embeddings(search_index):
+    """
+    Embed changed posts with the embedder the search index was built with,
+    if it can be reached, or build the index with QBLOG_RELATED_EMBEDDER.
+    """
+    from embeddings import get_embedder
+
+    spec = search_index.meta("embedder")
+    if not spec or is_stub(spec):
+        # A stub-built index is replaced as soon as there is a real embedder
+        spec = os.environ.get(EMBEDDER_ENV)
+    if not spec or is_stub(spec):
+        return
+    try:
+        search_index.update(get_embedder(spec))
+    except Exception as e:
+        # Ollama not running, no network... carry on with the embeddings there are
+        print(f"Related posts: couldn't update embeddings with {spec} ({e}), using cached ones")
+
+def update_related_posts(full=False, manifest_path=MANIFEST_PATH, k=RELATED_COUNT):
+    """Work out related posts and write them next to each post. Returns counts of what was done."""
+    from post_search import SearchIndex
+
+    start = time.perf_counter()
+    search_index = SearchIndex()
+    refresh_embeddings(search_index)
+    spec = search_index.meta("embedder")
+    if spec and is_stub(spec):
+        print(f"Related posts: the search index was built with {spec}, a test embedder, not suggesting any")
+        return {"posts": 0, "recomputed": 0, "reused": 0, "written": 0}
+    folders, hashes, matrix = search_index.post_vectors()
+    if not folders:
+        print(f"Related posts: no post embeddings yet, run qblog2 search or set {EMBEDDER_ENV} to build them")
+        return {"posts": 0, "recomputed": 0, "reused": 0, "written": 0}
+
+    post_index = PostIndex()
+    with span("post_index.update"):
+        post_index.update(POSTS_DIR)
+    posts = {post["folder"]: post for post in post_index.posts()}
+    # Drafts and posts that have since been deleted are never suggested
+    candidate = np.array([folder in posts and not posts[folder]["draft"] for folder in folders])
+
+    manifest = {} if full else load_manifest(manifest_path)
+    compute_start = time.perf_counter()
+    with span("related.compute", posts=len(folders)):
+        related, recomputed, reused = compute_related(folders, hashes, matrix, candidate, manifest, k)
+    compute_seconds = time.perf_counter() - compute_start
+
+    written = 0
+    new_manifest = {}
+    with span("related.write"):
+        for folder, content_hash, is_candidate in zip(folders, hashes, candidate):
+            new_manifest[folder] = {"hash": content_hash, "candidate": bool(is_candidate), "related": related[folder]}
+            if folder in posts:
+                written += write_metadata(posts[folder], related[folder], posts)
+        save_manifest(new_manifest, manifest_path)
+
+    print(f"Related posts: {len(folders)} posts, recomputed {recomputed}, reused {reused}, "
+          f"wrote {written} in {time.perf_counter() - start:.2f}s ({compute_seconds * 1000:.1f}ms computing)")
+    return {"posts": len(folders), "recomputed": recomputed, "reused": reused, "written": written}
+
+if __name__ == "__main__":
+    tracing.enable_from_env()
+    if not os.getenv("QUARTO_PROJECT_RENDER_ALL"):
+        print("Not updating related posts")
+        exit()
+    else:
+        update_related_posts(full="--full" in sys.argv[1:])
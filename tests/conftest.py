@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+
+# The scripts are top-level modules in the repository root
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, ROOT)
+
+@pytest.fixture(autouse=True)
+def no_shared_caches(monkeypatch):
+    """Keep tests away from the real .cache/ and from each other's cache settings."""
+    import llm_cache
+
+    monkeypatch.setattr(llm_cache, "_cache", None)
+    monkeypatch.setitem(llm_cache._cache_settings, "enabled", False)
+    monkeypatch.setitem(llm_cache._cache_settings, "refresh", False)
+    monkeypatch.setitem(llm_cache._cache_settings, "path", None)
+
+@pytest.fixture
+def byte_encoding(monkeypatch):
+    """A tiktoken encoding with one token per byte, so counts are easy to check and nothing is downloaded."""
+    import tiktoken
+    import tiktoken.registry
+
+    encoding = tiktoken.Encoding(name="test-bytes", pat_str=r"\s?\w+|\s?[^\w\s]+|\s+",
+                                 mergeable_ranks={bytes([i]): i for i in range(256)}, special_tokens={})
+    monkeypatch.setitem(tiktoken.registry.ENCODINGS, encoding.name, encoding)
+    return encoding.name
@@ -0,0 +1,45 @@
+import json
+import datetime
+from pathlib import Path
+
+import change_future_posts_to_draft as drafts
+from front_matter import read_front_matter, update_front_matter
+
+def write_post(tmp_path, folder, date, draft, publish):
+    (tmp_path / "posts" / folder).mkdir(parents=True)
+    source = f'---\ntitle: "{folder}"\ndate: "{date}"\ndraft: "{draft}"\npublish: "{publish}"\n---\n'
+    cells = [{"cell_type": "raw", "metadata": {}, "source": source}]
+    path = tmp_path / "posts" / folder / "index.ipynb"
+    path.write_text(json.dumps({"cells": cells, "metadata": {}, "nbformat": 4, "nbformat_minor": 5}), encoding="utf-8")
+    return f"posts/{folder}/index.ipynb"
+
+def test_draft_status_follows_the_date_and_the_manifest_skips_unchanged_posts(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    future = (datetime.date.today() + datetime.timedelta(days=7)).isoformat()
+    upcoming = write_post(tmp_path, "upcoming", future, "false", "true")
+    published = write_post(tmp_path, "published", "2025-01-05", "true", "true")
+    unfinished = write_post(tmp_path, "unfinished", "2025-01-12", "true", "false")
+    manifest_path = str(tmp_path / ".cache" / "draft-manifest.json")
+
+    stats = drafts.update_draft_status(manifest_path=manifest_path)
+    assert stats == {"scanned": 3, "skipped": 0, "rewritten": 2}
+    assert read_front_matter(upcoming)["draft"] == "true"
+    assert read_front_matter(published)["draft"] == "false"
+    assert read_front_matter(unfinished)["draft"] == "true"
+    manifest = json.loads(Path(manifest_path).read_text())
+    assert {path: manifest[path]["draft"] for path in manifest} == {upcoming: True, published: False, unfinished: True}
+
+    # Nothing changed, nothing is parsed
+    assert drafts.update_draft_status(manifest_path=manifest_path) == {"scanned": 3, "skipped": 3, "rewritten": 0}
+
+    # Publishing a future post by hand is undone, and the manifest follows the file
+    update_front_matter(upcoming, {"draft": False})
+    assert drafts.update_draft_status(manifest_path=manifest_path) == {"scanned": 3, "skipped": 2, "rewritten": 1}
+    assert read_front_matter(upcoming)["draft"] == "true"
+    assert json.loads(Path(manifest_path).read_text())[upcoming]["hash"] == drafts.file_hash(upcoming)
+
+    # A post that is no longer a draft is picked up too, and --full parses everything
+    update_front_matter(unfinished, {"publish": True})
+    assert drafts.update_draft_status(manifest_path=manifest_path)["rewritten"] == 1
+    assert read_front_matter(unfinished)["draft"] == "false"
+    assert drafts.update_draft_status(full=True, manifest_path=manifest_path) == {"scanned": 3, "skipped": 0, "rewritten": 0}
@@ -0,0 +1,41 @@
+import numpy as np
+
+from embeddings import VectorCache, StubEmbedder, text_hash
+
+def test_vector_cache_round_trip(tmp_path):
+    cache = VectorCache(str(tmp_path))
+    vectors = {text_hash("a"): np.arange(4, dtype=np.float32), text_hash("b"): np.ones(4, dtype=np.float32)}
+    cache.put_many("stub:4", 4, vectors)
+    cache.put_many("other", 2, {text_hash("a"): np.zeros(2, dtype=np.float32)})
+
+    found = cache.get_many("stub:4", 4, [text_hash("a"), text_hash("b"), text_hash("c")])
+    assert set(found) == {text_hash("a"), text_hash("b")}
+    for key, vector in vectors.items():
+        np.testing.assert_array_equal(found[key], vector)
+    # Another process opening the same directory sees them too
+    np.testing.assert_array_equal(VectorCache(str(tmp_path)).get_many("stub:4", 4, [text_hash("a")])[text_hash("a")],
+                                  vectors[text_hash("a")])
+    assert cache.stats()["vectors"] == 3
+
+def test_vector_cache_skips_a_half_written_row(tmp_path):
+    cache = VectorCache(str(tmp_path))
+    cache.put_many("stub:4", 4, {text_hash("a"): np.arange(4, dtype=np.float32)})
+    with open(cache.vectors_path, "ab") as f:
+        f.write(b"\1\2")
+    cache.put_many("stub:4", 4, {text_hash("b"): np.full(4, 7, dtype=np.float32)})
+    found = cache.get_many("stub:4", 4, [text_hash("a"), text_hash("b")])
+    np.testing.assert_array_equal(found[text_hash("a")], np.arange(4, dtype=np.float32))
+    np.testing.assert_array_equal(found[text_hash("b")], np.full(4, 7, dtype=np.float32))
+
+def test_embedder_only_embeds_texts_it_has_not_seen(tmp_path):
+    embedder = StubEmbedder(16, batch_size=2)
+    embedder.cache = VectorCache(str(tmp_path))
+    texts = ["one fish", "two fish", "red fish", "one fish"]
+    first = embedder.embed(texts)
+    # The repeated text is only embedded once
+    assert embedder.stats == {"cached": 1, "embedded": 3, "requests": 2}
+
+    again = embedder.embed(texts + ["blue fish"])
+    np.testing.assert_allclose(again[:4], first)
+    assert embedder.stats == {"cached": 5, "embedded": 4, "requests": 3}
+    np.testing.assert_allclose(np.linalg.norm(again, axis=1), 1, rtol=1e-6)
@@ -0,0 +1,64 @@
+import json
+
+import nbformat
+import pytest
+
+from front_matter import read_front_matter, update_front_matter, set_front_matter_fields, parse_front_matter
+
+def write_notebook(path, first_source, first_type="raw"):
+    nb = nbformat.v4.new_notebook()
+    first = nbformat.v4.new_raw_cell(first_source) if first_type == "raw" else nbformat.v4.new_markdown_cell(first_source)
+    code = nbformat.v4.new_code_cell("print('hi')")
+    code.outputs = [nbformat.v4.new_output("display_data", {"image/png": "iVBORw0KGgo" * 5000, "text/plain": "<Figure>"})]
+    nb.cells = [first, code]
+    nbformat.write(nb, str(path))
+
+def test_update_rewrites_only_the_first_cell(tmp_path):
+    path = tmp_path / "index.ipynb"
+    write_notebook(path, '---\ntitle: "Post"\ndate: "2025-01-05"\ndraft: "true"\n---\n')
+    before = path.read_text(encoding="utf-8")
+
+    assert update_front_matter(str(path), {"image": "social-media-card.png", "draft": False})
+    after = path.read_text(encoding="utf-8")
+    assert read_front_matter(str(path)) == {"title": "Post", "date": "2025-01-05", "draft": "false",
+                                       "image": "social-media-card.png"}
+    # Everything from the second cell on is byte for byte the same
+    second_cell = before.index('  {\n   "cell_type": "code"')
+    assert after.endswith(before[second_cell:])
+    # And the file is what nbformat itself would have written
+    nb = nbformat.read(str(path), as_version=4)
+    assert nbformat.writes(nb) + "\n" == after
+    # Nothing to change, the file is left alone
+    assert not update_front_matter(str(path), {"draft": False})
+
+@pytest.mark.parametrize("source, first_type", [
+    ("Just some notes, no front matter", "raw"),
+    ('---\ntitle: "Post"\n', "raw"),  # Never closed
+    ("---\ntitle: [unclosed\n---\n", "raw"),  # Not YAML
+    ("---\n- a\n- list\n---\n", "raw"),  # Not a mapping
+    ('---\ntitle: "Post"\n---\n', "markdown"),
+])
+def test_missing_or_malformed_front_matter_reads_as_empty(tmp_path, source, first_type):
+    path = tmp_path / "index.ipynb"
+    write_notebook(path, source, first_type)
+    assert read_front_matter(str(path)) == {}
+
+def test_unusual_key_order_falls_back_to_reading_the_whole_notebook(tmp_path):
+    path = tmp_path / "index.ipynb"
+    cells = [{"cell_type": "raw", "metadata": {}, "source": ['---\n', 'title: "Post"\n', '---\n']}]
+    path.write_text(json.dumps({"metadata": {}, "nbformat": 4, "nbformat_minor": 5, "cells": cells}), encoding="utf-8")
+    assert read_front_matter(str(path)) == {"title": "Post"}
+    assert update_front_matter(str(path), {"image": "card.png"})
+    assert read_front_matter(str(path)) == {"title": "Post", "image": "card.png"}
+
+def test_quotes_and_multiline_values():
+    source = ('---\ntitle: "Say \\"hello\\" to: agents"\ndescription: |\n  First line\n\n  Second line\n\n'
+              'categories: [python, llm]\ndate: 2025-01-05\n---\n')
+    assert parse_front_matter(source) == {"title": 'Say "hello" to: agents', "description": "First line\n\nSecond line\n",
+                                          "categories": ["python", "llm"], "date": "2025-01-05"}
+
+    updated = set_front_matter_fields(source, {"title": 'A "new" title', "description": "One line", "image": "card.png"})
+    assert parse_front_matter(updated) == {"title": 'A "new" title', "description": "One line",
+                                           "categories": ["python", "llm"], "date": "2025-01-05", "image": "card.png"}
+    # Lines that weren't changed keep their layout
+    assert "\n\ncategories: [python, llm]\ndate: 2025-01-05\n" in updated
@@ -0,0 +1,68 @@
+import llm_cache
+from llm_cache import ResponseCache, cache_key
+
+def test_cache_key_depends_on_every_part():
+    key = cache_key("ollama", "llama3", "Summarize: {}", "text")
+    assert key == cache_key("ollama", "llama3", "Summarize: {}", "text")
+    assert len({key, cache_key("openai", "llama3", "Summarize: {}", "text"),
+                cache_key("ollama", "mistral", "Summarize: {}", "text"),
+                cache_key("ollama", "llama3", "Describe: {}", "text"),
+                cache_key("ollama", "llama3", "Summarize: {}", "other")}) == 5
+    # Parts are separated, so moving text from one to the next changes the key
+    assert cache_key("a", "bc", "", "") != cache_key("ab", "c", "", "")
+
+def test_get_returns_what_was_put(tmp_path):
+    cache = ResponseCache(str(tmp_path / "llm.sqlite3"))
+    cache.put("k", "ollama", "llama3", "A summary", latency=1.5, prompt_tokens=10, completion_tokens=3)
+    entry = cache.get("k")
+    assert entry["response"] == "A summary"
+    assert (entry["latency"], entry["prompt_tokens"], entry["completion_tokens"]) == (1.5, 10, 3)
+    assert cache.get("missing") is None
+
+def test_entries_expire_after_ttl(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now[0])
+    cache = ResponseCache(str(tmp_path / "llm.sqlite3"), ttl=60)
+    cache.put("old", "ollama", "llama3", "old summary")
+    now[0] += 30
+    cache.put("new", "ollama", "llama3", "new summary")
+    assert cache.get("old")["response"] == "old summary"
+
+    now[0] += 31
+    assert cache.get("old") is None
+    assert cache.get("new")["response"] == "new summary"
+    assert cache.stats()["expired"] == 1
+
+def test_least_recently_used_are_evicted_past_max_bytes(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now[0])
+    cache = ResponseCache(str(tmp_path / "llm.sqlite3"), max_bytes=25)
+    for key in ("a", "b"):
+        now[0] += 1
+        cache.put(key, "ollama", "llama3", "x" * 10)
+    # Reading a makes b the least recently used
+    now[0] += 1
+    cache.get("a")
+    now[0] += 1
+    cache.put("c", "ollama", "llama3", "x" * 10)
+
+    assert cache.get("b") is None
+    assert cache.get("a") and cache.get("c")
+    assert cache.stats()["evictions"] == 1
+
+def test_cached_completion_only_calls_the_model_once(tmp_path):
+    llm_cache.configure_cache(path=str(tmp_path / "llm.sqlite3"))
+    calls = []
+
+    def call():
+        calls.append(1)
+        return "A summary", 10, 3, None
+
+    assert llm_cache.cached_completion("ollama", "llama3", "t", "content", call) == "A summary"
+    assert llm_cache.cached_completion("ollama", "llama3", "t", "content", call) == "A summary"
+    assert len(calls) == 1
+    assert llm_cache.get_cache().stats()["hits"] == 1
+
+    llm_cache.configure_cache(refresh=True, path=str(tmp_path / "llm.sqlite3"))
+    llm_cache.cached_completion("ollama", "llama3", "t", "content", call)
+    assert len(calls) == 2
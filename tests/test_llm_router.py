@@ -0,0 +1,119 @@
+import time
+import threading
+
+import pytest
+
+import llm_router
+from llm_router import Router, AllBackendsFailed, FAILURE_THRESHOLD, RESET_AFTER
+
+def answer_after(delays, answers=None, fail=()):
+    """A router call that answers with the backend's name after delays[name] seconds, or raises for fail."""
+    def call(name, on_token):
+        time.sleep(delays.get(name, 0))
+        if name in fail:
+            raise RuntimeError(f"{name} is down")
+        if on_token:
+            on_token(name)
+        return name
+    return call
+
+def test_first_backend_answers_without_a_hedge():
+    router = Router(hedge_after=1.0, timeout=5.0)
+    assert router.call(["llama3", "openai"], answer_after({})) == "llama3"
+    assert "openai" not in router.backends
+
+def test_slow_backend_is_hedged_and_the_faster_one_wins():
+    router = Router(hedge_after=0.05, timeout=5.0)
+    tokens = []
+    start = time.perf_counter()
+    assert router.call(["llama3", "openai"], answer_after({"llama3": 1.0}), on_token=tokens.append) == "openai"
+    assert time.perf_counter() - start < 0.5
+    # Only the winner's tokens are streamed
+    assert tokens == ["openai"]
+
+def test_hedge_that_loses_stops_streaming_once_the_winner_answers():
+    router = Router(hedge_after=0.05, timeout=5.0)
+    tokens = []
+
+    def call(name, on_token):
+        if name == "llama3":
+            # Streams from the start but takes a while to finish
+            for i in range(20):
+                on_token(f"{name}-{i} ")
+                time.sleep(0.02)
+            return "llama3"
+        time.sleep(0.1)
+        return "openai"
+
+    assert router.call(["llama3", "openai"], call, on_token=tokens.append) == "openai"
+    streamed = len(tokens)
+    assert 0 < streamed < 20
+    time.sleep(0.4)
+    assert len(tokens) == streamed
+
+def test_failing_backend_hands_over_straight_away():
+    router = Router(hedge_after=10.0, timeout=5.0)
+    start = time.perf_counter()
+    assert router.call(["llama3", "openai"], answer_after({}, fail={"llama3"})) == "openai"
+    assert time.perf_counter() - start < 1.0
+
+def test_all_backends_failing_raises():
+    router = Router(hedge_after=10.0, timeout=5.0)
+    with pytest.raises(AllBackendsFailed, match="llama3 is down.*openai is down"):
+        router.call(["llama3", "openai"], answer_after({}, fail={"llama3", "openai"}))
+
+def test_circuit_opens_after_repeated_failures_and_closes_after_a_good_trial(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_router.time, "time", lambda: now[0])
+    router = Router(hedge_after=10.0, timeout=5.0)
+    for _ in range(FAILURE_THRESHOLD):
+        router.call(["llama3", "openai"], answer_after({}, fail={"llama3"}))
+    backend = router.backends["llama3"]
+    assert backend.state == "open"
+
+    # While open it is skipped, not asked
+    calls = []
+    def call(name, on_token):
+        calls.append(name)
+        return name
+    assert router.call(["llama3", "openai"], call) == "openai"
+    assert calls == ["openai"]
+
+    now[0] += RESET_AFTER + 1
+    assert backend.state == "half-open"
+    assert router.call(["llama3", "openai"], call) == "llama3"
+    assert backend.state == "closed"
+
+def test_half_open_trial_that_fails_opens_the_circuit_again(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_router.time, "time", lambda: now[0])
+    router = Router(hedge_after=10.0, timeout=5.0)
+    for _ in range(FAILURE_THRESHOLD):
+        router.call(["llama3", "openai"], answer_after({}, fail={"llama3"}))
+    now[0] += RESET_AFTER + 1
+    router.call(["llama3", "openai"], answer_after({}, fail={"llama3"}))
+    assert router.backends["llama3"].state == "open"
+
+def test_ollama_models_on_one_server_share_its_limit(monkeypatch):
+    monkeypatch.delenv("OLLAMA_HOST", raising=False)
+    router = Router(limits={"ollama": 1})
+    running = []
+    most = []
+    lock = threading.Lock()
+
+    def call(name, on_token):
+        with lock:
+            running.append(name)
+            most.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.remove(name)
+        return name
+
+    threads = [threading.Thread(target=router.call, args=([name], call)) for name in ("llama3", "mistral") * 2]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert max(most) == 1
+    assert router.backends["llama3"].slots is router.backends["mistral"].slots
@@ -0,0 +1,63 @@
+import threading
+
+from map_reduce import split_into_chunks, map_reduce_summarize, format_report, clean_text, count_tokens, CHUNK_PROMPT
+
+def test_chunks_break_between_paragraphs_and_stay_in_budget(byte_encoding):
+    text = "aaaa\n\nbbbb\n\ncccccccccc\n\n" + "x" * 25
+    chunks = split_into_chunks(text, 10, byte_encoding)
+    # Whole paragraphs where they fit, a paragraph over the budget is cut up on its own
+    assert chunks == ["aaaa\n\nbbbb", "cccccccccc", "x" * 10, "x" * 10, "x" * 5]
+    assert all(count_tokens(chunk, byte_encoding) <= 10 for chunk in chunks)
+
+def test_clean_text_collapses_blank_lines_and_spaces():
+    assert clean_text("  Title \n\n\n \n Some   words\t here \n") == "Title\n\nSome words here"
+
+def recording_model(shorten):
+    calls = []
+    lock = threading.Lock()
+    def summarize(text, template):
+        with lock:
+            calls.append((text, template))
+        return shorten(text) if template == CHUNK_PROMPT else "Final summary"
+    return summarize, calls
+
+def test_short_text_is_summarised_in_one_prompt(byte_encoding):
+    summarize, calls = recording_model(lambda text: text)
+    summary, report = map_reduce_summarize("A short page.", summarize, 100, encoding=byte_encoding)
+    assert summary == "Final summary"
+    assert calls == [("A short page.", None)]
+    assert (report["chunks"], report["rounds"], report["tokens_sent"]) == (0, 0, 13)
+    assert "in one prompt" in format_report(report)
+
+def test_long_text_is_mapped_then_reduced(byte_encoding):
+    text = "\n\n".join(f"Paragraph {i:02d} " + "word " * 5 for i in range(10))
+    summarize, calls = recording_model(lambda text: text[:12])
+    summary, report = map_reduce_summarize(text, summarize, 100, workers=3, encoding=byte_encoding)
+
+    assert summary == "Final summary"
+    chunks = split_into_chunks(clean_text(text), 100, byte_encoding)
+    assert len(chunks) == report["chunks"] == 5 and report["rounds"] == 1
+    assert sorted(text for text, template in calls if template == CHUNK_PROMPT) == sorted(chunks)
+    # The reduce step gets the partial summaries, in page order
+    assert calls[-1] == ("\n\n".join(chunk[:12].strip() for chunk in chunks), None)
+    assert report["tokens_sent"] == sum(count_tokens(text, byte_encoding) for text, _ in calls)
+    assert "as 5 chunks over 1 round(s)" in format_report(report)
+
+def test_partials_that_are_still_too_long_get_another_round(byte_encoding):
+    paragraphs = [f"Paragraph {i:02d} " + "word " * 8 for i in range(20)]
+    summarize, calls = recording_model(lambda text: text[:40])
+    _, report = map_reduce_summarize("\n\n".join(paragraphs), summarize, 100, encoding=byte_encoding)
+    assert report["rounds"] > 1
+    assert count_tokens(calls[-1][0], byte_encoding) <= 100
+
+def test_a_model_that_does_not_shorten_is_cut_to_the_budget(byte_encoding):
+    summarize, calls = recording_model(lambda text: text)
+    _, report = map_reduce_summarize("\n\n".join(["word " * 30] * 10), summarize, 100, encoding=byte_encoding)
+    assert report["rounds"] == 1
+    assert count_tokens(calls[-1][0], byte_encoding) == 100
+
+def test_report_compares_with_single_shot():
+    report = {"raw_tokens": 9000, "input_tokens": 8000, "chunks": 2, "rounds": 1, "tokens_sent": 8300, "seconds": 4.0}
+    assert format_report(report).endswith("(single shot would send 9000 tokens)")
+    report["single_shot_seconds"] = 12.5
+    assert format_report(report).endswith("(single shot sent 9000 tokens in 12.5s)")
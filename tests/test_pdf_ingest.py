@@ -0,0 +1,43 @@
+import os
+
+import pymupdf
+
+import pdf_ingest
+from build_cache import file_hash
+from embeddings import StubEmbedder
+
+def write_pdf(path, pages):
+    doc = pymupdf.open()
+    for text in pages:
+        doc.new_page().insert_text((72, 72), text)
+    doc.save(str(path))
+    doc.close()
+
+def test_a_corrupt_pdf_is_skipped_and_touched_files_are_not_hashed_again(tmp_path, monkeypatch):
+    pdf_dir = tmp_path / "pdfs"
+    pdf_dir.mkdir()
+    write_pdf(pdf_dir / "agents.pdf", ["Agents call tools in a loop", "Tools return results to the agent"])
+    write_pdf(pdf_dir / "search.pdf", ["Vector search over embeddings"])
+    (pdf_dir / "broken.pdf").write_bytes((pdf_dir / "search.pdf").read_bytes()[:200])
+    embedder = StubEmbedder(32)
+    index = pdf_ingest.PdfIndex(str(tmp_path / "index"))
+
+    stats = index.ingest(str(pdf_dir), embedder, workers=2)
+    assert list(stats["failed"]) == ["broken.pdf"]
+    assert (stats["pages"], stats["chunks"]) == (3, 3)
+    assert index.search("vector search", embedder, k=1)[0][1:3] == ("search.pdf", 1)
+
+    # The broken file is tried again, the others aren't touched
+    stats = index.ingest(str(pdf_dir), embedder, workers=2)
+    assert (stats["changed"], stats["chunks"], list(stats["failed"])) == (1, 0, ["broken.pdf"])
+
+    # A new mtime with the same content is hashed once, then remembered
+    hashed = []
+    monkeypatch.setattr(pdf_ingest, "file_hash", lambda path: hashed.append(os.path.basename(path)) or file_hash(path))
+    os.utime(pdf_dir / "agents.pdf", ns=(1_000_000_000, 1_000_000_000))
+    os.remove(pdf_dir / "broken.pdf")
+    stats = index.ingest(str(pdf_dir), embedder, workers=2)
+    assert (stats["changed"], stats["removed"], stats["chunks"]) == (0, 0, 0)
+    assert hashed == ["agents.pdf"]
+    index.ingest(str(pdf_dir), embedder, workers=2)
+    assert hashed == ["agents.pdf"]
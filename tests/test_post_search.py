@@ -0,0 +1,39 @@
+import os
+import json
+import shutil
+
+from embeddings import StubEmbedder
+from post_index import PostIndex
+from post_search import SearchIndex
+
+def write_post(posts_dir, folder, title, text):
+    os.makedirs(posts_dir / folder, exist_ok=True)
+    cells = [{"cell_type": "raw", "metadata": {}, "source": f'---\ntitle: "{title}"\ndate: "2025-01-05"\n---\n'},
+             {"cell_type": "markdown", "metadata": {}, "source": text}]
+    with open(posts_dir / folder / "index.ipynb", "w", encoding="utf-8") as f:
+        json.dump({"cells": cells, "metadata": {}, "nbformat": 4, "nbformat_minor": 5}, f)
+
+def test_search_finds_posts_and_only_embeds_changes(tmp_path):
+    posts_dir = tmp_path / "posts"
+    write_post(posts_dir, "2025-01-05-pandas", "Pandas", "Reading a CSV file into a pandas dataframe")
+    write_post(posts_dir, "2025-01-12-ollama", "Ollama", "Running a local language model with ollama on a mac")
+    write_post(posts_dir, "2025-01-19-faiss", "FAISS", "Searching embeddings with a faiss vector index")
+    embedder = StubEmbedder(64)
+    post_index = PostIndex(str(tmp_path / "posts.sqlite3"))
+    index = SearchIndex(str(tmp_path / "search"))
+
+    stats = index.update(embedder, str(posts_dir), post_index)
+    assert (stats["posts"], stats["changed"], stats["chunks"]) == (3, 3, 3)
+    assert index.search("local language model", embedder, k=1)[0]["folder"] == "2025-01-12-ollama"
+
+    write_post(posts_dir, "2025-01-05-pandas", "Pandas", "Plotting a pandas dataframe with matplotlib")
+    shutil.rmtree(posts_dir / "2025-01-19-faiss")
+    stats = index.update(embedder, str(posts_dir), post_index)
+    assert (stats["changed"], stats["removed"]) == (1, 1)
+    # The deleted post is gone from the results
+    assert {result["folder"] for result in index.search("faiss vector index", embedder)} == \
+           {"2025-01-05-pandas", "2025-01-12-ollama"}
+
+    folders, hashes, matrix = index.post_vectors()
+    assert folders == ["2025-01-05-pandas", "2025-01-12-ollama"]
+    assert matrix.shape == (2, 64)
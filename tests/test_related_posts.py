@@ -0,0 +1,55 @@
+import numpy as np
+
+from embeddings import normalize
+from related_posts import top_k, compute_related
+
+def brute_force(matrix, row, k, columns):
+    scores = {column: float(matrix[row] @ matrix[column]) for column in columns if column != row}
+    return sorted(scores, key=lambda column: -scores[column])[:k]
+
+def test_top_k_matches_brute_force():
+    matrix = normalize(np.random.default_rng(0).normal(size=(50, 8)))
+    columns = np.arange(0, 50, 2)
+    # Small chunks, so the rows go through several similarity blocks
+    indices, scores = top_k(matrix, range(50), 3, columns, chunk_rows=7)
+    for row in range(50):
+        assert list(indices[row]) == brute_force(matrix, row, 3, columns)
+        assert np.all(np.diff(scores[row]) <= 0)
+        assert row not in indices[row]
+
+def test_top_k_pads_missing_neighbours():
+    matrix = normalize(np.eye(3))
+    indices, scores = top_k(matrix, [0], 3, columns=[0, 1])
+    assert list(indices[0]) == [1, -1, -1]
+    assert scores[0][1] == -np.inf
+
+def related_posts(folders, matrix, candidate, manifest, k=3):
+    hashes = [str(hash(row.tobytes())) for row in matrix]
+    related, recomputed, reused = compute_related(folders, hashes, matrix, np.array(candidate), manifest, k)
+    new_manifest = {folder: {"hash": h, "candidate": bool(c), "related": related[folder]}
+                    for folder, h, c in zip(folders, hashes, candidate)}
+    return related, recomputed, reused, new_manifest
+
+def test_compute_related_gives_each_post_its_top_k():
+    matrix = normalize(np.random.default_rng(1).normal(size=(20, 8)))
+    folders = [f"post-{i:02}" for i in range(20)]
+    candidate = [i % 5 != 0 for i in range(20)]
+    related, recomputed, reused, _ = related_posts(folders, matrix, candidate, {})
+    assert (recomputed, reused) == (20, 0)
+    for row, folder in enumerate(folders):
+        expected = brute_force(matrix, row, 3, np.flatnonzero(candidate))
+        assert [neighbour for neighbour, _ in related[folder]] == [folders[i] for i in expected]
+
+def test_changing_one_post_gives_the_same_answer_as_starting_again():
+    rng = np.random.default_rng(2)
+    matrix = normalize(rng.normal(size=(30, 8)))
+    folders = [f"post-{i:02}" for i in range(30)]
+    candidate = [True] * 30
+    _, _, _, manifest = related_posts(folders, matrix, candidate, {})
+
+    matrix[7] = normalize(rng.normal(size=(1, 8)))[0]
+    related, recomputed, reused, _ = related_posts(folders, matrix, candidate, manifest)
+    assert reused > 0 and recomputed < 30
+    full, _, _, _ = related_posts(folders, matrix, candidate, {})
+    assert {folder: [n for n, _ in pairs] for folder, pairs in related.items()} == \
+           {folder: [n for n, _ in pairs] for folder, pairs in full.items()}
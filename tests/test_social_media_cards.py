@@ -0,0 +1,59 @@
+import json
+
+import generate_social_media_cards as cards
+from front_matter import update_front_matter
+
+def write_post(posts_dir, folder, front_matter):
+    (posts_dir / folder).mkdir(parents=True, exist_ok=True)
+    cells = [{"cell_type": "raw", "metadata": {}, "source": f"---\n{front_matter}---\n"}]
+    path = posts_dir / folder / "index.ipynb"
+    path.write_text(json.dumps({"cells": cells, "metadata": {}, "nbformat": 4, "nbformat_minor": 5}), encoding="utf-8")
+    return str(path)
+
+def draw(posts_dir, manifest, stale):
+    """What main() does for each card that was made."""
+    for folder, notebook_path, _, current in stale:
+        (posts_dir / folder / cards.CARD_IMAGE).write_bytes(b"png")
+        update_front_matter(notebook_path, {"image": cards.CARD_IMAGE, cards.CARD_HASH_FIELD: current})
+        manifest[folder] = current
+
+def stale_folders(posts_dir, manifest, style_hash):
+    return sorted(folder for folder, _, _, _ in cards.find_stale_cards(str(posts_dir), manifest, style_hash))
+
+def test_cards_go_stale_when_their_inputs_change(tmp_path):
+    (tmp_path / "styles.css").write_text("h1 { color: black; }")
+    posts_dir = tmp_path / "posts"
+    first = write_post(posts_dir, "2025-01-05-first", 'title: "First"\ndate: "2025-01-05"\n')
+    write_post(posts_dir, "2025-01-12-second", 'title: "Second"\ndate: "2025-01-12"\n')
+    write_post(posts_dir, "2025-01-19-own-image", 'title: "Own"\nimage: "photo.png"\n')
+    style_hash = cards.card_style_hash(str(tmp_path))
+    manifest = {}
+
+    assert stale_folders(posts_dir, manifest, style_hash) == ["2025-01-05-first", "2025-01-12-second"]
+    draw(posts_dir, manifest, cards.find_stale_cards(str(posts_dir), manifest, style_hash))
+    # Unchanged posts stay fresh, with or without the manifest (CI starts without .cache/)
+    assert stale_folders(posts_dir, manifest, style_hash) == []
+    assert stale_folders(posts_dir, {}, style_hash) == []
+
+    # A new title only makes that post's card stale
+    update_front_matter(first, {"title": "First, renamed"})
+    assert stale_folders(posts_dir, manifest, style_hash) == ["2025-01-05-first"]
+
+    # A style change makes every generated card stale
+    (tmp_path / "styles.css").write_text("h1 { color: red; }")
+    new_style_hash = cards.card_style_hash(str(tmp_path))
+    assert new_style_hash != style_hash
+    assert stale_folders(posts_dir, manifest, new_style_hash) == ["2025-01-05-first", "2025-01-12-second"]
+    # So does a different engine, which draws cards differently
+    assert cards.card_style_hash(str(tmp_path), "raster") != new_style_hash
+
+def test_cards_from_before_hashes_were_recorded_are_kept(tmp_path):
+    posts_dir = tmp_path / "posts"
+    write_post(posts_dir, "2025-01-05-old", f'title: "Old"\nimage: "{cards.CARD_IMAGE}"\n')
+    (posts_dir / "2025-01-05-old" / cards.CARD_IMAGE).write_bytes(b"png")
+    manifest = {}
+    assert stale_folders(posts_dir, manifest, "style") == []
+    assert manifest == {"2025-01-05-old": cards.card_hash({"title": "Old"}, "style")}
+    # A card made here that has since been deleted is made again
+    (posts_dir / "2025-01-05-old" / cards.CARD_IMAGE).unlink()
+    assert stale_folders(posts_dir, manifest, "style") == ["2025-01-05-old"]
@@ -0,0 +1,56 @@
+import gzip
+
+import numpy as np
+import pyarrow as pa
+import pytest
+
+import token_count
+
+def histogram_of(counts):
+    return np.bincount(np.searchsorted(token_count.EDGES, counts, side="right"), minlength=len(token_count.EDGES) + 1)
+
+def test_histogram_percentiles_are_exact_for_short_rows_and_close_for_long_ones():
+    counts = [1] * 50 + [10] * 40 + [1000] * 10
+    histogram = histogram_of(counts)
+    assert histogram.sum() == 100
+    assert token_count.histogram_percentile(histogram, 0.5) == 1
+    assert token_count.histogram_percentile(histogram, 0.9) == 10
+    # The upper edge of the bucket, never below the real value and at most about 4% over
+    assert 1000 <= token_count.histogram_percentile(histogram, 0.99) <= 1040
+    assert token_count.histogram_percentile(histogram_of([]), 0.5) == 0
+
+def test_count_batch_totals_each_column(byte_encoding, monkeypatch):
+    monkeypatch.setattr(token_count, "_encoding", None)
+    token_count._init_worker(byte_encoding)
+    batch = pa.RecordBatch.from_arrays([pa.array(["ab", None, "cdef"]), pa.array(["x", "y", "z"])], names=["a", "b"])
+    result = token_count.count_batch(batch)
+    assert {key: result["a"][key] for key in ("rows", "nulls", "tokens", "chars", "max")} == \
+           {"rows": 3, "nulls": 1, "tokens": 6, "chars": 6, "max": 4}
+    assert token_count.histogram_percentile(result["a"]["histogram"], 1.0) == 4
+    assert result["b"]["tokens"] == 3
+
+@pytest.mark.parametrize("kind", ["csv", "text.gz", "parquet"])
+def test_count_file_adds_up_the_blocks(tmp_path, byte_encoding, kind, monkeypatch):
+    monkeypatch.setattr(token_count, "_encoding", None)
+    rows = [f"Row {i} " + "word " * (i % 7) for i in range(500)]
+    if kind == "csv":
+        path = tmp_path / "rows.csv"
+        path.write_text("id,text\n" + "".join(f'{i},"{row}\nwith a line break"\n' for i, row in enumerate(rows)))
+        rows = [f"{row}\nwith a line break" for row in rows]
+    elif kind == "text.gz":
+        path = tmp_path / "rows.txt.gz"
+        with gzip.open(path, "wt") as f:
+            f.write("\n".join(rows) + "\n")
+    else:
+        import pyarrow.parquet
+        path = tmp_path / "rows.parquet"
+        pyarrow.parquet.write_table(pa.table({"text": rows, "id": list(range(500))}), path)
+
+    # Small blocks, so the totals come from many of them
+    result = token_count.count_file(str(path), encoding=byte_encoding, workers=1, block_bytes=1024)
+    total = result["columns"]["text"]
+    assert total["rows"] == len(rows) and total["nulls"] == 0
+    assert total["tokens"] == total["chars"] == sum(len(row) for row in rows)
+    assert total["max"] == max(len(row) for row in rows)
+    assert total["histogram"].sum() == len(rows)
+    assert token_count.histogram_percentile(total["histogram"], 0.5) == int(np.percentile([len(row) for row in rows], 50, method="higher"))
@@ -0,0 +1,128 @@
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+import web_fetch
+import html_extract
+
+PAGE = ("<html><head><title>Big page</title></head><body><nav>Menu</nav><article>"
+        + "<p>Some words about the page.</p>" * 2000 + "</article></body></html>").encode("utf-8")
+
+class Server:
+    """A local HTTP server with a few pages, counting requests and how many run at once."""
+    def __init__(self):
+        self.requests = []
+        self.running = 0
+        self.most_running = 0
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                with server.lock:
+                    server.requests.append((self.path, self.headers.get("If-None-Match")))
+                    server.running += 1
+                    server.most_running = max(server.most_running, server.running)
+                try:
+                    server.respond(self)
+                finally:
+                    with server.lock:
+                        server.running -= 1
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}"
+
+    def respond(self, handler):
+        if handler.path == "/missing":
+            handler.send_response(404)
+            handler.end_headers()
+            return
+        if handler.path.startswith("/slow"):
+            time.sleep(0.05)
+        if handler.headers.get("If-None-Match") == '"v1"':
+            handler.send_response(304)
+            handler.end_headers()
+            return
+        body = PAGE if handler.path == "/big" else f"<html><body><p>{handler.path}</p></body></html>".encode("utf-8")
+        handler.send_response(200)
+        # Not a charset Python knows, read as utf-8
+        handler.send_header("Content-Type", "text/html; charset=x-unknown")
+        handler.send_header("ETag", '"v1"')
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+@pytest.fixture
+def server():
+    server = Server()
+    yield server
+    server.httpd.shutdown()
+    server.httpd.server_close()
+
+@pytest.fixture
+def page_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(web_fetch, "_cache", None)
+    monkeypatch.setattr(web_fetch, "_cache_settings", {"enabled": True, "offline": False, "path": None})
+    web_fetch.configure_cache(path=str(tmp_path / "pages.sqlite3"))
+    return web_fetch.get_cache()
+
+def test_fetch_many_keeps_order_reports_errors_and_limits_each_host(server):
+    urls = [f"{server.url}/slow{i}" for i in range(6)] + [f"{server.url}/missing"]
+    fetch_one = lambda url, session, timeout: session.get(url, timeout=timeout).raise_for_status() or url
+    results = web_fetch.fetch_many(urls, workers=6, per_host=2, fetch_one=fetch_one)
+    assert [url for url, _, _ in results] == urls
+    assert [result for _, result, _ in results[:6]] == urls[:6]
+    assert results[6][1] is None and results[6][2] is not None
+    assert server.most_running <= 2
+
+def test_fetch_many_records_any_error_per_url():
+    def fetch_one(url, session, timeout):
+        if url == "broken.pdf":
+            raise RuntimeError("Failed to open file")
+        return url
+    results = web_fetch.fetch_many(["a", "broken.pdf", "b"], fetch_one=fetch_one)
+    assert [(url, result) for url, result, _ in results] == [("a", "a"), ("broken.pdf", None), ("b", "b")]
+    assert isinstance(results[1][2], RuntimeError)
+
+@pytest.mark.parametrize("lxml", [True, False])
+def test_both_parsers_extract_the_same_main_content(lxml, monkeypatch):
+    if not lxml:
+        monkeypatch.setattr(html_extract, "etree", None)
+    html = ("<html><head><title>A &amp; B</title><script>var x;</script></head><body>"
+            "<header>Menu</header><p>Intro <b>text</b></p>"
+            "<div class='post content'>First<!-- note --> part<br>second <i>part</i><style>p{}</style>"
+            "</div><article>Not the main content</article><footer>Footer</footer></body></html>").encode("utf-8")
+    chunks = [html[i:i + 7] for i in range(0, len(html), 7)]
+    assert web_fetch._extract_chunks(chunks, "utf-8", None, web_fetch.DEFAULT_MAX_BYTES) == (("A & B", "First part\nsecond\npart"), len(html), True)
+    (title, text), _, complete = web_fetch._extract_chunks([PAGE[:5000], PAGE[5000:]], "utf-8", 100, web_fetch.DEFAULT_MAX_BYTES)
+    assert title == "Big page" and len(text) == 100 and not complete
+
+def test_cached_page_is_revalidated_and_extracted_the_same_way(server, page_cache):
+    url = f"{server.url}/big"
+    title, text = web_fetch.fetch_content(url, max_tokens=50)
+    assert title == "Big page" and len(text) == 200 and "Menu" not in text
+    # A budget that stops reading early isn't cached, a whole page is
+    assert page_cache.get(url) is None
+    full = web_fetch.fetch_content(url)
+    assert page_cache.get(url) is not None
+
+    assert web_fetch.fetch_content(url, max_tokens=50) == (title, text)
+    assert web_fetch.fetch_content(url) == full
+    assert server.requests[-1] == ("/big", '"v1"')
+    assert page_cache.stats()["revalidated"] == 2
+
+def test_offline_reads_only_from_the_cache(server, page_cache):
+    url = f"{server.url}/page"
+    online = web_fetch.fetch_content(url)
+    web_fetch.configure_cache(offline=True, path=page_cache.path)
+    requests_before = len(server.requests)
+    assert web_fetch.fetch_content(url) == online
+    with pytest.raises(web_fetch.OfflineCacheMiss):
+        web_fetch.fetch_content(f"{server.url}/other")
+    assert len(server.requests) == requests_before
@@ -0,0 +1,156 @@
+"""
+Count the tokens in big CSV, Parquet or text files without loading them.
+
+The file is read in blocks with pyarrow, so memory depends on the block size
+and the number of workers rather than on the size of the file. Each block
+goes to a process pool as an Arrow record batch, where every worker loads
+the tiktoken encoding once and encodes the whole block. At most two blocks
+per worker are in flight at a time. Workers send back per-column totals and
+a histogram of tokens per row, which are added up as they arrive, so
+percentiles come out without keeping a count for every row.
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import numpy as np
+
+from tracing import peak_rss_mb
+
+DEFAULT_MODEL = "gpt-4o"
+DEFAULT_WORKERS = os.cpu_count() or 1
+DEFAULT_BLOCK_BYTES = 4 * 1024 * 1024
+PARQUET_BATCH_ROWS = 10000
+# Bucket edges for tokens per row: exact below about 25, then about 4% wide
+EDGES = np.unique(np.geomspace(1, 2 ** 31, 512).astype(np.int64))
+TEXT_COLUMN = "text"
+
+_encoding = None
+
+def encoding_name(model=DEFAULT_MODEL, encoding=None):
+    """The tiktoken encoding to use, given by name or looked up for a model."""
+    import tiktoken.model
+    return encoding or tiktoken.model.encoding_name_for_model(model)
+
+def _init_worker(name):
+    global _encoding
+    import tiktoken
+    _encoding = tiktoken.get_encoding(name)
+
+def count_batch(batch):
+    """Runs in a worker: {column: totals} for one Arrow record batch."""
+    result = {}
+    for column, array in zip(batch.schema.names, batch.columns):
+        texts = array.to_pylist()
+        present = [text for text in texts if text is not None]
+        # The pool already keeps every core busy, so no threads inside the worker
+        tokens = _encoding.encode_ordinary_batch(present, num_threads=1)
+        counts = np.fromiter(map(len, tokens), dtype=np.int64, count=len(tokens))
+        result[column] = {
+            "rows": len(texts),
+            "nulls": len(texts) - len(present),
+            "tokens": int(counts.sum()),
+            "chars": sum(len(text) for text in present),
+            "max": int(counts.max()) if len(counts) else 0,
+            "histogram": np.bincount(np.searchsorted(EDGES, counts, side="right"), minlength=len(EDGES) + 1),
+        }
+    return result
+
+def merge(totals, result):
+    for column, counts in result.items():
+        if column not in totals:
+            totals[column] = counts
+            continue
+        total = totals[column]
+        for name in ("rows", "nulls", "tokens", "chars"):
+            total[name] += counts[name]
+        total["max"] = max(total["max"], counts["max"])
+        total["histogram"] = total["histogram"] + counts["histogram"]
+
+def histogram_percentile(histogram, fraction):
+    """Tokens per row at the given fraction, from a histogram over EDGES (upper edge of the bucket)."""
+    total = histogram.sum()
+    if not total:
+        return 0
+    bucket = int(np.searchsorted(np.cumsum(histogram), fraction * total))
+    return int(EDGES[bucket] - 1) if bucket < len(EDGES) else int(EDGES[-1])
+
+def file_format(path):
+    name = path.lower()
+    for suffix in (".gz", ".bz2", ".zst", ".lz4"):
+        name = name.removesuffix(suffix)
+    if name.endswith((".parquet", ".pq")):
+        return "parquet"
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith(".tsv"):
+        return "tsv"
+    return "text"
+
+def read_batches(path, columns=None, block_bytes=DEFAULT_BLOCK_BYTES):
+    """Yield Arrow record batches of string columns from a CSV, TSV, Parquet or text file."""
+    import pyarrow as pa
+    import pyarrow.csv
+    import pyarrow.parquet
+
+    kind = file_format(path)
+    if kind == "parquet":
+        parquet = pyarrow.parquet.ParquetFile(path)
+        names = columns or [field.name for field in parquet.schema_arrow
+                            if pa.types.is_string(field.type) or pa.types.is_large_string(field.type)]
+        for batch in parquet.iter_batches(batch_size=PARQUET_BATCH_ROWS, columns=names):
+            yield pa.RecordBatch.from_arrays([column.cast(pa.string()) for column in batch.columns], names=names)
+    elif kind in ("csv", "tsv"):
+        # Messages like the Enron emails have newlines inside quoted fields
+        parse = pyarrow.csv.ParseOptions(delimiter="\t" if kind == "tsv" else ",", newlines_in_values=True)
+        read = pyarrow.csv.ReadOptions(block_size=block_bytes)
+        names = columns or pyarrow.csv.open_csv(path, read_options=read, parse_options=parse).schema.names
+        # Everything is read as text, so a column of numbers that turns to words later doesn't fail
+        convert = pyarrow.csv.ConvertOptions(include_columns=names, column_types={name: pa.string() for name in names})
+        yield from pyarrow.csv.open_csv(path, read_options=read, parse_options=parse, convert_options=convert)
+    else:
+        with pa.input_stream(path, compression="detect") as f:
+            rest = b""
+            while True:
+                block = f.read(block_bytes)
+                lines = (rest + block).split(b"\n")
+                rest = lines.pop() if block else b""
+                lines = [line.decode("utf-8", errors="replace") for line in lines if line]
+                if lines:
+                    yield pa.RecordBatch.from_arrays([pa.array(lines, pa.string())], names=[TEXT_COLUMN])
+                if not block:
+                    break
+
+def count_file(path, columns=None, model=DEFAULT_MODEL, encoding=None, workers=DEFAULT_WORKERS,
+               block_bytes=DEFAULT_BLOCK_BYTES, on_progress=None):
+    """
+    Count the tokens in every column of path (or the given columns). Returns
+    {"columns": {column: totals}, "seconds", "bytes", "peak_rss_mb"}, see
+    count_batch for the totals.
+    """
+    name = encoding_name(model, encoding)
+    start = time.perf_counter()
+    totals = {}
+    batches = read_batches(path, columns, block_bytes)
+    if workers <= 1:
+        _init_worker(name)
+        for batch in batches:
+            merge(totals, count_batch(batch))
+            if on_progress:
+                on_progress(totals)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(name,)) as pool:
+            pending = set()
+            for batch in batches:
+                # Don't read further ahead than the workers can keep up with
+                while len(pending) >= 2 * workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for task in done:
+                        merge(totals, task.result())
+                    if on_progress:
+                        on_progress(totals)
+                pending.add(pool.submit(count_batch, batch))
+            for task in wait(pending).done:
+                merge(totals, task.result())
+    return {"columns": totals, "encoding": name, "seconds": time.perf_counter() - start,
+            "bytes": os.path.getsize(path), "peak_rss_mb": peak_rss_mb(children=True)}
@@ -0,0 +1,211 @@
+"""
+Lightweight tracing for the blog scripts, to see where a slow run spent its time.
+
+Wrap a hot path in `with span("fetch", url=url):` or decorate it with
+@traced("llm.ollama"). Tracing is off unless a script is run with --profile
+or QBLOG_PROFILE is set (to 1, or to the path of the trace file). Then every
+span is recorded and at the end of the run a Chrome trace-event file is
+written to .cache/traces/ (open it in chrome://tracing or ui.perfetto.dev)
+and a table of calls, total and self time per stage is printed. Self time
+leaves out nested spans, so for the thread that started tracing the table
+adds up to the run. Spans in worker threads (the page fetcher, the LLM
+router) overlap with it and are listed but not added to the total.
+
+When tracing is off, span() returns a shared do-nothing object and traced
+functions are called straight through, so leaving the spans in costs about
+a function call each.
+
+peak_rss_mb() and percentile() are the memory and latency figures the
+scripts and benchmarks print next to their timings.
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import resource
+import datetime
+import threading
+import functools
+
+from build_cache import CACHE_DIR
+
+ENV_VAR = "QBLOG_PROFILE"
+TRACE_DIR = os.path.join(CACHE_DIR, "traces")
+
+_tracer = None
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **args):
+        pass
+
+_NULL_SPAN = _NullSpan()
+
+class _Span:
+    __slots__ = ("tracer", "name", "args", "start", "children")
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def set(self, **args):
+        """Add arguments to the span, e.g. sizes only known once it's done."""
+        self.args.update(args)
+
+    def __enter__(self):
+        self.tracer._stack().append(self)
+        self.children = 0
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter_ns() - self.start
+        stack = self.tracer._stack()
+        stack.pop()
+        if stack:
+            stack[-1].children += duration
+        if exc_type:
+            self.args["error"] = exc_type.__name__
+        self.tracer._record(self.name, self.start, duration, duration - self.children, self.args)
+        return False
+
+class Tracer:
+    def __init__(self, path, name):
+        self.path = path
+        self.name = name
+        self.started = time.perf_counter_ns()
+        self.events = []
+        self.threads = {}
+        self.main_thread = threading.get_ident()
+        self._local = threading.local()
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def _record(self, name, start, duration, self_time, args):
+        thread = threading.get_ident()
+        if thread not in self.threads:
+            self.threads[thread] = (len(self.threads) + 1, threading.current_thread().name)
+        # list.append is atomic, spans from worker threads need no lock
+        self.events.append((name, start, duration, self_time, thread, args))
+
+    def trace_events(self):
+        """The spans in Chrome's trace-event format, times in microseconds."""
+        pid = os.getpid()
+        events = [{"name": "process_name", "ph": "M", "pid": pid, "tid": 0, "args": {"name": self.name}}]
+        events += [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": thread_name}}
+                   for tid, thread_name in self.threads.values()]
+        for name, start, duration, _, thread, args in self.events:
+            events.append({"name": name, "cat": name.split(".")[0], "ph": "X", "pid": pid,
+                           "tid": self.threads[thread][0], "ts": (start - self.started) / 1000,
+                           "dur": duration / 1000, "args": {key: str(value) for key, value in args.items()}})
+        return events
+
+    def summary(self):
+        """{name: {"calls", "total", "self", "main_self", "max"}} in seconds, main_self only counts the main thread."""
+        stages = {}
+        for name, _, duration, self_time, thread, _ in self.events:
+            stage = stages.setdefault(name, {"calls": 0, "total": 0.0, "self": 0.0, "main_self": 0.0, "max": 0.0})
+            stage["calls"] += 1
+            stage["total"] += duration / 1e9
+            stage["self"] += self_time / 1e9
+            if thread == self.main_thread:
+                stage["main_self"] += self_time / 1e9
+            stage["max"] = max(stage["max"], duration / 1e9)
+        return stages
+
+    def write(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.trace_events(), "displayTimeUnit": "ms"}, f)
+
+def format_summary(stages, wall):
+    lines = [f"{'stage':<28} {'calls':>6} {'total':>9} {'self':>9} {'mean':>9} {'max':>9} {'% of run':>8}"]
+    for name, stage in sorted(stages.items(), key=lambda item: -item[1]["self"]):
+        lines.append(f"{name[:28]:<28} {stage['calls']:>6} {stage['total']:>8.3f}s {stage['self']:>8.3f}s "
+                     f"{stage['total'] / stage['calls'] * 1000:>7.1f}ms {stage['max'] * 1000:>7.1f}ms "
+                     f"{stage['self'] / wall:>8.0%}")
+    untraced = wall - sum(stage.get("main_self", stage["self"]) for stage in stages.values())
+    lines.append(f"{'(untraced)':<28} {'':>6} {'':>9} {untraced:>8.3f}s {'':>9} {'':>9} {untraced / wall:>8.0%}")
+    lines.append(f"Run took {wall:.3f}s")
+    return "\n".join(lines)
+
+def default_path(name):
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    return os.path.join(TRACE_DIR, f"{name}-{stamp}-{os.getpid()}.json")
+
+def enable(path=None, name=None):
+    """Start recording spans. The trace goes to path, or a new file in .cache/traces/."""
+    global _tracer
+    name = name or os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0]
+    _tracer = Tracer(path or default_path(name), name)
+
+def enabled():
+    return _tracer is not None
+
+def span(name, **args):
+    """Context manager timing the block as one span called name."""
+    if _tracer is None:
+        return _NULL_SPAN
+    return _Span(_tracer, name, args)
+
+def traced(name=None):
+    """Decorator recording every call of the function as a span, named after it by default."""
+    def decorate(fn):
+        span_name = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _tracer is None:
+                return fn(*args, **kwargs)
+            with _Span(_tracer, span_name, {}):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def finish(echo=print):
+    """Stop tracing, write the trace file and print the per-stage table. Returns the trace path."""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    if tracer is None:
+        return None
+    wall = (time.perf_counter_ns() - tracer.started) / 1e9
+    tracer.write()
+    echo(format_summary(tracer.summary(), wall))
+    echo(f"Trace written to {tracer.path}")
+    return tracer.path
+
+def peak_rss_mb(children=False):
+    """Peak resident memory of this process, or of the largest finished worker if bigger and children, in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if children:
+        peak = max(peak, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+def percentile(values, fraction):
+    """The value at fraction (0.99 for p99) of values, or None if there are none."""
+    values = sorted(values)
+    if not values:
+        return None
+    return values[min(int(fraction * len(values)), len(values) - 1)]
+
+def enable_from_env(argv=None):
+    """Turn tracing on if QBLOG_PROFILE is set or --profile is in argv, and write it out at exit."""
+    setting = os.environ.get(ENV_VAR)
+    argv = sys.argv[1:] if argv is None else argv
+    if not setting and "--profile" not in argv:
+        return False
+    enable(setting if setting and setting != "1" else None)
+    atexit.register(finish)
+    return True
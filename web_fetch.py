@@ -0,0 +1,254 @@
+"""
+Fetch web pages for qblog.py and qblog2.py.
+
+All requests go through one pooled keep-alive session with a timeout and
+retries, and fetch_many() downloads a list of URLs concurrently while
+limiting how many requests hit the same host at once.
+
+fetch_content() reads a page in chunks instead of loading it whole: it stops
+at a byte cap, feeds an incremental parser as it goes and stops early once
+enough main content has been collected. PDFs are spooled to disk and read
+page by page.
+
+Pages are kept in the on-disk PageCache and revalidated with conditional
+requests. Set QBLOG_NO_CACHE=1 to bypass the cache, or QBLOG_OFFLINE=1 to
+only replay what is already cached.
+"""
+import os
+import codecs
+import tempfile
+import threading
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from page_cache import PageCache
+from html_extract import StreamingExtractor
+from tracing import span, peak_rss_mb
+
+# (connect, read) timeout in seconds
+DEFAULT_TIMEOUT = (5, 30)
+DEFAULT_WORKERS = 8
+DEFAULT_PER_HOST = 2
+USER_AGENT = "Mozilla/5.0 (compatible; qblog; +https://www.geirfreysson.com)"
+# Never read more than this much of a response
+DEFAULT_MAX_BYTES = 20 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+# Bigger pages are streamed without keeping a copy for the page cache
+MAX_CACHED_PAGE = 4 * 1024 * 1024
+# Rough characters per token, to turn a token budget into a text budget
+CHARS_PER_TOKEN = 4
+
+_session = None
+_session_lock = threading.Lock()
+_cache = None
+_cache_settings = {
+    "enabled": not os.environ.get("QBLOG_NO_CACHE"),
+    "offline": bool(os.environ.get("QBLOG_OFFLINE")),
+    "path": None,
+}
+
+class OfflineCacheMiss(requests.exceptions.RequestException):
+    """Raised in offline mode for a page that isn't in the cache."""
+
+def make_session(pool_size=DEFAULT_WORKERS, retries=3):
+    """Create a session with a keep-alive connection pool and retries on flaky responses."""
+    session = requests.Session()
+    retry = Retry(total=retries, backoff_factor=0.5,
+                  status_forcelist=[429, 500, 502, 503, 504],
+                  allowed_methods=["GET", "HEAD"])
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+def get_session():
+    """The shared session, created on first use."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = make_session()
+        return _session
+
+def configure_cache(enabled=True, offline=False, path=None):
+    """Turn the page cache on or off, or switch to offline replay from it."""
+    global _cache
+    enabled = enabled or offline
+    # A long-running process (qblog2 serve) keeps its open cache unless it has to change
+    if (enabled, path) != (_cache_settings["enabled"], _cache_settings["path"]):
+        _cache = None
+    _cache_settings.update(enabled=enabled, offline=offline, path=path)
+
+def get_cache():
+    """The shared PageCache, or None if caching is turned off."""
+    global _cache
+    if not _cache_settings["enabled"]:
+        return None
+    with _session_lock:
+        if _cache is None:
+            _cache = PageCache(_cache_settings["path"]) if _cache_settings["path"] else PageCache()
+        return _cache
+
+def _is_pdf(url, response):
+    content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+    return content_type == "application/pdf" or url.lower().split("?")[0].endswith(".pdf")
+
+def _read_pdf(url, response, max_bytes, max_chars):
+    """Spool a PDF to disk, never holding more than a chunk in memory, and read its text page by page."""
+    import pymupdf
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as f:
+        for chunk in response.iter_content(CHUNK_SIZE):
+            f.write(chunk)
+            if f.tell() >= max_bytes:
+                break
+        f.flush()
+        with pymupdf.open(f.name) as doc:
+            title = (doc.metadata or {}).get("title") or ""
+            parts = []
+            chars = 0
+            for page in doc:
+                text = page.get_text().strip()
+                parts.append(text)
+                chars += len(text)
+                if max_chars is not None and chars >= max_chars:
+                    break
+    text = "\n\n".join(parts)
+    return title, text[:max_chars] if max_chars is not None else text
+
+def fetch_content(url, session=None, timeout=DEFAULT_TIMEOUT, max_bytes=DEFAULT_MAX_BYTES, max_tokens=None):
+    """
+    Return (title, text) for the main content of a page or PDF, reading at
+    most max_bytes of it and stopping once about max_tokens of text has been
+    collected. Pages that were read completely go in the page cache.
+    """
+    with span("fetch", url=url) as fetch_span:
+        return _fetch_content(url, session, timeout, max_bytes, max_tokens, fetch_span)
+
+def _known_encoding(encoding):
+    """encoding, or utf-8 if there is none or Python doesn't know the charset the server gave."""
+    try:
+        return codecs.lookup(encoding or "utf-8").name
+    except LookupError:
+        return "utf-8"
+
+def _extract_chunks(chunks, encoding, max_chars, max_bytes):
+    """
+    Feed byte chunks to a StreamingExtractor until it has enough text or
+    max_bytes have been read. Returns ((title, text), bytes_read, complete).
+    """
+    extractor = StreamingExtractor(max_chars)
+    decoder = codecs.getincrementaldecoder(_known_encoding(encoding))(errors="replace")
+    bytes_read = 0
+    complete = True
+    for chunk in chunks:
+        bytes_read += len(chunk)
+        with span("extract"):
+            extractor.feed(decoder.decode(chunk))
+        if extractor.done or bytes_read >= max_bytes:
+            complete = False
+            break
+    with span("extract"):
+        extractor.feed(decoder.decode(b"", final=True))
+    return extractor.result(), bytes_read, complete
+
+def _extract_cached(cache, page, max_chars, max_bytes):
+    """The same extraction as a fresh download, on a cached page, remembered per budget."""
+    def extract(_):
+        chunks = (page.body[i:i + CHUNK_SIZE] for i in range(0, len(page.body), CHUNK_SIZE))
+        return _extract_chunks(chunks, page.encoding, max_chars, max_bytes)[0]
+
+    return tuple(cache.extracted(page, f"html_extract.StreamingExtractor:{max_chars}:{max_bytes}", extract))
+
+def _fetch_content(url, session, timeout, max_bytes, max_tokens, fetch_span):
+    max_chars = max_tokens * CHARS_PER_TOKEN if max_tokens else None
+    cache = get_cache()
+    cached = cache.get(url) if cache else None
+
+    if _cache_settings["offline"]:
+        if cached is None:
+            raise OfflineCacheMiss(f"{url} is not in the page cache")
+        fetch_span.set(cached=True)
+        cache.record("hits")
+        return _extract_cached(cache, cached, max_chars, max_bytes)
+
+    # The span's own time is the network, extraction and caching have their own spans
+    headers = cached.conditional_headers() if cached else {}
+    response = (session or get_session()).get(url, timeout=timeout, stream=True, headers=headers)
+    with response:
+        if cached and response.status_code == 304:
+            fetch_span.set(cached=True)
+            cache.record("revalidated")
+            return _extract_cached(cache, cached, max_chars, max_bytes)
+        response.raise_for_status()
+        if _is_pdf(url, response):
+            with span("extract.pdf"):
+                return _read_pdf(url, response, max_bytes, max_chars)
+
+        encoding = _known_encoding(response.encoding)
+        # The body is only kept in memory while the page is small enough to cache
+        body = bytearray() if cache is not None else None
+
+        def chunks():
+            nonlocal body
+            for chunk in response.iter_content(CHUNK_SIZE):
+                if body is not None:
+                    body += chunk
+                    if len(body) > MAX_CACHED_PAGE:
+                        body = None
+                yield chunk
+
+        result, bytes_read, complete = _extract_chunks(chunks(), encoding, max_chars, max_bytes)
+    fetch_span.set(bytes=bytes_read)
+
+    # Only whole pages go in the cache, a partial one would be wrong for a bigger budget
+    if body is not None and complete:
+        cache.record("misses")
+        with span("cache.put"):
+            cache.put(url, bytes(body), encoding,
+                      etag=response.headers.get("ETag"),
+                      last_modified=response.headers.get("Last-Modified"))
+    return result
+
+def read_urls(path):
+    """Read URLs from a file, one per line. Blank lines and # comments are ignored."""
+    with open(path, "r", encoding="utf-8") as f:
+        lines = (line.split("#", 1)[0].strip() for line in f)
+        return [line for line in lines if line]
+
+def fetch_many(urls, workers=DEFAULT_WORKERS, per_host=DEFAULT_PER_HOST, timeout=DEFAULT_TIMEOUT, fetch_one=fetch_content):
+    """
+    Fetch many URLs concurrently. At most per_host requests go to the same
+    host at a time. fetch_one(url, session=..., timeout=...) does the work
+    for each URL, by default returning (title, text) from fetch_content. Returns a list of
+    (url, result, error) in the order the URLs were given, with result None
+    if the fetch failed.
+    """
+    session = make_session(pool_size=max(workers, 1))
+    host_limits = {}
+    host_limits_lock = threading.Lock()
+
+    def host_limit(url):
+        host = urlparse(url).netloc
+        with host_limits_lock:
+            if host not in host_limits:
+                host_limits[host] = threading.BoundedSemaphore(per_host)
+            return host_limits[host]
+
+    def fetch_limited(url):
+        with host_limit(url):
+            try:
+                return url, fetch_one(url, session=session, timeout=timeout), None
+            except Exception as e:
+                # Not just network errors, a PDF that pymupdf can't open shouldn't lose the other pages
+                return url, None, e
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+            return list(pool.map(fetch_limited, urls))
+    finally:
+        session.close()